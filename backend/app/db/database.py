@@ -1,5 +1,7 @@
 from sqlalchemy import create_engine, MetaData
 from sqlalchemy.orm import sessionmaker, declarative_base
+from starlette.concurrency import run_in_threadpool
+from app.db.profile import configure_engine, engine_options, load_db_profile
 from dotenv import load_dotenv
 import os
 
@@ -9,8 +11,15 @@ load_dotenv()
 # Get database URL from .env
 DB_CONNECTION_STRING = os.getenv("DATABASE_URL")
 
+# "sync" runs request sessions in the threadpool, "async" on the event loop
+DB_MODE = os.getenv("DB_MODE", "sync").lower()
+
+# Engine, pool and SQLite settings selected by DB_PROFILE
+DB_PROFILE = load_db_profile()
+
 # Create engine
-engine = create_engine(DB_CONNECTION_STRING, echo=True)
+engine = create_engine(DB_CONNECTION_STRING, **engine_options(DB_PROFILE, DB_CONNECTION_STRING))
+configure_engine(engine, DB_PROFILE, DB_CONNECTION_STRING)
 
 # Base class for models
 Base = declarative_base()
@@ -26,6 +35,8 @@ def init_db():
     import app.models.like
     import app.models.user
     import app.models.admin_action
+    import app.models.analytics_rollup
+    import app.models.activity_event
     Base.metadata.create_all(bind=engine)
 
 # Initialize database
@@ -40,4 +51,69 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Async drivers for the async request path
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def get_async_url(url: str) -> str:
+    scheme, _, rest = url.partition("://")
+    driver = ASYNC_DRIVERS.get(scheme.split("+")[0])
+    if driver is None:
+        raise ValueError(f"No async driver configured for {scheme}")
+    return f"{driver}://{rest}"
+
+async_engine = None
+AsyncSessionLocal = None
+
+if DB_MODE == "async":
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    ASYNC_CONNECTION_STRING = get_async_url(DB_CONNECTION_STRING)
+    async_engine = create_async_engine(
+        ASYNC_CONNECTION_STRING, **engine_options(DB_PROFILE, ASYNC_CONNECTION_STRING)
+    )
+    configure_engine(async_engine.sync_engine, DB_PROFILE, ASYNC_CONNECTION_STRING)
+    AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
+# Async dependency for FastAPI routes
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Session dependency for the async route handlers, selected by DB_MODE
+get_session = get_async_db if DB_MODE == "async" else get_db
+
+async def run_db(db, fn, *args, **kwargs):
+    """
+    Run fn(session, *args, **kwargs) without blocking the event loop.
+
+    AsyncSessions run the synchronous ORM code through run_sync on the async
+    driver; plain Sessions fall back to the threadpool, as sync handlers do.
+    """
+    if DB_MODE == "async":
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+async def run_in_session(fn, *args, **kwargs):
+    """
+    Like run_db, but in a session of its own that is closed afterwards.
+
+    For work shared between requests or finished in the background, which
+    must not depend on the session of the request that started it.
+    """
+    if DB_MODE == "async":
+        async with AsyncSessionLocal() as db:
+            return await db.run_sync(fn, *args, **kwargs)
+
+    def call():
+        db = SessionLocal()
+        try:
+            return fn(db, *args, **kwargs)
+        finally:
+            db.close()
+
+    return await run_in_threadpool(call)
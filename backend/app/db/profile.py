@@ -0,0 +1,223 @@
+"""
+Database performance profile.
+
+A profile bundles engine/pool settings, SQLite pragmas, statement caching and
+the slow-query log. Pick a preset with DB_PROFILE (development|production) and
+override individual settings with the environment variables listed in
+ENV_OVERRIDES.
+"""
+
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, replace
+from typing import Any, Deque, Dict, List, Optional
+import logging
+import os
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+slow_query_logger = logging.getLogger("app.db.slow_query")
+
+# "METHOD /path" of the request being served, set by RouteContextMiddleware
+current_route: ContextVar[Optional[str]] = ContextVar("current_route", default=None)
+
+@dataclass(frozen=True)
+class DBProfile:
+    name: str
+    echo: bool = False
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_recycle: int = -1
+    pool_timeout: int = 30
+    pool_pre_ping: bool = False
+    # Compiled SQL cache entries per engine
+    statement_cache_size: int = 500
+    # Prepared statements kept per DB-API connection
+    prepared_statement_cache_size: int = 128
+    sqlite_journal_mode: Optional[str] = None
+    sqlite_synchronous: Optional[str] = None
+    sqlite_mmap_size: Optional[int] = None
+    sqlite_cache_size: Optional[int] = None
+    sqlite_busy_timeout: Optional[int] = None
+    # 0 disables the slow-query log
+    slow_query_ms: float = 0
+
+PRESETS: Dict[str, DBProfile] = {
+    "development": DBProfile(
+        name="development",
+        echo=True,
+        slow_query_ms=500.0,
+    ),
+    "production": DBProfile(
+        name="production",
+        pool_size=20,
+        max_overflow=20,
+        pool_recycle=1800,
+        pool_pre_ping=True,
+        statement_cache_size=1000,
+        prepared_statement_cache_size=256,
+        sqlite_journal_mode="WAL",
+        sqlite_synchronous="NORMAL",
+        sqlite_mmap_size=268435456,  # 256 MB
+        sqlite_cache_size=-65536,  # 64 MB, negative values are KiB
+        sqlite_busy_timeout=5000,
+        slow_query_ms=200.0,
+    ),
+}
+
+ENV_OVERRIDES = {
+    "DB_ECHO": "echo",
+    "DB_POOL_SIZE": "pool_size",
+    "DB_MAX_OVERFLOW": "max_overflow",
+    "DB_POOL_RECYCLE": "pool_recycle",
+    "DB_POOL_TIMEOUT": "pool_timeout",
+    "DB_POOL_PRE_PING": "pool_pre_ping",
+    "DB_STATEMENT_CACHE_SIZE": "statement_cache_size",
+    "DB_PREPARED_STATEMENT_CACHE_SIZE": "prepared_statement_cache_size",
+    "SQLITE_JOURNAL_MODE": "sqlite_journal_mode",
+    "SQLITE_SYNCHRONOUS": "sqlite_synchronous",
+    "SQLITE_MMAP_SIZE": "sqlite_mmap_size",
+    "SQLITE_CACHE_SIZE": "sqlite_cache_size",
+    "SQLITE_BUSY_TIMEOUT": "sqlite_busy_timeout",
+    "DB_SLOW_QUERY_MS": "slow_query_ms",
+}
+
+def _parse(raw: str, current: Any) -> Any:
+    if isinstance(current, bool):
+        return raw.strip().lower() in ("1", "true", "yes", "on")
+    if isinstance(current, float):
+        return float(raw)
+    if isinstance(current, int) or current is None and raw.lstrip("-").isdigit():
+        return int(raw)
+    return raw
+
+def load_db_profile() -> DBProfile:
+    """
+    Build the active profile from DB_PROFILE and the override variables.
+    """
+    name = os.getenv("DB_PROFILE", "development").lower()
+    if name not in PRESETS:
+        raise ValueError(f"Unknown DB_PROFILE '{name}'. Expected one of: {', '.join(PRESETS)}")
+
+    profile = PRESETS[name]
+    overrides = {}
+    for env_name, field in ENV_OVERRIDES.items():
+        raw = os.getenv(env_name)
+        if raw is not None and raw != "":
+            overrides[field] = _parse(raw, getattr(profile, field))
+    return replace(profile, **overrides)
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+def _is_memory_sqlite(url: str) -> bool:
+    return _is_sqlite(url) and (url.endswith(":memory:") or url.rstrip("/").endswith("sqlite:"))
+
+def engine_options(profile: DBProfile, url: str) -> Dict[str, Any]:
+    """
+    Keyword arguments for create_engine/create_async_engine.
+    """
+    options: Dict[str, Any] = {
+        "echo": profile.echo,
+        "query_cache_size": profile.statement_cache_size,
+        "pool_pre_ping": profile.pool_pre_ping,
+    }
+
+    # In-memory SQLite uses a single-connection pool without overflow settings
+    if not _is_memory_sqlite(url):
+        options.update(
+            pool_size=profile.pool_size,
+            max_overflow=profile.max_overflow,
+            pool_recycle=profile.pool_recycle,
+            pool_timeout=profile.pool_timeout,
+        )
+
+    if _is_sqlite(url) and "+aiosqlite" not in url:
+        options["connect_args"] = {
+            "check_same_thread": False,
+            "cached_statements": profile.prepared_statement_cache_size,
+        }
+    elif url.startswith("postgresql+asyncpg"):
+        options["connect_args"] = {
+            "prepared_statement_cache_size": profile.prepared_statement_cache_size,
+        }
+
+    return options
+
+def _sqlite_pragmas(profile: DBProfile) -> List[str]:
+    pragmas = []
+    if profile.sqlite_journal_mode:
+        pragmas.append(f"PRAGMA journal_mode={profile.sqlite_journal_mode}")
+    if profile.sqlite_synchronous:
+        pragmas.append(f"PRAGMA synchronous={profile.sqlite_synchronous}")
+    if profile.sqlite_mmap_size is not None:
+        pragmas.append(f"PRAGMA mmap_size={int(profile.sqlite_mmap_size)}")
+    if profile.sqlite_cache_size is not None:
+        pragmas.append(f"PRAGMA cache_size={int(profile.sqlite_cache_size)}")
+    if profile.sqlite_busy_timeout is not None:
+        pragmas.append(f"PRAGMA busy_timeout={int(profile.sqlite_busy_timeout)}")
+    return pragmas
+
+class SlowQueryLog:
+    """
+    Records statements slower than the profile threshold.
+
+    Each entry is logged to app.db.slow_query and kept in a bounded list of
+    recent entries for the admin metrics endpoint.
+    """
+
+    def __init__(self, max_entries: int = 100):
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=max_entries)
+        self.count = 0
+
+    def record(self, statement: str, duration_ms: float, route: Optional[str]):
+        self.count += 1
+        entry = {
+            "statement": statement,
+            "duration_ms": round(duration_ms, 2),
+            "route": route,
+            "at": time.time(),
+        }
+        self.recent.append(entry)
+        slow_query_logger.warning(
+            "Slow query (%.1f ms) in %s: %s", duration_ms, route or "background", statement
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {"count": self.count, "recent": list(self.recent)}
+
+slow_query_log = SlowQueryLog()
+
+def configure_engine(engine: Engine, profile: DBProfile, url: str):
+    """
+    Attach the profile's pragmas and slow-query instrumentation to a sync
+    engine (pass async_engine.sync_engine for async engines).
+    """
+    pragmas = _sqlite_pragmas(profile) if _is_sqlite(url) else []
+    if pragmas:
+        @event.listens_for(engine, "connect")
+        def apply_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for pragma in pragmas:
+                    cursor.execute(pragma)
+            finally:
+                cursor.close()
+
+    if profile.slow_query_ms > 0:
+        threshold = profile.slow_query_ms / 1000
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def start_timer(conn, cursor, statement, parameters, context, executemany):
+            conn.info["query_start_time"] = time.perf_counter()
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def log_slow_query(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - conn.info.pop("query_start_time", time.perf_counter())
+            if elapsed >= threshold:
+                slow_query_log.record(statement, elapsed * 1000, current_route.get())
+
+def describe_profile(profile: DBProfile) -> Dict[str, Any]:
+    return asdict(profile)
@@ -1,20 +1,53 @@
+from contextlib import asynccontextmanager
+from typing import Optional
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from app.db.database import engine, Base
+from app.db.database import async_engine, engine, Base
+from app.middleware.route_context import RouteContextMiddleware
 from app.routes.users import router as users_router
-from app.routes.polls import router as polls_router
+from app.routes.polls import load_poll_snapshot, router as polls_router
 from app.routes.votes import router as votes_router
 from app.routes.options import router as options_router
 from app.routes.likes import router as likes_router
 from app.routes.analytics import router as analytics_router
 from app.routes.admin import router as admin_router
+from app.services.expiry_scheduler import expiry_scheduler
+from app.services.leaderboard import leaderboard
+from app.services.poll_events import poll_events
+from app.services.presence import presence
+from app.services.rollup_compactor import rollup_compactor
+from app.services.write_pipeline import write_pipeline
 from app.websocket import manager
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await manager.start()
+    await poll_events.start()
+    await presence.start()
+    await expiry_scheduler.start()
+    await rollup_compactor.start()
+    await leaderboard.start()
+    await write_pipeline.start()
+    yield
+    await write_pipeline.stop()
+    await leaderboard.stop()
+    await rollup_compactor.stop()
+    await expiry_scheduler.stop()
+    await presence.stop()
+    await poll_events.stop()
+    await manager.stop()
+    if async_engine is not None:
+        await async_engine.dispose()
+
+# Sent to reconnecting WebSocket clients whose gap is older than the replay buffer
+manager.snapshot_loader = load_poll_snapshot
+
 app = FastAPI(
     title="QuickPoll",
     description="Real-Time Opinion Polling Platform",
     version="0.0.1",
+    lifespan=lifespan,
 )
 
 Base.metadata.create_all(bind=engine)
@@ -36,6 +69,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(RouteContextMiddleware)
+
 app.include_router(users_router, prefix="/auth", tags=["users"])
 app.include_router(polls_router, prefix="/polls", tags=["polls"])
 app.include_router(votes_router, prefix="/votes", tags=["votes"])
@@ -45,24 +80,36 @@ app.include_router(analytics_router, prefix="/analytics", tags=["analytics"])
 app.include_router(admin_router, prefix="/admin", tags=["admin"])
 
 @app.websocket("/ws/{poll_id}")
-async def websocket_endpoint(websocket: WebSocket, poll_id: int):
-    await manager.connect(websocket, poll_id)
+async def websocket_endpoint(
+    websocket: WebSocket,
+    poll_id: int,
+    last_seq: Optional[int] = None,
+    user_id: Optional[int] = None,
+):
+    if not await manager.connect(websocket, poll_id, last_seq, user_id=user_id):
+        return
     try:
         while True:
             data = await websocket.receive_text()
-            # Echo back for now - can be extended for chat features
-            await manager.send_personal_message(f"Message: {data}", websocket)
+            await manager.handle_client_message(websocket, data)
     except WebSocketDisconnect:
-        manager.disconnect(websocket, poll_id)
+        pass
+    finally:
+        # Also on errors, so the socket does not linger until the idle reaper
+        manager.disconnect(websocket)
 
 @app.websocket("/ws")
-async def websocket_general(websocket: WebSocket):
-    await manager.connect(websocket)
+async def websocket_general(websocket: WebSocket, user_id: Optional[int] = None):
+    if not await manager.connect(websocket, user_id=user_id):
+        return
     try:
         while True:
             data = await websocket.receive_text()
-            await manager.broadcast_all({"message": data})
+            await manager.handle_client_message(websocket, data)
     except WebSocketDisconnect:
+        pass
+    finally:
+        # Also on errors, so the socket does not linger until the idle reaper
         manager.disconnect(websocket)
 
 @app.get("/")
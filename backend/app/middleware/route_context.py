@@ -0,0 +1,24 @@
+"""
+ASGI middleware that records the route being served.
+
+The value is read by the slow-query log so each slow statement can be traced
+back to the request that issued it.
+"""
+
+from app.db.profile import current_route
+
+class RouteContextMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        method = scope.get("method", "WS")
+        token = current_route.set(f"{method} {scope['path']}")
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_route.reset(token)
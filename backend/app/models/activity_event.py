@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from datetime import datetime, timezone
+from app.db.database import Base
+
+class ActivityEvent(Base):
+    """
+    Append-only log of votes, likes and poll creations for the activity feed.
+
+    Username and poll title are copied in when the event is written, so the
+    feed is read with a single query. Rows are never updated or deleted.
+    """
+    __tablename__ = "activity_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    type = Column(String(20), nullable=False)  # vote, like, created
+    user_id = Column(Integer, nullable=False)
+    username = Column(String(50), nullable=True)
+    poll_id = Column(Integer, nullable=True)
+    poll_title = Column(String(200), nullable=True)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+
+    # Backs the newest-first keyset pagination of the feed
+    __table_args__ = (
+        Index('idx_activity_events_created_at_id', 'created_at', 'id'),
+    )
@@ -0,0 +1,39 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index, UniqueConstraint
+from app.db.database import Base
+
+class PollActivityRollup(Base):
+    """
+    Votes, likes and poll creations of one poll within one hour or day.
+
+    Write paths add to the hourly row of the current hour; the compactor
+    folds hourly rows older than its retention into daily rows.
+    """
+    __tablename__ = "poll_activity_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    poll_id = Column(Integer, nullable=False)
+    granularity = Column(String(8), nullable=False)  # hour, day
+    bucket = Column(DateTime, nullable=False)  # naive UTC start of the hour or day
+    votes = Column(Integer, default=0, nullable=False)
+    likes = Column(Integer, default=0, nullable=False)
+    polls = Column(Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('poll_id', 'granularity', 'bucket', name='unique_poll_rollup_bucket'),
+        Index('idx_rollups_granularity_bucket', 'granularity', 'bucket'),
+    )
+
+class AnalyticsTotals(Base):
+    """
+    Platform-wide counts, kept in a single row with id 1. activities counts
+    the rows of activity_events.
+    """
+    __tablename__ = "analytics_totals"
+
+    id = Column(Integer, primary_key=True)
+    polls = Column(Integer, default=0, nullable=False)
+    active_polls = Column(Integer, default=0, nullable=False)
+    options = Column(Integer, default=0, nullable=False)
+    votes = Column(Integer, default=0, nullable=False)
+    likes = Column(Integer, default=0, nullable=False)
+    activities = Column(Integer, default=0, server_default="0", nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, UniqueConstraint
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Index, UniqueConstraint
 from datetime import datetime, timezone
 from sqlalchemy.orm import relationship
 from app.db.database import Base
@@ -11,8 +11,12 @@ class Like(Base):
     poll_id = Column(Integer, ForeignKey("polls.id"), nullable=False)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
-    # Ensure one like per user per poll
-    __table_args__ = (UniqueConstraint('user_id', 'poll_id', name='unique_user_poll_like'),)
+    # Ensure one like per user per poll; the created_at indexes serve trend queries
+    __table_args__ = (
+        UniqueConstraint('user_id', 'poll_id', name='unique_user_poll_like'),
+        Index('idx_likes_created_at', 'created_at'),
+        Index('idx_likes_poll_created_at', 'poll_id', 'created_at'),
+    )
 
     # relationships
     user = relationship("User", back_populates="likes")
@@ -10,6 +10,7 @@ class Option(Base):
     text = Column(String(500), nullable=False)
     poll_id = Column(Integer, ForeignKey("polls.id"), nullable=False)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    vote_count = Column(Integer, default=0, server_default="0", nullable=False)
 
     # relationships
     poll = relationship("Poll", back_populates="options")
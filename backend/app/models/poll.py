@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean, Index
 from datetime import datetime, timezone
 from sqlalchemy.orm import relationship
 from app.db.database import Base
@@ -14,6 +14,16 @@ class Poll(Base):
     updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
     is_active = Column(Boolean, default=True)
     closes_at = Column(DateTime, nullable=True)
+    total_votes = Column(Integer, default=0, server_default="0", nullable=False)
+    total_likes = Column(Integer, default=0, server_default="0", nullable=False)
+
+    # Composite indexes backing the keyset-paginated feed and its filters
+    __table_args__ = (
+        Index('idx_polls_created_at_id', 'created_at', 'id'),
+        Index('idx_polls_active_created_at_id', 'is_active', 'created_at', 'id'),
+        Index('idx_polls_creator_created_at_id', 'creator_id', 'created_at', 'id'),
+        Index('idx_polls_active_closes_at', 'is_active', 'closes_at'),
+    )
 
     # relationships
     creator = relationship("User", back_populates="polls")
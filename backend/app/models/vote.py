@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, UniqueConstraint
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Index, UniqueConstraint
 from datetime import datetime, timezone
 from sqlalchemy.orm import relationship
 from app.db.database import Base
@@ -11,9 +11,16 @@ class Vote(Base):
     poll_id = Column(Integer, ForeignKey("polls.id"), nullable=False)
     option_id = Column(Integer, ForeignKey("options.id"), nullable=False)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    # Option the vote pointed to before its last change; set by the vote upsert
+    # so the statement can report which counters to move
+    previous_option_id = Column(Integer, nullable=True)
 
-    # Ensure one vote per user per poll
-    __table_args__ = (UniqueConstraint('user_id', 'poll_id', name='unique_user_poll_vote'),)
+    # Ensure one vote per user per poll; the created_at indexes serve trend queries
+    __table_args__ = (
+        UniqueConstraint('user_id', 'poll_id', name='unique_user_poll_vote'),
+        Index('idx_votes_created_at', 'created_at'),
+        Index('idx_votes_poll_created_at', 'poll_id', 'created_at'),
+    )
 
     # relationships
     user = relationship("User", back_populates="votes")
@@ -5,10 +5,21 @@ All routes in this module require admin privileges.
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from app.db.database import get_db
+from sqlalchemy import func
+from app.db.database import get_db, run_in_session
 from app.models.user import User
 from app.middleware.auth import get_admin_from_header
 from app.utils.audit import get_admin_actions
+from app.services.poll_cache import poll_cache
+from app.services.poll_events import poll_events
+from app.services.leaderboard import leaderboard
+from app.services.presence import presence
+from app.services.rollup_compactor import rollup_compactor
+from app.services.single_flight import read_flights
+from app.services.write_pipeline import write_pipeline
+from app.websocket import manager
+from app.db.database import DB_PROFILE
+from app.db.profile import describe_profile, slow_query_log
 from typing import List, Optional
 
 router = APIRouter()
@@ -54,26 +65,29 @@ def get_all_users(
     return user_list
 
 @router.get("/stats")
-def get_platform_stats(
-    db: Session = Depends(get_db),
+async def get_platform_stats(
     admin_user: User = Depends(get_admin_from_header)
 ):
     """
     Get platform statistics. Admin only.
     
+    Concurrent requests share one load, and a recent result is served while
+    a newer one loads in the background.
+    
     Args:
-        db: Database session
         admin_user: Verified admin user from header
         
     Returns:
         Platform statistics
     """
+    return await read_flights.cached("platform_stats", lambda: run_in_session(_platform_stats))
+
+def _platform_stats(db: Session) -> dict:
     from app.models.poll import Poll
-    from app.models.vote import Vote
     
     total_users = db.query(User).count()
     total_polls = db.query(Poll).count()
-    total_votes = db.query(Vote).count()
+    total_votes = db.query(func.coalesce(func.sum(Poll.total_votes), 0)).scalar()
     
     return {
         "total_users": total_users,
@@ -122,3 +136,30 @@ def get_audit_log(
         "limit": limit,
         "offset": offset
     }
+
+
+@router.get("/metrics")
+def get_runtime_metrics(
+    admin_user: User = Depends(get_admin_from_header)
+):
+    """
+    Get in-process performance counters. Admin only.
+    
+    Args:
+        admin_user: Verified admin user from header
+        
+    Returns:
+        Counters for the caches and queues of this worker
+    """
+    return {
+        "db_profile": describe_profile(DB_PROFILE),
+        "slow_queries": slow_query_log.stats(),
+        "poll_cache": poll_cache.stats(),
+        "write_pipeline": write_pipeline.stats(),
+        "websocket": manager.stats(),
+        "poll_events": poll_events.stats(),
+        "presence": presence.stats(),
+        "rollups": rollup_compactor.stats(),
+        "leaderboard": leaderboard.stats(),
+        "read_flights": read_flights.stats(),
+    }
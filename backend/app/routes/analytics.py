@@ -1,14 +1,24 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy import and_, func, or_
 from datetime import datetime, timedelta, timezone
-from typing import List
-from app.db.database import get_db
+from typing import Dict, List, Literal, Optional, Tuple
+import base64
+import binascii
+import json
+import math
+from app.db.database import SessionLocal, get_db, run_in_session
 from app.models.poll import Poll
 from app.models.vote import Vote
 from app.models.like import Like
-from app.models.option import Option
-from app.models.user import User
+from app.models.activity_event import ActivityEvent
+from app.models.analytics_rollup import PollActivityRollup
+from app.services.leaderboard import leaderboard
+from app.services.rollup_compactor import rollup_compactor
+from app.services.single_flight import read_flights
+from app.utils.export import EXPORT_ENTITIES, as_naive_utc, stream_export
+from app.utils.rollups import BUCKET_LABEL_FORMATS, bucket_label, read_totals
 from app.schemas.analytics import (
     VoteTrendItem,
     VoteTrendResponse,
@@ -22,39 +32,45 @@ from app.schemas.analytics import (
 
 router = APIRouter()
 
+TrendGranularity = Literal["minute", "hour", "day"]
+
+LeaderboardWindow = Literal["hour", "day", "week"]
+
+ExportEntity = Literal["polls", "options", "votes", "likes"]
+
+ExportFormat = Literal["ndjson", "csv"]
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+TREND_STEPS = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+
+MAX_TREND_BUCKETS = 10000
+
 @router.get("/dashboard", response_model=AnalyticsDashboardResponse)
-def get_analytics_dashboard(db: Session = Depends(get_db)):
-    """Get all analytics data for the dashboard."""
-    
-    # Get engagement metrics
-    total_polls = db.query(Poll).count()
-    active_polls = db.query(Poll).filter(Poll.is_active == True).count()
-    closed_polls = total_polls - active_polls
-    total_votes = db.query(Vote).count()
-    total_likes = db.query(Like).count()
-    
-    # Calculate averages
-    avg_votes_per_poll = total_votes / total_polls if total_polls > 0 else 0
-    total_options = db.query(Option).count()
-    avg_options_per_poll = total_options / total_polls if total_polls > 0 else 0
-    participation_rate = (total_votes / (total_polls * 100)) * 100 if total_polls > 0 else 0
-    
-    metrics = EngagementMetrics(
-        total_polls=total_polls,
-        active_polls=active_polls,
-        closed_polls=closed_polls,
-        total_votes=total_votes,
-        total_likes=total_likes,
-        avg_votes_per_poll=round(avg_votes_per_poll, 2),
-        avg_options_per_poll=round(avg_options_per_poll, 2),
-        participation_rate=round(participation_rate, 2),
-    )
+async def get_analytics_dashboard():
+    """
+    Get all analytics data for the dashboard.
+
+    Concurrent requests share one load, and a recent result is served while
+    a newer one loads in the background.
+    """
+    return await read_flights.cached("analytics_dashboard", lambda: run_in_session(_analytics_dashboard))
+
+def _analytics_dashboard(db: Session) -> AnalyticsDashboardResponse:
+    metrics = _engagement_metrics(db)
     
     # Get vote trends for last 7 days
     vote_trends = get_vote_trends(db, days=7)
     
     # Get recent activities
-    recent_activities = get_recent_activities(db, limit=20)
+    recent_activities, _ = get_recent_activities(db, limit=20)
     
     return AnalyticsDashboardResponse(
         metrics=metrics,
@@ -63,166 +79,263 @@ def get_analytics_dashboard(db: Session = Depends(get_db)):
     )
 
 @router.get("/vote-trends", response_model=VoteTrendResponse)
-def get_vote_trends_endpoint(days: int = 7, db: Session = Depends(get_db)):
-    """Get vote trends for the specified number of days."""
-    trends = get_vote_trends(db, days=days)
-    return VoteTrendResponse(trends=trends)
-
-def get_vote_trends(db: Session, days: int = 7) -> List[VoteTrendItem]:
-    """Helper function to calculate vote trends."""
-    today = datetime.now(timezone.utc).date()
+def get_vote_trends_endpoint(
+    days: int = Query(7, ge=1, le=3650),
+    hours: Optional[int] = Query(None, ge=1, description="Window in hours, overrides days"),
+    granularity: TrendGranularity = Query("day"),
+    poll_id: Optional[int] = Query(None),
+    db: Session = Depends(get_db),
+):
+    """Get vote, poll and like counts per minute, hour or day."""
+    trends = get_vote_trends(db, days=days, granularity=granularity, poll_id=poll_id, hours=hours)
+    return VoteTrendResponse(trends=trends, granularity=granularity)
+
+def get_vote_trends(
+    db: Session,
+    days: int = 7,
+    granularity: str = "day",
+    poll_id: Optional[int] = None,
+    hours: Optional[int] = None,
+) -> List[VoteTrendItem]:
+    """
+    Count votes, polls and likes per bucket, zero-filling buckets without
+    activity. The last bucket is the current one.
+
+    Day buckets, and hour buckets inside the hourly rollup retention, come
+    from poll_activity_rollups in one grouped query. Minute buckets and
+    older hour buckets are counted from the raw tables.
+    """
+    step = TREND_STEPS[granularity]
+    window = timedelta(hours=hours) if hours else timedelta(days=days)
+    buckets = max(1, math.ceil(window / step))
+    if buckets > MAX_TREND_BUCKETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Window spans {buckets} buckets, the limit is {MAX_TREND_BUCKETS}. Use a coarser granularity.",
+        )
+
+    # Timestamps are stored as naive UTC
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    if granularity == "day":
+        current = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    elif granularity == "hour":
+        current = now.replace(minute=0, second=0, microsecond=0)
+    else:
+        current = now.replace(second=0, microsecond=0)
+    start = current - step * (buckets - 1)
+
+    if granularity == "day" or (granularity == "hour" and start >= rollup_compactor.hourly_cutoff(now)):
+        votes, polls, likes = _rollup_counts(db, start, granularity, poll_id)
+    else:
+        votes = _count_by_bucket(db, Vote.created_at, Vote.poll_id, start, granularity, poll_id)
+        polls = _count_by_bucket(db, Poll.created_at, Poll.id, start, granularity, poll_id)
+        likes = _count_by_bucket(db, Like.created_at, Like.poll_id, start, granularity, poll_id)
+
+    label_format = BUCKET_LABEL_FORMATS[granularity]
     trends = []
-    
-    for i in range(days):
-        date = today - timedelta(days=days - 1 - i)
-        date_start = datetime.combine(date, datetime.min.time())
-        date_end = datetime.combine(date, datetime.max.time())
-        
-        # Count new polls created on this date
-        polls_count = db.query(Poll).filter(
-            Poll.created_at >= date_start,
-            Poll.created_at <= date_end
-        ).count()
-        
-        # Count votes on this date
-        votes_count = db.query(Vote).filter(
-            Vote.created_at >= date_start,
-            Vote.created_at <= date_end
-        ).count()
-        
+    for i in range(buckets):
+        label = (start + step * i).strftime(label_format)
         trends.append(VoteTrendItem(
-            date=date.isoformat(),
-            votes=votes_count,
-            polls=polls_count,
+            date=label,
+            votes=votes.get(label, 0),
+            polls=polls.get(label, 0),
+            likes=likes.get(label, 0),
         ))
-    
     return trends
 
+def _rollup_counts(db: Session, start: datetime, granularity: str, poll_id: Optional[int]):
+    """
+    Vote, poll and like counts per bucket label since start, summed from the
+    hourly and daily rollup rows in a single GROUP BY query.
+    """
+    bucket = bucket_label(db, PollActivityRollup.bucket, granularity)
+    query = db.query(
+        bucket,
+        func.sum(PollActivityRollup.votes),
+        func.sum(PollActivityRollup.polls),
+        func.sum(PollActivityRollup.likes),
+    ).filter(PollActivityRollup.bucket >= start)
+    if granularity == "hour":
+        query = query.filter(PollActivityRollup.granularity == "hour")
+    if poll_id is not None:
+        query = query.filter(PollActivityRollup.poll_id == poll_id)
+
+    votes, polls, likes = {}, {}, {}
+    for label, vote_count, poll_count, like_count in query.group_by(bucket):
+        votes[label] = vote_count
+        polls[label] = poll_count
+        likes[label] = like_count
+    return votes, polls, likes
+
+def _count_by_bucket(
+    db: Session,
+    created_at,
+    poll_column,
+    start: datetime,
+    granularity: str,
+    poll_id: Optional[int],
+) -> Dict[str, int]:
+    """
+    Row counts per bucket label since start, in a single GROUP BY query.
+    """
+    bucket = bucket_label(db, created_at, granularity)
+    query = db.query(bucket, func.count()).filter(created_at >= start)
+    if poll_id is not None:
+        query = query.filter(poll_column == poll_id)
+    return dict(query.group_by(bucket).all())
+
 @router.get("/activities", response_model=ActivityFeedResponse)
-def get_activities(limit: int = 50, offset: int = 0, db: Session = Depends(get_db)):
-    """Get recent activities (votes, likes, poll creations)."""
-    activities = get_recent_activities(db, limit=limit, offset=offset)
+def get_activities(
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    db: Session = Depends(get_db),
+):
+    """Get recent activities (votes, likes, poll creations), newest first."""
+    activities, next_cursor = get_recent_activities(db, limit=limit, before=before)
     total = get_total_activities_count(db)
     
     return ActivityFeedResponse(
         activities=activities,
         total=total,
+        next_cursor=next_cursor,
     )
 
-def get_recent_activities(db: Session, limit: int = 50, offset: int = 0) -> List[ActivityItem]:
-    """Helper function to get recent activities."""
-    activities = []
-    
-    # Get recent votes
-    recent_votes = db.query(Vote).order_by(desc(Vote.created_at)).offset(offset).limit(limit).all()
-    for vote in recent_votes:
-        poll = db.query(Poll).filter(Poll.id == vote.poll_id).first()
-        user = db.query(User).filter(User.id == vote.user_id).first()
-        activities.append(ActivityItem(
-            id=f"vote_{vote.id}",
-            type="vote",
-            user_id=vote.user_id,
-            username=user.username if user else f"user_{vote.user_id}",
-            poll_id=vote.poll_id,
-            poll_title=poll.title if poll else None,
-            timestamp=vote.created_at.isoformat() if vote.created_at else datetime.now(timezone.utc).isoformat(),
-        ))
-    
-    # Get recent likes
-    recent_likes = db.query(Like).order_by(desc(Like.created_at)).offset(offset).limit(limit).all()
-    for like in recent_likes:
-        poll = db.query(Poll).filter(Poll.id == like.poll_id).first()
-        user = db.query(User).filter(User.id == like.user_id).first()
-        activities.append(ActivityItem(
-            id=f"like_{like.id}",
-            type="like",
-            user_id=like.user_id,
-            username=user.username if user else f"user_{like.user_id}",
-            poll_id=like.poll_id,
-            poll_title=poll.title if poll else None,
-            timestamp=like.created_at.isoformat() if like.created_at else datetime.now(timezone.utc).isoformat(),
-        ))
-    
-    # Get recent poll creations
-    recent_polls = db.query(Poll).order_by(desc(Poll.created_at)).offset(offset).limit(limit).all()
-    for poll in recent_polls:
-        user = db.query(User).filter(User.id == poll.creator_id).first()
-        activities.append(ActivityItem(
-            id=f"created_{poll.id}",
-            type="created",
-            user_id=poll.creator_id,
-            username=user.username if user else f"user_{poll.creator_id}",
-            poll_id=poll.id,
-            poll_title=poll.title,
-            timestamp=poll.created_at.isoformat() if poll.created_at else datetime.now(timezone.utc).isoformat(),
+def _encode_activity_cursor(event: ActivityEvent) -> str:
+    raw = json.dumps({"created_at": event.created_at.isoformat(), "id": event.id})
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_activity_cursor(cursor: str):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(data["created_at"]), int(data["id"])
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def get_recent_activities(
+    db: Session, limit: int = 50, before: Optional[str] = None
+) -> Tuple[List[ActivityItem], Optional[str]]:
+    """
+    One page of the activity log with keyset pagination on (created_at, id).
+
+    Returns:
+        The activities and the cursor of the next page, None on the last page
+    """
+    query = db.query(ActivityEvent)
+    if before:
+        created_at, event_id = _decode_activity_cursor(before)
+        query = query.filter(or_(
+            ActivityEvent.created_at < created_at,
+            and_(ActivityEvent.created_at == created_at, ActivityEvent.id < event_id),
         ))
-    
-    # Sort all activities by timestamp and limit
-    activities.sort(key=lambda x: x.timestamp, reverse=True)
-    return activities[:limit]
+
+    # Fetch one extra row to know whether another page exists
+    events = query.order_by(ActivityEvent.created_at.desc(), ActivityEvent.id.desc()).limit(limit + 1).all()
+    next_cursor = _encode_activity_cursor(events[limit - 1]) if len(events) > limit else None
+
+    activities = [
+        ActivityItem(
+            id=f"{event.type}_{event.id}",
+            type=event.type,
+            user_id=event.user_id,
+            username=event.username or f"user_{event.user_id}",
+            poll_id=event.poll_id,
+            poll_title=event.poll_title,
+            timestamp=event.created_at,
+        )
+        for event in events[:limit]
+    ]
+    return activities, next_cursor
 
 def get_total_activities_count(db: Session) -> int:
     """Get total count of all activities."""
-    votes_count = db.query(Vote).count()
-    likes_count = db.query(Like).count()
-    polls_count = db.query(Poll).count()
-    return votes_count + likes_count + polls_count
+    return read_totals(db).activities
 
 @router.get("/metrics", response_model=EngagementMetrics)
 def get_engagement_metrics(db: Session = Depends(get_db)):
     """Get engagement metrics."""
-    total_polls = db.query(Poll).count()
-    active_polls = db.query(Poll).filter(Poll.is_active == True).count()
-    closed_polls = total_polls - active_polls
-    total_votes = db.query(Vote).count()
-    total_likes = db.query(Like).count()
+    return _engagement_metrics(db)
+
+def _engagement_metrics(db: Session) -> EngagementMetrics:
+    """Engagement metrics from the analytics_totals row, without scanning polls."""
+    totals = read_totals(db)
+    total_polls = totals.polls
+    total_votes = totals.votes
     
     avg_votes_per_poll = total_votes / total_polls if total_polls > 0 else 0
-    total_options = db.query(Option).count()
-    avg_options_per_poll = total_options / total_polls if total_polls > 0 else 0
+    avg_options_per_poll = totals.options / total_polls if total_polls > 0 else 0
     participation_rate = (total_votes / (total_polls * 100)) * 100 if total_polls > 0 else 0
     
     return EngagementMetrics(
         total_polls=total_polls,
-        active_polls=active_polls,
-        closed_polls=closed_polls,
+        active_polls=totals.active_polls,
+        closed_polls=total_polls - totals.active_polls,
         total_votes=total_votes,
-        total_likes=total_likes,
+        total_likes=totals.likes,
         avg_votes_per_poll=round(avg_votes_per_poll, 2),
         avg_options_per_poll=round(avg_options_per_poll, 2),
         participation_rate=round(participation_rate, 2),
     )
 
 @router.get("/top-polls", response_model=TopPollsResponse)
-def get_top_polls(db: Session = Depends(get_db)):
-    """Get top performing polls by engagement."""
-    # Get all polls with their vote and like counts
-    polls = db.query(Poll).all()
-    
-    top_polls = []
-    for poll in polls:
-        votes_count = db.query(Vote).filter(Vote.poll_id == poll.id).count()
-        likes_count = db.query(Like).filter(Like.poll_id == poll.id).count()
-        
-        # Calculate engagement rate (votes + likes) / time since creation
-        if poll.created_at:
-            now = datetime.now(timezone.utc)
-            age_days = (now - poll.created_at.replace(tzinfo=timezone.utc)).days
-            age_days = max(age_days, 1)  # Avoid division by zero
-            engagement_rate = ((votes_count + likes_count) / age_days) * 10  # Rate per 10 days
-        else:
-            engagement_rate = 0
-        
-        top_polls.append(PollEngagementItem(
-            poll_id=poll.id,
-            title=poll.title,
-            votes=votes_count,
-            likes=likes_count,
-            engagement_rate=round(min(engagement_rate, 100), 1),  # Cap at 100%
-            created_at=poll.created_at.isoformat() if poll.created_at else datetime.now(timezone.utc).isoformat(),
-        ))
-    
-    # Sort by engagement rate descending
-    top_polls.sort(key=lambda x: x.engagement_rate, reverse=True)
-    
-    return TopPollsResponse(polls=top_polls[:10])
+async def get_top_polls(
+    window: LeaderboardWindow = Query("day"),
+    limit: int = Query(10, ge=1, le=100),
+):
+    """
+    Get top performing polls by time-decayed engagement (votes + likes).
+
+    Served from the in-memory leaderboard. The database is only read for
+    polls whose engagement the leaderboard has not loaded yet.
+    """
+    await leaderboard.ready()
+    polls = [
+        PollEngagementItem(
+            poll_id=item["poll_id"],
+            title=item["title"],
+            votes=item["votes"],
+            likes=item["likes"],
+            score=round(item["score"], 2),
+            engagement_rate=round(item["share"], 1),
+            created_at=item["created_at"].isoformat() if item["created_at"] else datetime.now(timezone.utc).isoformat(),
+        )
+        for item in leaderboard.top(window, limit)
+    ]
+    return TopPollsResponse(polls=polls, window=window)
+
+@router.get("/export")
+def export_data(
+    entity: Optional[List[ExportEntity]] = Query(None, description="Repeatable; defaults to all for NDJSON"),
+    export_format: ExportFormat = Query("ndjson", alias="format"),
+    poll_id: Optional[int] = Query(None),
+    since: Optional[datetime] = Query(None, description="Created at or after"),
+    until: Optional[datetime] = Query(None, description="Created before"),
+    gzip: bool = Query(False),
+):
+    """
+    Stream polls, options, votes and likes as NDJSON or CSV.
+
+    Rows are read in batches from a server-side cursor and sent as they are
+    encoded, so memory use stays flat however many rows match.
+    """
+    entities = list(dict.fromkeys(entity or EXPORT_ENTITIES))
+    if export_format == "csv" and len(entities) != 1:
+        raise HTTPException(status_code=400, detail="CSV exports take exactly one entity")
+    since, until = as_naive_utc(since), as_naive_utc(until)
+    if since and until and since >= until:
+        raise HTTPException(status_code=400, detail="since must be before until")
+
+    filename = f"quickpoll-{'-'.join(entities)}.{export_format}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        _export_chunks(entities, export_format, poll_id, since, until, gzip),
+        media_type="application/gzip" if gzip else EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+def _export_chunks(entities, export_format, poll_id, since, until, compress):
+    # Runs in the threadpool as the response streams, with a session of its
+    # own: the request's session is closed before the body is sent
+    db = SessionLocal()
+    try:
+        yield from stream_export(db, entities, export_format, poll_id, since, until, compress)
+    finally:
+        db.close()
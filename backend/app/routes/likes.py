@@ -1,23 +1,60 @@
 from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from typing import Union
-from app.db.database import get_db
+from typing import Optional, Tuple, Union
+from app.db.database import get_db, get_session, run_db
 from app.models.like import Like
 from app.models.poll import Poll
 from app.schemas.like import LikeCreate, LikeResponse, LikeToggleMessage
-from app.websocket import manager
+from app.utils.counters import apply_like_counter, read_poll_delta
+from app.utils.activity_log import record_event
+from app.utils.rollups import adjust_totals, record_activity
+from app.services.poll_cache import poll_cache
+from app.services.write_pipeline import write_pipeline
+from app.services.poll_events import poll_events
 
 router = APIRouter()
 
+# Response and the poll delta for the poll_updated event
+LikeToggleResult = Tuple[Union[LikeResponse, LikeToggleMessage], Optional[dict]]
+
 @router.post("/", response_model=Union[LikeResponse, LikeToggleMessage])
-def toggle_like(
+async def toggle_like(
     like: LikeCreate,
     user_id: int,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db=Depends(get_session),
 ):
+    if write_pipeline.enabled:
+        result, delta = await write_pipeline.submit(
+            apply_like_toggle, like, user_id, conflict_detail="Like already exists"
+        )
+    else:
+        result, delta = await run_db(db, _toggle_like, like, user_id)
 
+    poll_cache.invalidate(like.poll_id)
+    background_tasks.add_task(
+        poll_events.publish,
+        {"type": "poll_updated", "poll_id": like.poll_id, "delta": delta},
+    )
+    return result
+
+def _toggle_like(db: Session, like: LikeCreate, user_id: int) -> LikeToggleResult:
+    try:
+        result = apply_like_toggle(db, like, user_id)
+        db.commit()
+        return result
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Like already exists"
+        )
+
+def apply_like_toggle(db: Session, like: LikeCreate, user_id: int) -> LikeToggleResult:
+    """
+    Stage a like or unlike and its counter update without committing.
+    """
     # Verify poll exists
     db_poll = db.query(Poll).filter(Poll.id == like.poll_id).first()
     if not db_poll:
@@ -31,39 +68,25 @@ def toggle_like(
     
     if existing_like:
         # Unlike - remove the like
-        poll_id = existing_like.poll_id
+        apply_like_counter(db, like.poll_id, -1)
+        record_activity(db, like.poll_id, existing_like.created_at, likes=-1)
+        adjust_totals(db, likes=-1)
         db.delete(existing_like)
-        db.commit()
-        background_tasks.add_task(
-            manager.broadcast_to_poll,
-            {"type": "poll_updated", "poll_id": poll_id},
-            poll_id,
-        )
-        return LikeToggleMessage(message="Like removed", liked=False)
-
-    else:
-        # Like - add the like
-        try:
-            db_like = Like(
-                user_id=user_id,
-                poll_id=like.poll_id
-            )
-            db.add(db_like)
-            db.commit()
-            db.refresh(db_like)
-            background_tasks.add_task(
-                manager.broadcast_to_poll,
-                {"type": "poll_updated", "poll_id": db_like.poll_id},
-                db_like.poll_id,
-            )
-            return db_like
+        db.flush()
+        return LikeToggleMessage(message="Like removed", liked=False), read_poll_delta(db, like.poll_id)
 
-        except IntegrityError:
-            db.rollback()
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Like already exists"
-            )
+    # Like - add the like
+    db_like = Like(
+        user_id=user_id,
+        poll_id=like.poll_id
+    )
+    db.add(db_like)
+    apply_like_counter(db, like.poll_id, 1)
+    db.flush()
+    record_activity(db, like.poll_id, db_like.created_at, likes=1)
+    adjust_totals(db, likes=1)
+    record_event(db, "like", user_id, like.poll_id, db_like.created_at)
+    return LikeResponse.model_validate(db_like), read_poll_delta(db, like.poll_id)
 
 @router.get("/poll/{poll_id}")
 def get_poll_likes(poll_id: int, db: Session = Depends(get_db)):
@@ -1,14 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
 from sqlalchemy.orm import Session
+from sqlalchemy import func
+from datetime import datetime
 from app.db.database import get_db
 from app.models.option import Option
 from app.models.poll import Poll
+from app.models.vote import Vote
 from app.schemas.poll import OptionCreate, OptionResponse
+from app.utils.counters import remove_option_votes
+from app.utils.rollups import BUCKET_LABEL_FORMATS, adjust_totals, bucket_label, record_activities
+from app.services.poll_cache import poll_cache
+from app.services.poll_events import poll_events
 
 router = APIRouter()
 
 @router.post("/", response_model=OptionResponse)
-def create_option(option: OptionCreate, poll_id: int, user_id: int, db: Session = Depends(get_db)):
+def create_option(
+    option: OptionCreate,
+    poll_id: int,
+    user_id: int,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+):
     # Verify poll exists and user is creator
     db_poll = db.query(Poll).filter(Poll.id == poll_id).first()
     if not db_poll:
@@ -19,8 +32,12 @@ def create_option(option: OptionCreate, poll_id: int, user_id: int, db: Session
     
     db_option = Option(text=option.text, poll_id=poll_id)
     db.add(db_option)
+    adjust_totals(db, options=1)
     db.commit()
     db.refresh(db_option)
+    poll_cache.invalidate(poll_id)
+    # The option list changed, which a delta cannot express
+    background_tasks.add_task(poll_events.publish, {"type": "poll_updated", "poll_id": poll_id})
     
     return OptionResponse(
         id=db_option.id,
@@ -36,7 +53,12 @@ def get_poll_options(poll_id: int, db: Session = Depends(get_db)):
     return options
 
 @router.delete("/{option_id}")
-def delete_option(option_id: int, user_id: int, db: Session = Depends(get_db)):
+def delete_option(
+    option_id: int,
+    user_id: int,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+):
     db_option = db.query(Option).filter(Option.id == option_id).first()
     if not db_option:
         raise HTTPException(status_code=404, detail="Option not found")
@@ -46,6 +68,20 @@ def delete_option(option_id: int, user_id: int, db: Session = Depends(get_db)):
     if db_poll.creator_id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this option")
     
+    # Votes on this option are deleted with it, without loading them
+    vote_count = db_option.vote_count or 0
+    hour = bucket_label(db, Vote.created_at, "hour")
+    hourly_votes = db.query(hour, func.count()).filter(Vote.option_id == option_id).group_by(hour).all()
+    record_activities(db, (
+        (db_poll.id, datetime.strptime(label, BUCKET_LABEL_FORMATS["hour"]), -count, 0, 0)
+        for label, count in hourly_votes
+        if label is not None
+    ))
+    remove_option_votes(db, db_poll.id, vote_count)
+    adjust_totals(db, options=-1, votes=-vote_count)
+    db.query(Vote).filter(Vote.option_id == option_id).delete(synchronize_session=False)
     db.delete(db_option)
     db.commit()
+    poll_cache.invalidate(db_poll.id)
+    background_tasks.add_task(poll_events.publish, {"type": "poll_updated", "poll_id": db_poll.id})
     return {"message": "Option deleted successfully"}
\ No newline at end of file
@@ -2,25 +2,42 @@ from fastapi import (
     APIRouter,
     BackgroundTasks,
     Depends,
+    Header,
     HTTPException,
     Query,
+    Request,
     status,
 )
+from fastapi.responses import StreamingResponse
 from datetime import datetime, timedelta, timezone
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List, Optional
-from app.db.database import get_db
+from sqlalchemy.orm import Session, Query as SAQuery
+from sqlalchemy import and_, func, or_
+from typing import Dict, List, Literal, Optional
+import base64
+import binascii
+import json
+import os
+from app.db.database import get_db, get_session, run_db, run_in_session
 from app.models.poll import Poll
 from app.models.option import Option
 from app.models.vote import Vote
 from app.models.like import Like
 from app.models.user import User
-from app.schemas.poll import PollCreate, PollResponse, PollUpdate, OptionResponse
-from app.websocket import manager
+from app.schemas.poll import PollCreate, PollFeedResponse, PollResponse, PollUpdate, OptionResponse
+from app.services.poll_cache import poll_cache
+from app.services.expiry_scheduler import expiry_scheduler
+from app.services.poll_events import poll_events
+from app.services.presence import presence
+from app.services.single_flight import read_flights
+from app.utils.activity_log import record_event
+from app.utils.rollups import adjust_totals, record_activity, remove_poll_rollups
+from app.websocket import manager, parse_event_id
 
 router = APIRouter()
 
+# How long browsers wait before reconnecting a dropped event stream
+SSE_RETRY_MS = int(os.getenv("SSE_RETRY_MS", "3000"))
+
 @router.post("/", response_model=PollResponse)
 def create_poll(
     poll: PollCreate,
@@ -48,34 +65,192 @@ def create_poll(
     for option_text in poll.options:
         db_option = Option(text=option_text, poll_id=db_poll.id)
         db.add(db_option)
-    
+
+    record_activity(db, db_poll.id, db_poll.created_at, polls=1)
+    adjust_totals(db, polls=1, active_polls=1, options=len(poll.options))
+    record_event(db, "created", creator_id, db_poll.id, db_poll.created_at)
     db.commit()
+    expiry_scheduler.schedule(db_poll.id, db_poll.closes_at)
 
+    # Nobody is subscribed to a new poll yet, so tell every client
     background_tasks.add_task(
-        manager.broadcast_all,
-        {"type": "poll_updated", "poll_id": db_poll.id},
-    )
-    background_tasks.add_task(
-        manager.broadcast_to_poll,
+        poll_events.publish,
         {"type": "poll_updated", "poll_id": db_poll.id},
-        db_poll.id,
+        everyone=True,
     )
 
     return get_poll_with_stats(db_poll.id, db, creator_id)
 
+PollStatus = Literal["active", "closed"]
+
+def _encode_cursor(poll: Poll) -> str:
+    raw = json.dumps({"created_at": poll.created_at.isoformat(), "id": poll.id})
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_cursor(cursor: str):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(data["created_at"]), int(data["id"])
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _filter_polls(
+    query: SAQuery,
+    poll_status: Optional[str],
+    creator_id: Optional[int],
+    closing_within_minutes: Optional[int],
+) -> SAQuery:
+    # Timestamps are stored as naive UTC
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    is_open = and_(
+        Poll.is_active == True,
+        or_(Poll.closes_at.is_(None), Poll.closes_at > now),
+    )
+
+    if poll_status == "active":
+        query = query.filter(is_open)
+    elif poll_status == "closed":
+        query = query.filter(~is_open)
+
+    if creator_id is not None:
+        query = query.filter(Poll.creator_id == creator_id)
+
+    if closing_within_minutes is not None:
+        query = query.filter(
+            Poll.is_active == True,
+            Poll.closes_at > now,
+            Poll.closes_at <= now + timedelta(minutes=closing_within_minutes),
+        )
+
+    return query
+
 @router.get("/", response_model=List[PollResponse])
-def get_polls(
+async def get_polls(
     skip: int = 0, 
     limit: int = 100, 
     user_id: Optional[int] = Query(None),
-    db: Session = Depends(get_db)
+    poll_status: Optional[PollStatus] = Query(None, alias="status"),
+    creator_id: Optional[int] = Query(None),
+    closing_within_minutes: Optional[int] = Query(None, ge=1),
+    db=Depends(get_session)
 ):
-    polls = db.query(Poll).offset(skip).limit(limit).all()
-    return [get_poll_with_stats(poll.id, db, user_id) for poll in polls]
+    return await run_db(
+        db, _get_polls, skip, limit, user_id, poll_status, creator_id, closing_within_minutes
+    )
+
+def _get_polls(
+    db: Session,
+    skip: int,
+    limit: int,
+    user_id: Optional[int],
+    poll_status: Optional[str],
+    creator_id: Optional[int],
+    closing_within_minutes: Optional[int],
+):
+    query = _filter_polls(db.query(Poll), poll_status, creator_id, closing_within_minutes)
+    polls = query.order_by(Poll.created_at.desc(), Poll.id.desc()).offset(skip).limit(limit).all()
+    return get_polls_with_stats(polls, db, user_id)
+
+@router.get("/feed", response_model=PollFeedResponse)
+async def get_poll_feed(
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    user_id: Optional[int] = Query(None),
+    poll_status: Optional[PollStatus] = Query(None, alias="status"),
+    creator_id: Optional[int] = Query(None),
+    closing_within_minutes: Optional[int] = Query(None, ge=1),
+    db=Depends(get_session),
+):
+    """
+    Newest-first poll feed with keyset pagination on (created_at, id).
+
+    Pass the returned next_cursor back as cursor to get the following page.
+    Every page costs the same index range scan, however deep it is.
+    """
+    return await run_db(
+        db, _get_poll_feed, cursor, limit, user_id, poll_status, creator_id, closing_within_minutes
+    )
+
+def _get_poll_feed(
+    db: Session,
+    cursor: Optional[str],
+    limit: int,
+    user_id: Optional[int],
+    poll_status: Optional[str],
+    creator_id: Optional[int],
+    closing_within_minutes: Optional[int],
+):
+    query = _filter_polls(db.query(Poll), poll_status, creator_id, closing_within_minutes)
+
+    if cursor:
+        created_at, poll_id = _decode_cursor(cursor)
+        query = query.filter(or_(
+            Poll.created_at < created_at,
+            and_(Poll.created_at == created_at, Poll.id < poll_id),
+        ))
+
+    # Fetch one extra row to know whether another page exists
+    polls = query.order_by(Poll.created_at.desc(), Poll.id.desc()).limit(limit + 1).all()
+    next_cursor = _encode_cursor(polls[limit - 1]) if len(polls) > limit else None
+
+    return PollFeedResponse(
+        items=get_polls_with_stats(polls[:limit], db, user_id),
+        next_cursor=next_cursor,
+    )
+
+@router.get("/stream")
+async def stream_polls(
+    request: Request,
+    poll_ids: str = Query(..., description="Comma separated poll ids"),
+    last_event_id: Optional[str] = Header(None),
+):
+    """
+    Server-Sent Events with the live events of several polls.
+    """
+    try:
+        ids = list(dict.fromkeys(int(poll_id) for poll_id in poll_ids.split(",") if poll_id.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="poll_ids must be comma separated integers")
+    if not ids or len(ids) > manager.max_stream_polls:
+        raise HTTPException(
+            status_code=400, detail=f"Stream between 1 and {manager.max_stream_polls} polls"
+        )
+    return await _open_event_stream(request, ids, last_event_id)
+
+@router.get("/{poll_id}/stream")
+async def stream_poll(poll_id: int, request: Request, last_event_id: Optional[str] = Header(None)):
+    """
+    Server-Sent Events with the live events of one poll, a lighter
+    read-only alternative to /ws/{poll_id}.
+    """
+    # Served from poll_cache when possible; no session is held open by the stream
+    if await load_poll_snapshot(poll_id) is None:
+        raise HTTPException(status_code=404, detail="Poll not found")
+    return await _open_event_stream(request, [poll_id], last_event_id)
+
+async def _open_event_stream(request: Request, poll_ids: List[int], last_event_id: Optional[str]):
+    last_seqs = parse_event_id(last_event_id, poll_ids)
+    if last_seqs is None:
+        raise HTTPException(status_code=400, detail="Malformed Last-Event-ID")
+    stream = await manager.open_stream(request, poll_ids, last_seqs)
+    if stream is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many connections")
+
+    return StreamingResponse(
+        stream.frames(SSE_RETRY_MS),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @router.get("/{poll_id}", response_model=PollResponse)
-def get_poll(poll_id: int, user_id: Optional[int] = Query(None), db: Session = Depends(get_db)):
-    return get_poll_with_stats(poll_id, db, user_id)
+async def get_poll(poll_id: int, user_id: Optional[int] = Query(None), db=Depends(get_session)):
+    snapshot = await poll_snapshot(poll_id)
+    if not user_id:
+        return _apply_user_state([snapshot], db, None)[0]
+    return await run_db(db, _get_poll, snapshot, user_id)
+
+def _get_poll(db: Session, snapshot: PollResponse, user_id: int):
+    return _apply_user_state([snapshot], db, user_id)[0]
 
 @router.put("/{poll_id}", response_model=PollResponse)
 def update_poll(
@@ -96,23 +271,24 @@ def update_poll(
         db_poll.title = poll_update.title
     if poll_update.description is not None:
         db_poll.description = poll_update.description
-    if poll_update.is_active is not None:
+    if poll_update.is_active is not None and poll_update.is_active != db_poll.is_active:
         db_poll.is_active = poll_update.is_active
+        adjust_totals(db, active_polls=1 if poll_update.is_active else -1)
     if poll_update.closes_at is not None:
         db_poll.closes_at = poll_update.closes_at
 
     db.commit()
     db.refresh(db_poll)
+    poll_cache.invalidate(poll_id)
+    if db_poll.is_active:
+        expiry_scheduler.schedule(poll_id, db_poll.closes_at)
+    else:
+        expiry_scheduler.unschedule(poll_id)
 
     background_tasks.add_task(
-        manager.broadcast_all,
+        poll_events.publish,
         {"type": "poll_updated", "poll_id": poll_id},
     )
-    background_tasks.add_task(
-        manager.broadcast_to_poll,
-        {"type": "poll_updated", "poll_id": poll_id},
-        poll_id,
-    )
 
     return get_poll_with_stats(poll_id, db, user_id)
 
@@ -135,17 +311,15 @@ def close_poll(
         return get_poll_with_stats(poll_id, db, user_id)
 
     db_poll.is_active = False
+    adjust_totals(db, active_polls=-1)
     db.commit()
     db.refresh(db_poll)
+    poll_cache.invalidate(poll_id)
+    expiry_scheduler.unschedule(poll_id)
 
     background_tasks.add_task(
-        manager.broadcast_all,
-        {"type": "poll_closed", "poll_id": poll_id},
-    )
-    background_tasks.add_task(
-        manager.broadcast_to_poll,
-        {"type": "poll_closed", "poll_id": poll_id},
-        poll_id,
+        poll_events.publish,
+        {"type": "poll_closed", "poll_id": poll_id, "delta": {"is_active": False}},
     )
 
     return get_poll_with_stats(poll_id, db, user_id)
@@ -164,82 +338,171 @@ def delete_poll(
     if db_poll.creator_id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this poll")
     
+    # Its options, votes and likes are deleted with it
+    adjust_totals(
+        db,
+        polls=-1,
+        active_polls=-1 if db_poll.is_active else 0,
+        options=-len(db_poll.options),
+        votes=-db_poll.total_votes,
+        likes=-db_poll.total_likes,
+    )
+    remove_poll_rollups(db, poll_id)
     db.delete(db_poll)
     db.commit()
+    poll_cache.forget(poll_id)
+    expiry_scheduler.unschedule(poll_id)
 
     background_tasks.add_task(
-        manager.broadcast_all,
-        {"type": "poll_deleted", "poll_id": poll_id},
-    )
-    background_tasks.add_task(
-        manager.broadcast_to_poll,
+        poll_events.publish,
         {"type": "poll_deleted", "poll_id": poll_id},
-        poll_id,
     )
 
     return {"message": "Poll deleted successfully"}
 
 def get_poll_with_stats(poll_id: int, db: Session, user_id: Optional[int] = None):
-    # Get poll
+    version = poll_cache.version(poll_id)
+    snapshot = poll_cache.get(poll_id)
+    if snapshot is None:
+        snapshot = _load_poll_snapshot(db, poll_id, version)
+
+    return _apply_user_state([snapshot], db, user_id)[0]
+
+async def poll_snapshot(poll_id: int) -> PollResponse:
+    """
+    User-independent snapshot of a poll, from poll_cache when possible.
+
+    Concurrent misses for the same poll version, such as every client
+    refetching a poll after one broadcast, share a single database load.
+    Snapshots are never served stale: a new version always loads anew.
+    """
+    version = poll_cache.version(poll_id)
+    snapshot = poll_cache.get(poll_id)
+    if snapshot is not None:
+        return snapshot
+    return await read_flights.do(
+        ("poll_snapshot", poll_id, version),
+        lambda: run_in_session(_load_poll_snapshot, poll_id, version),
+    )
+
+def _load_poll_snapshot(db: Session, poll_id: int, version: int) -> PollResponse:
     db_poll = db.query(Poll).filter(Poll.id == poll_id).first()
     if not db_poll:
         raise HTTPException(status_code=404, detail="Poll not found")
-    
-    # Auto-close if past scheduled end
-    now = datetime.now(timezone.utc)
-    if db_poll.is_active and db_poll.closes_at:
-        closes_at = db_poll.closes_at
-        # Handle timezone-naive closes_at by assuming UTC
-        if closes_at.tzinfo is None:
-            closes_at = closes_at.replace(tzinfo=timezone.utc)
-        if closes_at <= now:
-            db_poll.is_active = False
-            db.commit()
-            db.refresh(db_poll)
-
-    # Get options with vote counts
-    options_with_counts = db.query(
-        Option,
-        func.count(Vote.id).label('vote_count')
-    ).outerjoin(Vote).filter(Option.poll_id == poll_id).group_by(Option.id).all()
-    
-    options = []
-    for option, vote_count in options_with_counts:
-        option_dict = {
-            "id": option.id,
-            "text": option.text,
-            "poll_id": option.poll_id,
-            "created_at": option.created_at,
-            "vote_count": vote_count or 0
-        }
-        options.append(OptionResponse(**option_dict))
-    
-    # Get total votes and likes
-    total_votes = db.query(Vote).filter(Vote.poll_id == poll_id).count()
-    total_likes = db.query(Like).filter(Like.poll_id == poll_id).count()
-    
-    # Check if user voted/liked
-    user_voted = False
-    user_liked = False
-    if user_id:
-        user_voted = db.query(Vote).filter(Vote.poll_id == poll_id, Vote.user_id == user_id).first() is not None
-        user_liked = db.query(Like).filter(Like.poll_id == poll_id, Like.user_id == user_id).first() is not None
-    
-    creator = db.query(User).filter(User.id == db_poll.creator_id).first()
-
-    return PollResponse(
-        id=db_poll.id,
-        title=db_poll.title,
-        description=db_poll.description,
-        creator_id=db_poll.creator_id,
-        creator_username=creator.username if creator else None,
-        created_at=db_poll.created_at,
-        updated_at=db_poll.updated_at,
-        is_active=db_poll.is_active,
-        closes_at=db_poll.closes_at,
-        options=options,
-        total_votes=total_votes,
-        total_likes=total_likes,
-        user_voted=user_voted,
-        user_liked=user_liked
+
+    snapshot = _build_poll_snapshots([db_poll], db)[poll_id]
+    poll_cache.set(poll_id, version, snapshot)
+    return snapshot
+
+async def load_poll_snapshot(poll_id: int) -> Optional[dict]:
+    """
+    User-independent state of a poll for WebSocket clients resuming after a
+    gap, or None if the poll no longer exists.
+    """
+    try:
+        snapshot = await poll_snapshot(poll_id)
+    except HTTPException:
+        return None
+    return _apply_user_state([snapshot], None, None)[0].model_dump(mode="json")
+
+def get_polls_with_stats(polls: List[Poll], db: Session, user_id: Optional[int] = None) -> List[PollResponse]:
+    """
+    Build PollResponse objects for a page of polls.
+
+    User-independent snapshots are served from poll_cache where possible.
+    Misses are built for the whole page at once, so the number of round trips
+    stays fixed no matter how many polls are requested.
+    """
+    if not polls:
+        return []
+
+    versions = {}
+    snapshots = {}
+    missing = []
+    for db_poll in polls:
+        versions[db_poll.id] = poll_cache.version(db_poll.id)
+        snapshot = poll_cache.get(db_poll.id)
+        if snapshot is None:
+            missing.append(db_poll)
+        else:
+            snapshots[db_poll.id] = snapshot
+
+    if missing:
+        built = _build_poll_snapshots(missing, db)
+        for poll_id, snapshot in built.items():
+            poll_cache.set(poll_id, versions[poll_id], snapshot)
+        snapshots.update(built)
+
+    return _apply_user_state([snapshots[db_poll.id] for db_poll in polls], db, user_id)
+
+def _build_poll_snapshots(polls: List[Poll], db: Session) -> Dict[int, PollResponse]:
+    """
+    Build the user-independent part of PollResponse for the given polls.
+
+    Vote and like totals come from the counter columns, and options and
+    creators are loaded for all polls with one query each.
+    """
+    poll_ids = [poll.id for poll in polls]
+
+    # Get options with their stored vote counts
+    db_options = db.query(Option).filter(Option.poll_id.in_(poll_ids)).order_by(Option.id).all()
+
+    options_by_poll = {poll_id: [] for poll_id in poll_ids}
+    for option in db_options:
+        options_by_poll[option.poll_id].append(OptionResponse(
+            id=option.id,
+            text=option.text,
+            poll_id=option.poll_id,
+            created_at=option.created_at,
+            vote_count=option.vote_count or 0,
+        ))
+
+    creator_ids = {poll.creator_id for poll in polls}
+    creator_usernames = dict(
+        db.query(User.id, User.username).filter(User.id.in_(creator_ids)).all()
     )
+
+    return {
+        db_poll.id: PollResponse(
+            id=db_poll.id,
+            title=db_poll.title,
+            description=db_poll.description,
+            creator_id=db_poll.creator_id,
+            creator_username=creator_usernames.get(db_poll.creator_id),
+            created_at=db_poll.created_at,
+            updated_at=db_poll.updated_at,
+            is_active=db_poll.is_active,
+            closes_at=db_poll.closes_at,
+            options=options_by_poll[db_poll.id],
+            total_votes=db_poll.total_votes or 0,
+            total_likes=db_poll.total_likes or 0,
+        )
+        for db_poll in polls
+    }
+
+def _apply_user_state(snapshots: List[PollResponse], db: Session, user_id: Optional[int]) -> List[PollResponse]:
+    """
+    Copy the live viewer count and the caller's voted/liked flags onto
+    cached snapshots.
+    """
+    if not user_id:
+        return [snapshot.model_copy(update={"viewers": presence.count(snapshot.id)}) for snapshot in snapshots]
+
+    poll_ids = [snapshot.id for snapshot in snapshots]
+    voted_ids = {
+        row.poll_id
+        for row in db.query(Vote.poll_id).filter(Vote.poll_id.in_(poll_ids), Vote.user_id == user_id)
+    }
+    liked_ids = {
+        row.poll_id
+        for row in db.query(Like.poll_id).filter(Like.poll_id.in_(poll_ids), Like.user_id == user_id)
+    }
+
+    return [
+        snapshot.model_copy(update={
+            "user_voted": snapshot.id in voted_ids,
+            "user_liked": snapshot.id in liked_ids,
+            "viewers": presence.count(snapshot.id),
+        })
+        for snapshot in snapshots
+    ]
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from app.db.database import get_db
+from app.models.poll import Poll
 from app.models.user import User
 from app.schemas.user import UserCreate, UserLogin, UserResponse, RoleUpdate, PasswordChange, ProfileUpdate, UserPreferences
 from app.middleware.auth import verify_admin
 from app.utils.audit import log_admin_action
+from app.services.poll_cache import poll_cache
+from app.services.poll_events import poll_events
 import os
 
 router = APIRouter()
@@ -169,6 +172,7 @@ def change_password(
 def update_user_profile(
     user_id: int,
     profile_update: ProfileUpdate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """
@@ -177,6 +181,7 @@ def update_user_profile(
     Args:
         user_id: ID of the user updating their profile
         profile_update: Profile data including username and email
+        background_tasks: Used to announce the new username on the user's polls
         db: Database session
         
     Returns:
@@ -215,11 +220,22 @@ def update_user_profile(
             )
     
     # Update profile
+    username_changed = profile_update.username != target_user.username
     target_user.username = profile_update.username
     if profile_update.email:
         target_user.email = profile_update.email
     db.commit()
     
+    if username_changed:
+        # Cached poll snapshots carry the creator's username
+        poll_ids = [row.id for row in db.query(Poll.id).filter(Poll.creator_id == user_id)]
+        for poll_id in poll_ids:
+            poll_cache.invalidate(poll_id)
+            background_tasks.add_task(
+                poll_events.publish,
+                {"type": "poll_updated", "poll_id": poll_id},
+            )
+    
     return {"message": "Profile updated successfully"}
 
 @router.put("/users/{user_id}/preferences")
@@ -1,95 +1,315 @@
 from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
-from app.db.database import get_db
+from sqlalchemy import exists, literal, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from datetime import datetime, timezone
+from app.db.database import get_session, run_db
 from app.models.vote import Vote
 from app.models.poll import Poll
 from app.models.option import Option
-from app.schemas.vote import VoteCreate, VoteResponse
-from app.websocket import manager
+from app.schemas.vote import (
+    VoteBatchCreate,
+    VoteBatchItem,
+    VoteBatchResponse,
+    VoteBatchResult,
+    VoteCreate,
+    VoteResponse,
+)
+from app.utils.counters import (
+    apply_vote_counter_deltas,
+    apply_vote_counters,
+    move_vote_counter,
+    read_poll_delta,
+    read_poll_deltas,
+)
+from app.utils.activity_log import record_event, record_events
+from app.utils.rollups import adjust_totals, record_activities, record_activity
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from app.services.poll_cache import poll_cache
+from app.services.write_pipeline import write_pipeline
+from app.services.poll_events import poll_events
 
 router = APIRouter()
 
 @router.post("/", response_model=VoteResponse)
-def create_vote(
+async def create_vote(
     vote: VoteCreate,
     user_id: int,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db=Depends(get_session),
 ):
-    # Verify poll exists and is active
-    db_poll = db.query(Poll).filter(Poll.id == vote.poll_id, Poll.is_active == True).first()
-    if not db_poll:
-        raise HTTPException(status_code=404, detail="Poll not found or inactive")
-    
-    # Verify option belongs to poll
-    db_option = db.query(Option).filter(
-        Option.id == vote.option_id, 
-        Option.poll_id == vote.poll_id
-    ).first()
-    if not db_option:
-        raise HTTPException(status_code=404, detail="Option not found for this poll")
-    
-    # Check if user already voted
-    existing_vote = db.query(Vote).filter(
-        Vote.user_id == user_id,
-        Vote.poll_id == vote.poll_id
-    ).first()
-    
-    if existing_vote:
-        # Update existing vote
-        existing_vote.option_id = vote.option_id
-        db.commit()
-        db.refresh(existing_vote)
-        background_tasks.add_task(
-            manager.broadcast_to_poll,
-            {"type": "poll_updated", "poll_id": vote.poll_id},
-            vote.poll_id,
+    if write_pipeline.enabled:
+        result, delta = await write_pipeline.submit(
+            apply_vote, vote, user_id, conflict_detail="Vote already exists"
         )
+    else:
+        result, delta = await run_db(db, _create_vote, vote, user_id)
+
+    poll_cache.invalidate(vote.poll_id)
+    if delta is not None:
         background_tasks.add_task(
-            manager.broadcast_all,
-            {"type": "poll_updated", "poll_id": vote.poll_id},
+            poll_events.publish,
+            {"type": "poll_updated", "poll_id": vote.poll_id, "delta": delta},
         )
-        return existing_vote
+    return result
+
+def _create_vote(db: Session, vote: VoteCreate, user_id: int) -> Tuple[VoteResponse, Optional[dict]]:
+    result = apply_vote(db, vote, user_id)
+    db.commit()
+    return result
+
+def _dialect_insert(db: Session):
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        return sqlite_insert
+    if dialect == "postgresql":
+        return postgresql_insert
+    raise RuntimeError(f"Vote upsert is not supported on {dialect}")
+
+def apply_vote(db: Session, vote: VoteCreate, user_id: int) -> Tuple[VoteResponse, Optional[dict]]:
+    """
+    Stage a new or changed vote and its counter updates without committing.
+    Returns the vote and the poll delta for the poll_updated event, which is
+    None when the same option was chosen again and nothing changed.
+
+    The vote is written with a single INSERT ... ON CONFLICT DO UPDATE that only
+    inserts when the poll is active and the option belongs to it, so there is
+    no gap between the checks and the write.
+    """
+    poll_is_open = exists().where(
+        Poll.id == vote.poll_id,
+        Poll.is_active == True,
+        Option.poll_id == Poll.id,
+        Option.id == vote.option_id,
+    )
+    source = select(
+        literal(user_id),
+        literal(vote.poll_id),
+        literal(vote.option_id),
+        literal(datetime.now(timezone.utc), Vote.__table__.c.created_at.type),
+    ).where(poll_is_open)
+
+    insert = _dialect_insert(db)(Vote).from_select(
+        ["user_id", "poll_id", "option_id", "created_at"], source
+    )
+    statement = insert.on_conflict_do_update(
+        index_elements=["user_id", "poll_id"],
+        set_={
+            # SET expressions read the row before the update
+            "previous_option_id": Vote.option_id,
+            "option_id": insert.excluded.option_id,
+        },
+    ).returning(
+        Vote.id, Vote.user_id, Vote.poll_id, Vote.option_id, Vote.created_at, Vote.previous_option_id
+    )
+
+    row = db.execute(statement).first()
+    if row is None:
+        # Nothing written - work out which check failed for the error message
+        db_poll = db.query(Poll.id).filter(Poll.id == vote.poll_id, Poll.is_active == True).first()
+        if not db_poll:
+            raise HTTPException(status_code=404, detail="Poll not found or inactive")
+        raise HTTPException(status_code=404, detail="Option not found for this poll")
+
+    if row.previous_option_id is None:
+        # New vote
+        apply_vote_counters(db, row.poll_id, row.option_id, 1)
+        record_activity(db, row.poll_id, row.created_at, votes=1)
+        adjust_totals(db, votes=1)
+        record_event(db, "vote", row.user_id, row.poll_id, row.created_at)
+        delta = read_poll_delta(db, row.poll_id, [row.option_id])
+    elif row.previous_option_id != row.option_id:
+        # Changed vote
+        move_vote_counter(db, row.previous_option_id, row.option_id)
+        delta = read_poll_delta(db, row.poll_id, [row.previous_option_id, row.option_id])
     else:
-        # Create new vote
-        try:
-            db_vote = Vote(
-                user_id=user_id,
-                poll_id=vote.poll_id,
-                option_id=vote.option_id
-            )
-            db.add(db_vote)
-            db.commit()
-            db.refresh(db_vote)
-            background_tasks.add_task(
-                manager.broadcast_to_poll,
-                {"type": "poll_updated", "poll_id": vote.poll_id},
-                vote.poll_id,
-            )
-            background_tasks.add_task(
-                manager.broadcast_all,
-                {"type": "poll_updated", "poll_id": vote.poll_id},
-            )
-            return db_vote
-        except IntegrityError:
-            db.rollback()
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Vote already exists"
-            )
+        delta = None
+
+    result = VoteResponse(
+        id=row.id,
+        user_id=row.user_id,
+        poll_id=row.poll_id,
+        option_id=row.option_id,
+        created_at=row.created_at,
+    )
+    return result, delta
+
+# Rows per multi-row upsert, keeps each statement well under SQLite's bound parameter limit
+BATCH_UPSERT_CHUNK_SIZE = 500
+
+@router.post("/batch", response_model=VoteBatchResponse)
+async def create_votes_batch(
+    batch: VoteBatchCreate,
+    background_tasks: BackgroundTasks,
+    db=Depends(get_session),
+):
+    """
+    Ingest votes collected offline (kiosks, event tablets) in one request.
+
+    Records are validated with set-based queries and written with multi-row
+    upserts in a single transaction. When a user has several records for the
+    same poll, the one with the latest client_ts wins, and a stored vote cast
+    after a record's client_ts is kept. Each affected poll gets
+    one poll_updated broadcast, however many votes it received.
+    """
+    response, deltas = await run_db(db, _create_votes_batch, batch)
+
+    for poll_id, delta in deltas.items():
+        poll_cache.invalidate(poll_id)
+        background_tasks.add_task(
+            poll_events.publish,
+            {"type": "poll_updated", "poll_id": poll_id, "delta": delta},
+        )
+    return response
+
+def _client_time(record: VoteBatchItem, received_at: datetime) -> datetime:
+    # Naive timestamps are UTC, like the ones stored in the database
+    if record.client_ts is None:
+        return received_at
+    if record.client_ts.tzinfo is None:
+        return record.client_ts
+    return record.client_ts.astimezone(timezone.utc).replace(tzinfo=None)
+
+def _create_votes_batch(db: Session, batch: VoteBatchCreate) -> Tuple[VoteBatchResponse, Dict[int, dict]]:
+    records = batch.votes
+    received_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    results: List[VoteBatchResult] = [None] * len(records)
+
+    # Validate every record with two set-based lookups
+    poll_ids = {record.poll_id for record in records}
+    option_ids = {record.option_id for record in records}
+    active_poll_ids = {
+        row.id for row in db.query(Poll.id).filter(Poll.id.in_(poll_ids), Poll.is_active == True)
+    }
+    option_polls = dict(
+        db.query(Option.id, Option.poll_id).filter(Option.id.in_(option_ids)).all()
+    )
+
+    # Keep the latest record per (user, poll)
+    latest: Dict[Tuple[int, int], int] = {}
+    for index, record in enumerate(records):
+        if record.poll_id not in active_poll_ids:
+            results[index] = VoteBatchResult(index=index, status="rejected", detail="Poll not found or inactive")
+            continue
+        if option_polls.get(record.option_id) != record.poll_id:
+            results[index] = VoteBatchResult(index=index, status="rejected", detail="Option not found for this poll")
+            continue
+
+        key = (record.user_id, record.poll_id)
+        current = latest.get(key)
+        if current is not None and _client_time(records[current], received_at) > _client_time(record, received_at):
+            results[index] = VoteBatchResult(index=index, status="superseded")
+            continue
+        if current is not None:
+            results[current] = VoteBatchResult(index=current, status="superseded")
+        latest[key] = index
+
+    # Apply the winners with multi-row upserts
+    winners = list(latest.items())
+    option_deltas: Counter = Counter()
+    poll_deltas: Counter = Counter()
+    changed_poll_ids = set()
+    new_votes = []
+    insert = _dialect_insert(db)
+    for start in range(0, len(winners), BATCH_UPSERT_CHUNK_SIZE):
+        chunk = winners[start:start + BATCH_UPSERT_CHUNK_SIZE]
+        statement = insert(Vote).values([
+            {
+                "user_id": records[index].user_id,
+                "poll_id": records[index].poll_id,
+                "option_id": records[index].option_id,
+                "created_at": _client_time(records[index], received_at),
+            }
+            for _, index in chunk
+        ])
+        statement = statement.on_conflict_do_update(
+            index_elements=["user_id", "poll_id"],
+            set_={
+                # SET expressions read the row before the update
+                "previous_option_id": Vote.option_id,
+                "option_id": statement.excluded.option_id,
+            },
+            # A stored vote newer than the offline record wins
+            where=statement.excluded.created_at >= Vote.created_at,
+        ).returning(Vote.id, Vote.user_id, Vote.poll_id, Vote.option_id, Vote.previous_option_id)
+
+        chunk_indexes = dict(chunk)
+        for row in db.execute(statement):
+            index = chunk_indexes.pop((row.user_id, row.poll_id))
+            if row.previous_option_id is None:
+                vote_status = "created"
+                option_deltas[row.option_id] += 1
+                poll_deltas[row.poll_id] += 1
+                new_votes.append((row.user_id, row.poll_id, _client_time(records[index], received_at)))
+            elif row.previous_option_id == row.option_id:
+                vote_status = "unchanged"
+            else:
+                vote_status = "updated"
+                option_deltas[row.previous_option_id] -= 1
+                option_deltas[row.option_id] += 1
+            if vote_status != "unchanged":
+                changed_poll_ids.add(row.poll_id)
+            results[index] = VoteBatchResult(index=index, status=vote_status, vote_id=row.id)
+        # Conflicting rows the WHERE kept are not returned
+        for index in chunk_indexes.values():
+            results[index] = VoteBatchResult(index=index, status="superseded")
+
+    apply_vote_counter_deltas(db, option_deltas, poll_deltas)
+    record_activities(db, ((poll_id, at, 1, 0, 0) for _, poll_id, at in new_votes))
+    adjust_totals(db, votes=len(new_votes))
+    record_events(db, (("vote", user_id, poll_id, at) for user_id, poll_id, at in new_votes))
+    changed_option_ids = [option_id for option_id, delta in option_deltas.items() if delta]
+    deltas = read_poll_deltas(db, changed_poll_ids, changed_option_ids)
+    db.commit()
+
+    tally = Counter(result.status for result in results)
+    response = VoteBatchResponse(
+        results=results,
+        created=tally["created"],
+        updated=tally["updated"],
+        unchanged=tally["unchanged"],
+        superseded=tally["superseded"],
+        rejected=tally["rejected"],
+    )
+    return response, deltas
 
 @router.get("/poll/{poll_id}")
-def get_poll_votes(poll_id: int, db: Session = Depends(get_db)):
+async def get_poll_votes(poll_id: int, db=Depends(get_session)):
+    return await run_db(db, _get_poll_votes, poll_id)
+
+def _get_poll_votes(db: Session, poll_id: int):
     votes = db.query(Vote).filter(Vote.poll_id == poll_id).all()
     return votes
 
 @router.delete("/{vote_id}")
-def delete_vote(vote_id: int, user_id: int, db: Session = Depends(get_db)):
+async def delete_vote(
+    vote_id: int,
+    user_id: int,
+    background_tasks: BackgroundTasks,
+    db=Depends(get_session),
+):
+    poll_id, delta = await run_db(db, _delete_vote, vote_id, user_id)
+
+    poll_cache.invalidate(poll_id)
+    background_tasks.add_task(
+        poll_events.publish,
+        {"type": "poll_updated", "poll_id": poll_id, "delta": delta},
+    )
+    return {"message": "Vote deleted successfully"}
+
+def _delete_vote(db: Session, vote_id: int, user_id: int) -> Tuple[int, Optional[dict]]:
     db_vote = db.query(Vote).filter(Vote.id == vote_id, Vote.user_id == user_id).first()
     if not db_vote:
         raise HTTPException(status_code=404, detail="Vote not found")
     
+    poll_id = db_vote.poll_id
+    option_id = db_vote.option_id
+    apply_vote_counters(db, poll_id, option_id, -1)
+    record_activity(db, poll_id, db_vote.created_at, votes=-1)
+    adjust_totals(db, votes=-1)
     db.delete(db_vote)
+    delta = read_poll_delta(db, poll_id, [option_id])
     db.commit()
-    return {"message": "Vote deleted successfully"}
\ No newline at end of file
+    return poll_id, delta
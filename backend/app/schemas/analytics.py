@@ -6,9 +6,11 @@ class VoteTrendItem(BaseModel):
     date: str
     votes: int
     polls: int
+    likes: int = 0
 
 class VoteTrendResponse(BaseModel):
     trends: List[VoteTrendItem]
+    granularity: str = "day"
 
 class ActivityItem(BaseModel):
     id: str
@@ -31,6 +33,7 @@ class ActivityItem(BaseModel):
 class ActivityFeedResponse(BaseModel):
     activities: List[ActivityItem]
     total: int
+    next_cursor: Optional[str] = None
 
 class EngagementMetrics(BaseModel):
     total_polls: int
@@ -53,9 +56,11 @@ class PollEngagementItem(BaseModel):
     title: str
     votes: int
     likes: int
-    engagement_rate: float
+    engagement_rate: float  # share of all engagement in the window, in percent
     created_at: str
+    score: float = 0  # votes and likes, exponentially decayed over the window
 
 
 class TopPollsResponse(BaseModel):
     polls: List[PollEngagementItem]
+    window: str = "day"
@@ -45,6 +45,12 @@ class PollResponse(PollBase):
     total_likes: Optional[int] = 0
     user_voted: Optional[bool] = False
     user_liked: Optional[bool] = False
+    # Live WebSocket viewers, filled in per response and never cached
+    viewers: Optional[int] = 0
     
     class Config:
         from_attributes = True
+
+class PollFeedResponse(BaseModel):
+    items: List[PollResponse]
+    next_cursor: Optional[str] = None
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
+from typing import List, Literal, Optional
 
 class VoteCreate(BaseModel):
     poll_id: int
@@ -13,4 +14,27 @@ class VoteResponse(BaseModel):
     created_at: datetime
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class VoteBatchItem(BaseModel):
+    user_id: int
+    poll_id: int
+    option_id: int
+    client_ts: Optional[datetime] = None  # When the vote was collected offline
+
+class VoteBatchCreate(BaseModel):
+    votes: List[VoteBatchItem] = Field(..., min_length=1, max_length=10000)
+
+class VoteBatchResult(BaseModel):
+    index: int  # Position of the record in the request
+    status: Literal["created", "updated", "unchanged", "superseded", "rejected"]
+    vote_id: Optional[int] = None
+    detail: Optional[str] = None
+
+class VoteBatchResponse(BaseModel):
+    results: List[VoteBatchResult]
+    created: int
+    updated: int
+    unchanged: int
+    superseded: int
+    rejected: int
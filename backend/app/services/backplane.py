@@ -0,0 +1,316 @@
+"""
+Pub/sub backplane that carries poll events between server workers.
+
+Each worker publishes an event once; the backplane hands every event back to
+every worker, which delivers it to its own WebSocket connections. The
+backplane also assigns each event its per-poll seq number, so all workers
+agree on the numbering.
+
+It also aggregates viewer presence: every worker reports how many of its
+connections follow each poll and reads back the totals over all workers.
+
+Pick one with WS_BACKPLANE:
+
+    local   single worker, events are delivered in-process (default)
+    sqlite  several workers on one host share a small SQLite event log
+            (WS_BACKPLANE_PATH) and poll it every WS_BACKPLANE_POLL_MS
+
+Another broker (Redis, Postgres LISTEN/NOTIFY) can be added by subclassing
+Backplane and registering it in create_backplane().
+"""
+
+from threading import Lock
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Called with (message, everyone) for every event, on every worker
+EventHandler = Callable[[dict, bool], Awaitable[None]]
+
+class Backplane:
+    """
+    Interface between the event publisher and the transport.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self.handler: Optional[EventHandler] = None
+        self.published = 0
+        self.delivered = 0
+
+    def bind(self, handler: EventHandler):
+        self.handler = handler
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def publish(self, message: dict, everyone: bool):
+        """
+        Assign the event its seq number and send it to every worker.
+        """
+        raise NotImplementedError
+
+    async def sync_presence(self, changes: Dict[int, int]) -> Dict[int, int]:
+        """
+        Store this worker's viewer counts for the polls in changes (0 removes
+        a poll) and return the total over all workers for every watched poll.
+        """
+        raise NotImplementedError
+
+    async def _dispatch(self, message: dict, everyone: bool):
+        self.delivered += 1
+        try:
+            await self.handler(message, everyone)
+        except Exception:
+            logger.exception("Failed to deliver %s", message)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "published": self.published, "delivered": self.delivered}
+
+def _next_seq(seqs: Dict[int, int], message: dict) -> dict:
+    poll_id = message["poll_id"]
+    seq = seqs.get(poll_id, 0) + 1
+    if message.get("type") == "poll_deleted":
+        seqs.pop(poll_id, None)
+    else:
+        seqs[poll_id] = seq
+    return {**message, "seq": seq}
+
+class LocalBackplane(Backplane):
+    name = "local"
+
+    def __init__(self):
+        super().__init__()
+        self._seq: Dict[int, int] = {}
+        self._viewers: Dict[int, int] = {}
+
+    async def publish(self, message: dict, everyone: bool):
+        self.published += 1
+        await self._dispatch(_next_seq(self._seq, message), everyone)
+
+    async def sync_presence(self, changes: Dict[int, int]) -> Dict[int, int]:
+        for poll_id, viewers in changes.items():
+            if viewers:
+                self._viewers[poll_id] = viewers
+            else:
+                self._viewers.pop(poll_id, None)
+        return dict(self._viewers)
+
+class SQLiteBackplane(Backplane):
+    """
+    Event log in a SQLite file shared by the workers of one host.
+
+    Publishing appends a row and bumps the poll's seq in one transaction.
+    Each worker tails the log from the last id it has seen. Rows older than
+    the retention period are pruned by whichever worker publishes.
+
+    Presence lives in a table with one row per worker and poll. Workers
+    refresh their rows while they run, so rows of a worker that died without
+    cleaning up stop counting after presence_ttl seconds.
+    """
+
+    name = "sqlite"
+
+    def __init__(
+        self,
+        path: str,
+        poll_interval_ms: float = 50,
+        retention_seconds: float = 60,
+        presence_ttl_seconds: float = 30,
+    ):
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval_ms / 1000
+        self.retention = retention_seconds
+        self.presence_ttl = presence_ttl_seconds
+        self.worker_id = uuid.uuid4().hex
+        self._presence_refreshed = 0.0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = Lock()
+        self._last_id = 0
+        self._last_prune = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                everyone INTEGER NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS poll_seq (poll_id INTEGER PRIMARY KEY, seq INTEGER NOT NULL)"
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS presence (
+                worker TEXT NOT NULL,
+                poll_id INTEGER NOT NULL,
+                viewers INTEGER NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (worker, poll_id)
+            )
+            """
+        )
+        return conn
+
+    async def start(self):
+        self._conn = await asyncio.to_thread(self._connect)
+        # Only deliver events published from now on
+        self._last_id = await asyncio.to_thread(self._max_id)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._conn is not None:
+            await asyncio.to_thread(self._clear_presence)
+            self._conn.close()
+            self._conn = None
+
+    async def publish(self, message: dict, everyone: bool):
+        if self._conn is None:
+            logger.warning("Backplane not started, dropping %s", message)
+            return
+        self.published += 1
+        await asyncio.to_thread(self._append, message, everyone)
+
+    def _max_id(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+
+    def _append(self, message: dict, everyone: bool):
+        now = time.time()
+        poll_id = message["poll_id"]
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                seq = cursor.execute(
+                    """
+                    INSERT INTO poll_seq (poll_id, seq) VALUES (?, 1)
+                    ON CONFLICT(poll_id) DO UPDATE SET seq = seq + 1
+                    RETURNING seq
+                    """,
+                    (poll_id,),
+                ).fetchone()[0]
+                if message.get("type") == "poll_deleted":
+                    cursor.execute("DELETE FROM poll_seq WHERE poll_id = ?", (poll_id,))
+                cursor.execute(
+                    "INSERT INTO events (everyone, payload, created_at) VALUES (?, ?, ?)",
+                    (int(everyone), json.dumps({**message, "seq": seq}), now),
+                )
+                if now - self._last_prune >= self.retention:
+                    cursor.execute("DELETE FROM events WHERE created_at < ?", (now - self.retention,))
+                    self._last_prune = now
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+
+    async def sync_presence(self, changes: Dict[int, int]) -> Dict[int, int]:
+        if self._conn is None:
+            return {}
+        return await asyncio.to_thread(self._sync_presence, changes)
+
+    def _sync_presence(self, changes: Dict[int, int]) -> Dict[int, int]:
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute("BEGIN")
+            try:
+                if now - self._presence_refreshed >= self.presence_ttl / 3:
+                    cursor.execute("UPDATE presence SET updated_at = ? WHERE worker = ?", (now, self.worker_id))
+                    cursor.execute("DELETE FROM presence WHERE updated_at < ?", (now - self.presence_ttl,))
+                    self._presence_refreshed = now
+                cursor.executemany(
+                    """
+                    INSERT INTO presence (worker, poll_id, viewers, updated_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(worker, poll_id) DO UPDATE SET viewers = excluded.viewers, updated_at = excluded.updated_at
+                    """,
+                    [(self.worker_id, poll_id, viewers, now) for poll_id, viewers in changes.items() if viewers],
+                )
+                cursor.executemany(
+                    "DELETE FROM presence WHERE worker = ? AND poll_id = ?",
+                    [(self.worker_id, poll_id) for poll_id, viewers in changes.items() if not viewers],
+                )
+                rows = cursor.execute(
+                    "SELECT poll_id, SUM(viewers) FROM presence WHERE updated_at >= ? GROUP BY poll_id",
+                    (now - self.presence_ttl,),
+                ).fetchall()
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+        return dict(rows)
+
+    def _clear_presence(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM presence WHERE worker = ?", (self.worker_id,))
+
+    def _read_since(self, last_id: int) -> List[Tuple[int, int, str]]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, everyone, payload FROM events WHERE id > ? ORDER BY id LIMIT 1000",
+                (last_id,),
+            ).fetchall()
+
+    async def _run(self):
+        while True:
+            try:
+                rows = await asyncio.to_thread(self._read_since, self._last_id)
+            except Exception:
+                logger.exception("Failed to read backplane events")
+                rows = []
+            for event_id, everyone, payload in rows:
+                self._last_id = event_id
+                await self._dispatch(json.loads(payload), bool(everyone))
+            if len(rows) < 1000:
+                await asyncio.sleep(self.poll_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats.update(
+            path=self.path,
+            worker_id=self.worker_id,
+            last_event_id=self._last_id,
+            poll_interval_ms=self.poll_interval * 1000,
+        )
+        return stats
+
+def create_backplane() -> Backplane:
+    kind = os.getenv("WS_BACKPLANE", "local").lower()
+    if kind == "local":
+        return LocalBackplane()
+    if kind == "sqlite":
+        return SQLiteBackplane(
+            path=os.getenv("WS_BACKPLANE_PATH", "quickpoll_events.db"),
+            poll_interval_ms=float(os.getenv("WS_BACKPLANE_POLL_MS", "50")),
+            retention_seconds=float(os.getenv("WS_BACKPLANE_RETENTION_SECONDS", "60")),
+            presence_ttl_seconds=float(os.getenv("WS_PRESENCE_TTL_SECONDS", "30")),
+        )
+    raise ValueError(f"Unknown WS_BACKPLANE '{kind}'. Expected one of: local, sqlite")
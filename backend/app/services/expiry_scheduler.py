@@ -0,0 +1,200 @@
+"""
+Background scheduler that closes polls when their closes_at deadline passes.
+
+Deadlines are kept in a min-heap. A single asyncio task sleeps until the
+earliest one, closes every poll that is due with one batched UPDATE and
+broadcasts poll_closed for each poll it returned. Routes running in the
+threadpool register deadlines through schedule()/unschedule(), which wake
+the task safely.
+"""
+
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import heapq
+import logging
+
+from sqlalchemy import update
+
+from app.db.database import SessionLocal
+from app.models.poll import Poll
+from app.services.poll_cache import poll_cache
+from app.services.poll_events import poll_events
+from app.utils.rollups import adjust_totals
+
+logger = logging.getLogger(__name__)
+
+def _as_utc(value: datetime) -> datetime:
+    # Stored timestamps are naive UTC
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+class PollExpiryScheduler:
+    def __init__(self, retry_seconds: float = 5):
+        # Delay before retrying polls whose close failed
+        self.retry = timedelta(seconds=retry_seconds)
+        self._heap: List[Tuple[datetime, int]] = []
+        # Current deadline per poll; heap entries that don't match are stale
+        self._deadlines: Dict[int, datetime] = {}
+        self._lock = Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def schedule(self, poll_id: int, closes_at: Optional[datetime]):
+        """
+        Register or move a poll's deadline. A None deadline unschedules it.
+        """
+        if closes_at is None:
+            self.unschedule(poll_id)
+            return
+
+        deadline = _as_utc(closes_at)
+        with self._lock:
+            self._deadlines[poll_id] = deadline
+            heapq.heappush(self._heap, (deadline, poll_id))
+        self._wake()
+
+    def unschedule(self, poll_id: int):
+        with self._lock:
+            self._deadlines.pop(poll_id, None)
+
+    def _retry_later(self, poll_ids: List[int], now: datetime):
+        """
+        Put polls whose close failed back on the heap, unless they got a new
+        deadline meanwhile. The guarded UPDATE skips any closed by then.
+        """
+        deadline = now + self.retry
+        with self._lock:
+            for poll_id in poll_ids:
+                if poll_id in self._deadlines:
+                    continue
+                self._deadlines[poll_id] = deadline
+                heapq.heappush(self._heap, (deadline, poll_id))
+
+    def pending(self) -> int:
+        return len(self._deadlines)
+
+    def _wake(self):
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        await asyncio.to_thread(self._load_deadlines)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._loop = None
+        self._wakeup = None
+
+    def _load_deadlines(self):
+        """
+        Rebuild the heap from every active poll that has a deadline.
+        """
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(Poll.id, Poll.closes_at)
+                .filter(Poll.is_active == True, Poll.closes_at.isnot(None))
+                .all()
+            )
+        finally:
+            db.close()
+
+        with self._lock:
+            self._deadlines = {poll_id: _as_utc(closes_at) for poll_id, closes_at in rows}
+            self._heap = [(deadline, poll_id) for poll_id, deadline in self._deadlines.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_due(self, now: datetime) -> Tuple[List[int], Optional[datetime]]:
+        """
+        Remove due polls from the heap and return them with the next deadline.
+        """
+        due = []
+        with self._lock:
+            while self._heap:
+                deadline, poll_id = self._heap[0]
+                if self._deadlines.get(poll_id) != deadline:
+                    # Superseded or unscheduled entry
+                    heapq.heappop(self._heap)
+                    continue
+                if deadline > now:
+                    return due, deadline
+                heapq.heappop(self._heap)
+                del self._deadlines[poll_id]
+                due.append(poll_id)
+        return due, None
+
+    def _close_polls(self, poll_ids: List[int], now: datetime) -> List[int]:
+        """
+        Close the given polls in one UPDATE and return the ids actually closed.
+
+        Every worker runs a scheduler, so the guarded UPDATE is the claim: a
+        poll another worker closed first is not returned, and only the
+        returned polls are counted and announced.
+        """
+        # Timestamps are stored as naive UTC
+        cutoff = now.replace(tzinfo=None)
+        db = SessionLocal()
+        try:
+            closed_ids = list(db.execute(
+                update(Poll)
+                .where(
+                    Poll.id.in_(poll_ids),
+                    Poll.is_active == True,
+                    Poll.closes_at <= cutoff,
+                )
+                .values(is_active=False)
+                .returning(Poll.id)
+                .execution_options(synchronize_session=False)
+            ).scalars())
+            if closed_ids:
+                adjust_totals(db, active_polls=-len(closed_ids))
+            db.commit()
+        finally:
+            db.close()
+
+        for poll_id in closed_ids:
+            poll_cache.invalidate(poll_id)
+        return closed_ids
+
+    async def _run(self):
+        while True:
+            # Clear before reading the heap so a concurrent schedule() is not lost
+            self._wakeup.clear()
+            now = datetime.now(timezone.utc)
+            due, next_deadline = self._pop_due(now)
+
+            if due:
+                try:
+                    closed_ids = await asyncio.to_thread(self._close_polls, due, now)
+                except Exception:
+                    logger.exception("Failed to close expired polls %s, retrying in %s", due, self.retry)
+                    self._retry_later(due, now)
+                    closed_ids = []
+                for poll_id in closed_ids:
+                    await poll_events.publish(
+                        {"type": "poll_closed", "poll_id": poll_id, "delta": {"is_active": False}}
+                    )
+                continue
+
+            timeout = None
+            if next_deadline is not None:
+                timeout = max((next_deadline - now).total_seconds(), 0)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+expiry_scheduler = PollExpiryScheduler()
@@ -0,0 +1,429 @@
+"""
+Time-decayed top-polls leaderboard, kept in memory on every worker.
+
+Every vote or like adds 1 to its poll's score in each window (hour, day,
+week), and scores decay exponentially with the window as time constant: a
+vote counts 1 now and 1/e one window later. Scores use forward decay. The
+stored key of a poll is sum(exp((t - landmark) / window)) over its events,
+which does not change between events, so ranking by key is ranking by
+current score. The landmark moves forward, rescaling every key, before the
+exponent grows large.
+
+Scores follow the poll events every worker already receives (see
+app/services/poll_events.py). Vote and like events carry the poll's absolute
+total_votes and total_likes, and the difference to the last known totals is
+the new engagement. Events without a delta (new or edited polls, merged
+updates) mark the poll stale; every LEADERBOARD_REFRESH_MS (default 1000) a
+task reloads the stale polls in one query, and a read reloads them first
+when any are waiting. Polls seen for the first time get their score from the
+rollup tables, which on startup also rebuild every score.
+
+A removed vote or like must take out what it added when it was cast, not its
+weight now, which forward decay makes larger. Events do not say when the
+removed item was cast, so a removal marks the poll stale and the refresh
+rebuilds its keys from the rollups, which subtract it from its original
+bucket. A refresh that finds lower totals than it knows does the same.
+
+Each window keeps its best LEADERBOARD_SIZE (default 100) polls. Keys only
+grow with events, so a poll can only enter the top when it gets one, and
+reading the top touches nothing but those entries. Only a deleted poll or
+a removal on a listed poll forces a full re-selection, done lazily on the
+next read.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import asyncio
+import heapq
+import logging
+import math
+import os
+import time
+
+from sqlalchemy import select
+
+from app.db.database import SessionLocal
+from app.models.analytics_rollup import PollActivityRollup
+from app.models.poll import Poll
+from app.services.poll_events import poll_events
+
+logger = logging.getLogger(__name__)
+
+# Window name -> decay time constant in seconds
+WINDOWS = {
+    "hour": 3600.0,
+    "day": 86400.0,
+    "week": 604800.0,
+}
+
+# Move the landmark before any key exceeds exp(MAX_EXPONENT)
+MAX_EXPONENT = 50.0
+
+# Rollup history older than this many of the longest window adds nothing
+HISTORY_WINDOWS = 10
+
+# Polls whose week score decays below this are forgotten
+PRUNE_BELOW = 1e-6
+
+# Offset from a rollup bucket's start to its middle
+BUCKET_MIDPOINTS = {
+    "hour": timedelta(minutes=30),
+    "day": timedelta(hours=12),
+}
+
+def _epoch(value: datetime) -> float:
+    # Stored timestamps are naive UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+class _Entry:
+    __slots__ = ("title", "created_at", "votes", "likes", "keys")
+
+    def __init__(self, title: str, created_at: Optional[datetime], votes: int, likes: int):
+        self.title = title
+        self.created_at = created_at
+        self.votes = votes
+        self.likes = likes
+        self.keys = [0.0] * len(WINDOWS)
+
+class _Window:
+    __slots__ = ("index", "tau", "landmark", "total", "top", "dirty")
+
+    def __init__(self, index: int, tau: float, landmark: float):
+        self.index = index
+        self.tau = tau
+        self.landmark = landmark
+        self.total = 0.0
+        # Best polls by key; complete unless dirty
+        self.top: Dict[int, float] = {}
+        self.dirty = False
+
+class Leaderboard:
+    def __init__(self, size: int = 100, refresh_ms: float = 1000):
+        self.size = size
+        self.refresh_interval = refresh_ms / 1000
+        self._entries: Dict[int, _Entry] = {}
+        self._windows = {
+            name: _Window(index, tau, time.time()) for index, (name, tau) in enumerate(WINDOWS.items())
+        }
+        self._stale: Set[int] = set()
+        # Stale polls that lost engagement, rebuilt from their rollups
+        self._shrunk: Set[int] = set()
+        self._seeded = False
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.events_applied = 0
+        self.refreshes = 0
+        self.reselections = 0
+        self.rebases = 0
+
+    async def start(self):
+        # Seed before serving so the first read is already ranked
+        await asyncio.to_thread(self._rebuild)
+        if self.refresh_interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def observe(self, message: dict):
+        """
+        Apply one poll event. Registered as a poll_events listener.
+        """
+        poll_id = message.get("poll_id")
+        if message.get("type") == "poll_deleted":
+            self._remove(poll_id)
+            return
+        if message.get("type") != "poll_updated":
+            return
+
+        delta = message.get("delta")
+        entry = self._entries.get(poll_id)
+        if entry is None or delta is None or "total_votes" not in delta:
+            self._stale.add(poll_id)
+            return
+
+        likes = delta.get("total_likes", entry.likes)
+        shrunk = delta["total_votes"] < entry.votes or likes < entry.likes
+        gained = (delta["total_votes"] - entry.votes) + (likes - entry.likes)
+        entry.votes = delta["total_votes"]
+        entry.likes = likes
+        if shrunk:
+            self._stale.add(poll_id)
+            self._shrunk.add(poll_id)
+        elif gained:
+            self._add(poll_id, entry, gained, time.time())
+            self.events_applied += 1
+
+    async def ready(self):
+        """
+        Make the next top() complete: seed on first use when start() never
+        ran, and load polls still waiting for the refresh task, such as a
+        poll that just got its first vote.
+        """
+        if not self._seeded:
+            await asyncio.to_thread(self._rebuild)
+        if self._stale:
+            await self.refresh()
+
+    def top(self, window: str, limit: int = 10) -> List[dict]:
+        """
+        Best polls of a window with their current score and share of all
+        engagement in it, best first.
+        """
+        state = self._windows[window]
+        if state.dirty:
+            self._reselect(state)
+
+        decay = math.exp(-(time.time() - state.landmark) / state.tau)
+        ranked = heapq.nlargest(min(limit, self.size), state.top.items(), key=lambda item: item[1])
+        results = []
+        for poll_id, key in ranked:
+            entry = self._entries[poll_id]
+            results.append({
+                "poll_id": poll_id,
+                "title": entry.title,
+                "votes": entry.votes,
+                "likes": entry.likes,
+                "score": key * decay,
+                "share": key / state.total * 100 if state.total > 0 else 0.0,
+                "created_at": entry.created_at,
+            })
+        return results
+
+    def _add(self, poll_id: int, entry: _Entry, amount: float, at: float):
+        for state in self._windows.values():
+            if (at - state.landmark) / state.tau > MAX_EXPONENT:
+                self._rebase(state, at, keep=poll_id)
+        for state in self._windows.values():
+            weight = amount * math.exp((at - state.landmark) / state.tau)
+            key = entry.keys[state.index] + weight
+            state.total += weight
+            entry.keys[state.index] = key
+            self._place(state, poll_id, key, True)
+
+    def _place(self, state: _Window, poll_id: int, key: float, grew: bool):
+        if state.dirty:
+            return
+        if not grew:
+            if poll_id in state.top:
+                state.dirty = True
+            return
+        if poll_id in state.top:
+            state.top[poll_id] = key
+            return
+        if len(state.top) < self.size:
+            state.top[poll_id] = key
+            return
+        lowest = min(state.top, key=state.top.get)
+        if key > state.top[lowest]:
+            del state.top[lowest]
+            state.top[poll_id] = key
+
+    def _reselect(self, state: _Window):
+        index = state.index
+        best = heapq.nlargest(
+            self.size,
+            ((entry.keys[index], poll_id) for poll_id, entry in self._entries.items() if entry.keys[index] > 0),
+        )
+        state.top = {poll_id: key for key, poll_id in best}
+        state.dirty = False
+        self.reselections += 1
+
+    def _rebase(self, state: _Window, now: float, keep: int):
+        """
+        Move a window's landmark to now and rescale its keys to match.
+        """
+        factor = math.exp(-(now - state.landmark) / state.tau)
+        index = state.index
+        for entry in self._entries.values():
+            entry.keys[index] *= factor
+        state.total *= factor
+        state.top = {poll_id: key * factor for poll_id, key in state.top.items()}
+        state.landmark = now
+        self.rebases += 1
+        self._prune(now, keep)
+
+    def _prune(self, now: float, keep: int):
+        # The longest window decays slowest, so its score bounds the others
+        longest = self._windows[max(WINDOWS, key=WINDOWS.get)]
+        decay = math.exp(-(now - longest.landmark) / longest.tau)
+        forgotten = [
+            poll_id for poll_id, entry in self._entries.items()
+            if entry.keys[longest.index] * decay < PRUNE_BELOW and poll_id != keep
+        ]
+        for poll_id in forgotten:
+            self._remove(poll_id)
+
+    def _remove(self, poll_id: int):
+        entry = self._entries.pop(poll_id, None)
+        self._stale.discard(poll_id)
+        self._shrunk.discard(poll_id)
+        if entry is None:
+            return
+        for state in self._windows.values():
+            state.total = max(state.total - entry.keys[state.index], 0.0)
+            if poll_id in state.top:
+                del state.top[poll_id]
+                state.dirty = True
+
+    def _set_history(self, entry: _Entry, history: Iterable[Tuple[float, int]]):
+        # history holds (epoch seconds, votes + likes) per rollup bucket
+        for at, amount in history:
+            for state in self._windows.values():
+                entry.keys[state.index] += amount * math.exp((at - state.landmark) / state.tau)
+
+    def _reload_history(self, poll_id: int, entry: _Entry, history: Iterable[Tuple[float, int]], now: float):
+        """
+        Replace a poll's keys with the ones its rollup history gives.
+        """
+        for state in self._windows.values():
+            if (now - state.landmark) / state.tau > MAX_EXPONENT:
+                self._rebase(state, now, keep=poll_id)
+        previous = entry.keys
+        entry.keys = [0.0] * len(WINDOWS)
+        self._set_history(entry, history)
+        for state in self._windows.values():
+            key = entry.keys[state.index]
+            state.total = max(state.total + key - previous[state.index], 0.0)
+            if key > 0 or poll_id in state.top:
+                self._place(state, poll_id, key, key >= previous[state.index])
+
+    def _load(self, db, poll_ids: Optional[List[int]], now: float):
+        """
+        Read poll metadata and rollup history, for every recently active
+        poll when poll_ids is None.
+        """
+        since = datetime.fromtimestamp(now, timezone.utc).replace(tzinfo=None) - timedelta(
+            seconds=max(WINDOWS.values()) * HISTORY_WINDOWS
+        )
+        rollups = PollActivityRollup
+        history_query = db.query(
+            rollups.poll_id, rollups.granularity, rollups.bucket, rollups.votes + rollups.likes
+        ).filter(rollups.bucket >= since)
+        poll_query = db.query(Poll.id, Poll.title, Poll.created_at, Poll.total_votes, Poll.total_likes)
+        if poll_ids is None:
+            active = select(rollups.poll_id).where(rollups.bucket >= since).distinct()
+            poll_query = poll_query.filter(Poll.id.in_(active))
+        else:
+            history_query = history_query.filter(rollups.poll_id.in_(poll_ids))
+            poll_query = poll_query.filter(Poll.id.in_(poll_ids))
+
+        history: Dict[int, List[Tuple[float, int]]] = {}
+        for poll_id, granularity, bucket, amount in history_query:
+            if amount:
+                at = min(_epoch(bucket + BUCKET_MIDPOINTS[granularity]), now)
+                history.setdefault(poll_id, []).append((at, amount))
+        return poll_query.all(), history
+
+    def _rebuild(self):
+        now = time.time()
+        db = SessionLocal()
+        try:
+            polls, history = self._load(db, None, now)
+        finally:
+            db.close()
+
+        self._entries = {}
+        for state in self._windows.values():
+            state.landmark = now
+        for poll_id, title, created_at, votes, likes in polls:
+            entry = _Entry(title, created_at, votes, likes)
+            self._set_history(entry, history.get(poll_id, ()))
+            self._entries[poll_id] = entry
+        for state in self._windows.values():
+            state.total = sum(entry.keys[state.index] for entry in self._entries.values())
+            self._reselect(state)
+        self._seeded = True
+
+    def _fetch(self, poll_ids: List[int], now: float):
+        db = SessionLocal()
+        try:
+            return self._load(db, poll_ids, now)
+        finally:
+            db.close()
+
+    async def refresh(self):
+        """
+        Reload the polls marked stale since the last refresh.
+        """
+        if not self._stale:
+            return
+        poll_ids = list(self._stale)
+        shrunk = self._shrunk & self._stale
+        self._stale.clear()
+        self._shrunk.clear()
+        now = time.time()
+        polls, history = await asyncio.to_thread(self._fetch, poll_ids, now)
+        self.refreshes += 1
+
+        found = set()
+        for poll_id, title, created_at, votes, likes in polls:
+            found.add(poll_id)
+            entry = self._entries.get(poll_id)
+            if entry is None:
+                # First sight: the rollups already hold everything so far
+                entry = _Entry(title, created_at, votes, likes)
+                self._entries[poll_id] = entry
+                self._reload_history(poll_id, entry, history.get(poll_id, ()), now)
+                continue
+
+            entry.title = title
+            entry.created_at = created_at
+            if poll_id in shrunk or votes < entry.votes or likes < entry.likes:
+                # Something was removed: the rollups took it out of the bucket
+                # it was cast in, so their keys are right and ours are not
+                if (votes, likes) != (entry.votes, entry.likes):
+                    # Events applied while the query ran are not in the
+                    # rollups read; one more refresh settles the difference
+                    self._stale.add(poll_id)
+                entry.votes = votes
+                entry.likes = likes
+                self._reload_history(poll_id, entry, history.get(poll_id, ()), now)
+                continue
+
+            # Events applied while the query ran may already be ahead of it
+            gained = (votes - entry.votes) + (likes - entry.likes)
+            if gained > 0:
+                entry.votes = votes
+                entry.likes = likes
+                self._add(poll_id, entry, gained, now)
+
+        for poll_id in poll_ids:
+            if poll_id not in found:
+                self._remove(poll_id)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Leaderboard refresh failed")
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "refresh_ms": self.refresh_interval * 1000,
+            "tracked_polls": len(self._entries),
+            "stale_polls": len(self._stale),
+            "events_applied": self.events_applied,
+            "refreshes": self.refreshes,
+            "reselections": self.reselections,
+            "rebases": self.rebases,
+        }
+
+leaderboard = Leaderboard(
+    size=int(os.getenv("LEADERBOARD_SIZE", "100")),
+    refresh_ms=float(os.getenv("LEADERBOARD_REFRESH_MS", "1000")),
+)
+poll_events.add_listener(leaderboard.observe)
@@ -0,0 +1,164 @@
+"""
+Versioned read-through cache for poll snapshots.
+
+A snapshot is the user-independent part of a PollResponse (options, counts,
+status, creator). Entries are keyed by (poll_id, version). Write paths call
+invalidate() after they commit, which bumps the poll's version, so a snapshot
+built from data read before the write can never be served afterwards.
+Every poll event delivered through the backplane invalidates too, so a write
+on one worker also evicts the snapshot cached by the others.
+
+Deleting a poll calls forget() instead, which drops the poll's version so the
+version map only holds polls that still exist. The IDs of the most recently
+deleted polls are remembered, so a snapshot still being built when its poll
+was deleted is not cached under the reset version.
+"""
+
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Hashable, Optional
+import os
+
+# Recently deleted polls whose in-flight snapshots are refused
+DELETED_POLLS_REMEMBERED = 1024
+
+class CacheBackend:
+    """
+    Storage interface used by PollSnapshotCache.
+
+    Implementations must be safe to call from the threadpool that runs the
+    synchronous route handlers.
+    """
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: Hashable, value: Any) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: Hashable) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+class LRUCacheBackend(CacheBackend):
+    """
+    In-process backend with a fixed number of entries and LRU eviction.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class PollSnapshotCache:
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._versions: Dict[int, int] = {}
+        self._deleted: "OrderedDict[int, None]" = OrderedDict()
+        self._lock = Lock()
+
+    def version(self, poll_id: int) -> int:
+        """
+        Current version of a poll. Read it before loading from the database
+        and pass it to set() so a concurrent write discards the result.
+        """
+        return self._versions.get(poll_id, 0)
+
+    def get(self, poll_id: int) -> Optional[Any]:
+        snapshot = self.backend.get((poll_id, self.version(poll_id)))
+        with self._lock:
+            if snapshot is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return snapshot
+
+    def set(self, poll_id: int, version: int, snapshot: Any) -> None:
+        if version != self.version(poll_id) or poll_id in self._deleted:
+            # The poll changed or was deleted while the snapshot was being built
+            return
+        self.backend.set((poll_id, version), snapshot)
+
+    def invalidate(self, poll_id: int) -> None:
+        with self._lock:
+            version = self._versions.get(poll_id, 0)
+            self._versions[poll_id] = version + 1
+        self.backend.delete((poll_id, version))
+
+    def forget(self, poll_id: int) -> None:
+        """
+        Drop the snapshot and version of a deleted poll.
+        """
+        with self._lock:
+            version = self._versions.pop(poll_id, 0)
+            self._deleted[poll_id] = None
+            self._deleted.move_to_end(poll_id)
+            while len(self._deleted) > DELETED_POLLS_REMEMBERED:
+                self._deleted.popitem(last=False)
+        self.backend.delete((poll_id, version))
+
+    def observe(self, message: dict) -> None:
+        """
+        Drop the snapshot of the poll an event is about. Registered as a
+        poll_events listener, so writes on other workers reach this cache.
+        """
+        poll_id = message.get("poll_id")
+        if poll_id is None:
+            return
+        if message.get("type") == "poll_deleted":
+            self.forget(poll_id)
+        else:
+            self.invalidate(poll_id)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        stats = {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "size": len(self.backend),
+            "tracked_versions": len(self._versions),
+        }
+        if isinstance(self.backend, LRUCacheBackend):
+            stats["max_size"] = self.backend.max_size
+            stats["evictions"] = self.backend.evictions
+        return stats
+
+poll_cache = PollSnapshotCache(LRUCacheBackend(max_size=int(os.getenv("POLL_CACHE_SIZE", "1024"))))
@@ -0,0 +1,197 @@
+"""
+Coalescing layer between the routes and the WebSocket connection manager.
+
+A burst of votes on one poll would otherwise send one poll_updated per vote
+to every client, and each client refetches the poll for every message.
+Instead, the first poll_updated for a poll is sent right away and opens a
+window (WS_COALESCE_MS, default 150). Further updates inside the window are
+merged into one pending message, later fields winning, which is sent when
+the window ends.
+
+Any other event for a poll (poll_closed, poll_deleted) first flushes the
+pending update so clients never see an update after a close. A pending
+update is simply dropped when the poll is deleted. Emitted messages go
+through a single outbox task, so they reach the backplane in order. The
+backplane (see app/services/backplane.py) fans them out to every worker,
+and each worker hands them to its own connection manager.
+
+Events may carry a delta with absolute values (changed option vote_counts,
+total_votes, total_likes, is_active) that clients apply without refetching.
+Merging keeps the newest value of each field and drops the delta if either
+side has none, since then something changed that a delta cannot express.
+The backplane gives every emitted event the poll's next seq number; a
+client that sees a gap in seq has missed an event and should refetch.
+"""
+
+from typing import Callable, Dict, List, Optional
+import asyncio
+import logging
+import os
+
+from app.services.backplane import Backplane, create_backplane
+from app.services.poll_cache import poll_cache
+from app.websocket import manager
+
+logger = logging.getLogger(__name__)
+
+# Events that may be merged within a window
+COALESCED_EVENT_TYPES = frozenset({"poll_updated"})
+
+def _merge(pending: dict, message: dict) -> dict:
+    merged = {**pending, **message}
+    if pending.get("delta") is None or message.get("delta") is None:
+        merged.pop("delta", None)
+        return merged
+
+    delta = {**pending["delta"], **message["delta"]}
+    if "options" in pending["delta"] or "options" in message["delta"]:
+        options = {option["id"]: option for option in pending["delta"].get("options", [])}
+        options.update((option["id"], option) for option in message["delta"].get("options", []))
+        delta["options"] = list(options.values())
+    merged["delta"] = delta
+    return merged
+
+class _Window:
+    __slots__ = ("timer", "pending", "everyone")
+
+    def __init__(self, timer: asyncio.TimerHandle):
+        self.timer = timer
+        self.pending: Optional[dict] = None
+        self.everyone = False
+
+class PollEventBroadcaster:
+    def __init__(self, backplane: Backplane, window_ms: float = 150):
+        self.backplane = backplane
+        self.backplane.bind(self._deliver_locally)
+        self.window = window_ms / 1000
+        self._windows: Dict[int, _Window] = {}
+        self._outbox: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._listeners: List[Callable[[dict], None]] = []
+
+        # Metrics
+        self.events_received = 0
+        self.events_emitted = 0
+        self.events_suppressed = 0
+
+    async def start(self):
+        await self.backplane.start()
+        self._outbox = asyncio.Queue()
+        self._task = asyncio.create_task(self._drain())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        # Send whatever is still pending before shutting down
+        for window in self._windows.values():
+            window.timer.cancel()
+            if window.pending is not None:
+                self._emit(window.pending, window.everyone)
+        self._windows.clear()
+        await self._outbox.join()
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._outbox = None
+        await self.backplane.stop()
+
+    async def publish(self, message: dict, everyone: bool = False):
+        """
+        Send a poll event to the poll's subscribers. Set everyone for events
+        every connected client should see, such as a new poll.
+        """
+        self.events_received += 1
+        if self._outbox is None or self.window <= 0:
+            # Not running inside the app lifespan, or coalescing is disabled
+            self.events_emitted += 1
+            await self.backplane.publish(message, everyone)
+            return
+
+        poll_id = message["poll_id"]
+        if message.get("type") not in COALESCED_EVENT_TYPES:
+            window = self._windows.pop(poll_id, None)
+            if window is not None:
+                window.timer.cancel()
+                if window.pending is not None:
+                    if message.get("type") == "poll_deleted":
+                        self.events_suppressed += 1
+                    else:
+                        self._emit(window.pending, window.everyone)
+            self._emit(message, everyone)
+            return
+
+        window = self._windows.get(poll_id)
+        if window is None:
+            self._emit(message, everyone)
+            self._open_window(poll_id)
+            return
+
+        if window.pending is None:
+            window.pending = dict(message)
+        else:
+            window.pending = _merge(window.pending, message)
+            self.events_suppressed += 1
+        window.everyone = window.everyone or everyone
+
+    def _open_window(self, poll_id: int):
+        timer = asyncio.get_running_loop().call_later(self.window, self._close_window, poll_id)
+        self._windows[poll_id] = _Window(timer)
+
+    def _close_window(self, poll_id: int):
+        window = self._windows.pop(poll_id, None)
+        if window is None or window.pending is None:
+            return
+        self._emit(window.pending, window.everyone)
+        # Keep throttling while updates keep arriving
+        self._open_window(poll_id)
+
+    def _emit(self, message: dict, everyone: bool):
+        self.events_emitted += 1
+        self._outbox.put_nowait((message, everyone))
+
+    async def _drain(self):
+        while True:
+            message, everyone = await self._outbox.get()
+            try:
+                await self.backplane.publish(message, everyone)
+            except Exception:
+                logger.exception("Failed to publish %s", message)
+            finally:
+                self._outbox.task_done()
+
+    def add_listener(self, listener: Callable[[dict], None]):
+        """
+        Call listener with every event delivered to this worker, before it
+        is sent to the clients. Listeners run on the event loop and must not block.
+        """
+        self._listeners.append(listener)
+
+    async def _deliver_locally(self, message: dict, everyone: bool):
+        # Runs on every worker for every event
+        for listener in self._listeners:
+            try:
+                listener(message)
+            except Exception:
+                logger.exception("Event listener failed for %s", message)
+        await manager.broadcast_event(message, message["poll_id"], everyone)
+
+    def stats(self) -> dict:
+        return {
+            "window_ms": self.window * 1000,
+            "open_windows": len(self._windows),
+            "events_received": self.events_received,
+            "events_emitted": self.events_emitted,
+            "events_suppressed": self.events_suppressed,
+            "backplane": self.backplane.stats(),
+        }
+
+poll_events = PollEventBroadcaster(
+    create_backplane(),
+    window_ms=float(os.getenv("WS_COALESCE_MS", "150")),
+)
+# Writes on any worker invalidate every worker's cached snapshot
+poll_events.add_listener(poll_cache.observe)
@@ -0,0 +1,100 @@
+"""
+Live viewer counts per poll.
+
+A viewer is a WebSocket connection subscribed to the poll, so the counts come
+straight from the connection manager's poll index. Joins and leaves only mark
+the poll as changed; every WS_PRESENCE_INTERVAL_MS (default 1000) a single
+task reports the changed local counts to the backplane, which sums them over
+all workers, and sends
+
+    {"type": "presence", "poll_id": 1, "viewers": 12}
+
+to the subscribers of each poll whose total changed. A poll therefore gets
+at most one presence event per interval however many clients come and go.
+Presence events carry no seq and are not kept for replay.
+
+The totals from the last round also back the viewers field of poll
+responses, so reading them never touches the database.
+"""
+
+from typing import Dict, Optional
+import asyncio
+import logging
+import os
+
+from app.services.backplane import Backplane
+from app.services.poll_events import poll_events
+from app.websocket import manager
+
+logger = logging.getLogger(__name__)
+
+class PresenceTracker:
+    def __init__(self, backplane: Backplane, interval_ms: float = 1000):
+        self.backplane = backplane
+        self.interval = interval_ms / 1000
+        self.totals: Dict[int, int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.rounds = 0
+        self.events_sent = 0
+
+    async def start(self):
+        if self.interval <= 0:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def count(self, poll_id: int) -> int:
+        return self.totals.get(poll_id, 0)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Presence refresh failed")
+
+    async def refresh(self):
+        """
+        Report local changes, pick up the new totals and tell the local
+        subscribers of every poll whose count moved.
+        """
+        totals = await self.backplane.sync_presence(manager.take_presence_changes())
+        previous = self.totals
+        self.totals = totals
+        self.rounds += 1
+
+        changed = [poll_id for poll_id, viewers in totals.items() if previous.get(poll_id) != viewers]
+        changed.extend(poll_id for poll_id in previous if poll_id not in totals)
+        for poll_id in changed:
+            if poll_id not in manager.poll_connections:
+                continue
+            await manager.broadcast_event(
+                {"type": "presence", "poll_id": poll_id, "viewers": totals.get(poll_id, 0)}, poll_id
+            )
+            self.events_sent += 1
+
+    def stats(self) -> dict:
+        return {
+            "interval_ms": self.interval * 1000,
+            "watched_polls": len(self.totals),
+            "viewers": sum(self.totals.values()),
+            "rounds": self.rounds,
+            "events_sent": self.events_sent,
+        }
+
+presence = PresenceTracker(
+    poll_events.backplane,
+    interval_ms=float(os.getenv("WS_PRESENCE_INTERVAL_MS", "1000")),
+)
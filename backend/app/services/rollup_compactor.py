@@ -0,0 +1,107 @@
+"""
+Background task that keeps the analytics rollup tables compact.
+
+Write paths add to hourly rollup rows (see app/utils/rollups.py). Every
+ROLLUP_COMPACT_INTERVAL_SECONDS (default 3600) this task folds hourly rows
+older than ROLLUP_HOURLY_RETENTION_HOURS (default 48) into daily rows, so
+a year of activity costs at most 365 rows per poll. Hourly trends for a
+window inside the retention read the hourly rows; older windows fall back
+to the raw tables.
+
+On start, the rollups are rebuilt from the raw tables when the totals row
+is missing, i.e. on the first start after upgrading an existing database.
+"""
+
+from datetime import datetime, timedelta
+from typing import Optional
+import asyncio
+import logging
+import os
+
+from app.db.database import SessionLocal
+from app.models.analytics_rollup import AnalyticsTotals
+from app.models.poll import Poll
+from app.utils.rollups import TOTALS_ID, compact_rollups, rebuild_rollups
+
+logger = logging.getLogger(__name__)
+
+class RollupCompactor:
+    def __init__(self, interval_seconds: float = 3600, retention_hours: float = 48):
+        self.interval = interval_seconds
+        self.retention = timedelta(hours=retention_hours)
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.runs = 0
+        self.rows_folded = 0
+        self.rebuilds = 0
+        self.last_run_at: Optional[datetime] = None
+
+    def hourly_cutoff(self, now: datetime) -> datetime:
+        """
+        Start of the oldest hour still kept as hourly rows (naive UTC).
+        """
+        return (now - self.retention).replace(minute=0, second=0, microsecond=0)
+
+    async def start(self):
+        await asyncio.to_thread(self._rebuild_if_missing)
+        if self.interval <= 0:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def _rebuild_if_missing(self):
+        db = SessionLocal()
+        try:
+            if db.get(AnalyticsTotals, TOTALS_ID) is not None:
+                return
+            if db.query(Poll.id).first() is None:
+                return
+            rebuild_rollups(db, self.hourly_cutoff(datetime.utcnow()))
+            self.rebuilds += 1
+            logger.info("Rebuilt analytics rollups from the raw tables")
+        finally:
+            db.close()
+
+    def compact(self) -> int:
+        db = SessionLocal()
+        try:
+            folded = compact_rollups(db, self.hourly_cutoff(datetime.utcnow()))
+        finally:
+            db.close()
+        self.runs += 1
+        self.rows_folded += folded
+        self.last_run_at = datetime.utcnow()
+        return folded
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.compact)
+            except Exception:
+                logger.exception("Rollup compaction failed")
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> dict:
+        return {
+            "interval_seconds": self.interval,
+            "hourly_retention_hours": self.retention.total_seconds() / 3600,
+            "runs": self.runs,
+            "rows_folded": self.rows_folded,
+            "rebuilds": self.rebuilds,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+        }
+
+rollup_compactor = RollupCompactor(
+    interval_seconds=float(os.getenv("ROLLUP_COMPACT_INTERVAL_SECONDS", "3600")),
+    retention_hours=float(os.getenv("ROLLUP_HOURLY_RETENTION_HOURS", "48")),
+)
@@ -0,0 +1,126 @@
+"""
+Request coalescing for expensive reads.
+
+do(key, factory) runs factory() once for any number of concurrent callers
+with the same key: the first caller starts it, the others wait for the same
+result (or exception). A caller that goes away does not cancel the shared
+call.
+
+cached(key, factory) adds a short TTL with stale-while-revalidate. A value
+younger than READ_CACHE_TTL_MS (default 2000) is returned as is. Up to
+READ_CACHE_STALE_MS (default 30000) after that, the old value is still
+returned immediately while one background call refreshes it. Older values
+are reloaded before returning. Cached values are kept per key without
+eviction, so use it for a small, fixed set of keys.
+
+Factories should use app.db.database.run_in_session rather than the session
+of the request, since the call may outlive that request.
+"""
+
+from typing import Any, Awaitable, Callable, Dict, Hashable, Set
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+Factory = Callable[[], Awaitable[Any]]
+
+class _Cached:
+    __slots__ = ("value", "loaded_at")
+
+    def __init__(self, value: Any, loaded_at: float):
+        self.value = value
+        self.loaded_at = loaded_at
+
+class SingleFlight:
+    def __init__(self, ttl_ms: float = 2000, stale_ms: float = 30000):
+        self.ttl = ttl_ms / 1000
+        self.stale = stale_ms / 1000
+        self._flights: Dict[Hashable, asyncio.Future] = {}
+        self._cached: Dict[Hashable, _Cached] = {}
+        self._refreshes: Set[asyncio.Task] = set()
+
+        # Metrics
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.fresh_hits = 0
+        self.stale_hits = 0
+        self.refresh_failures = 0
+
+    async def do(self, key: Hashable, factory: Factory) -> Any:
+        """
+        Return factory()'s result, sharing one call among concurrent callers.
+        """
+        self.calls += 1
+        flight = self._flights.get(key)
+        if flight is None:
+            self.executions += 1
+            flight = asyncio.ensure_future(factory())
+            self._flights[key] = flight
+            flight.add_done_callback(lambda done: self._land(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(flight)
+
+    def _land(self, key: Hashable, flight: asyncio.Future):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    async def cached(self, key: Hashable, factory: Factory) -> Any:
+        """
+        Return a recent result of factory(), refreshing stale ones in the background.
+        """
+        entry = self._cached.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry.loaded_at
+            if age < self.ttl:
+                self.fresh_hits += 1
+                return entry.value
+            if age < self.ttl + self.stale:
+                self.stale_hits += 1
+                if key not in self._flights:
+                    self._refresh(key, factory)
+                return entry.value
+        return await self.do(key, lambda: self._load(key, factory))
+
+    async def _load(self, key: Hashable, factory: Factory) -> Any:
+        value = await factory()
+        self._cached[key] = _Cached(value, time.monotonic())
+        return value
+
+    def _refresh(self, key: Hashable, factory: Factory):
+        task = asyncio.create_task(self.do(key, lambda: self._load(key, factory)))
+        self._refreshes.add(task)
+        task.add_done_callback(self._refreshed)
+
+    def _refreshed(self, task: asyncio.Task):
+        self._refreshes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            # Keep serving the old value until it is too stale
+            self.refresh_failures += 1
+            logger.error("Background refresh failed", exc_info=task.exception())
+
+    def invalidate(self, key: Hashable):
+        self._cached.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "ttl_ms": self.ttl * 1000,
+            "stale_ms": self.stale * 1000,
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "fresh_hits": self.fresh_hits,
+            "stale_hits": self.stale_hits,
+            "refresh_failures": self.refresh_failures,
+            "in_flight": len(self._flights),
+            "cached_keys": len(self._cached),
+        }
+
+read_flights = SingleFlight(
+    ttl_ms=float(os.getenv("READ_CACHE_TTL_MS", "2000")),
+    stale_ms=float(os.getenv("READ_CACHE_STALE_MS", "30000")),
+)
@@ -0,0 +1,204 @@
+"""
+Group-commit pipeline for vote and like writes.
+
+Routes submit a mutation function and await its result. A single writer task
+drains the queue in micro-batches and applies each batch inside one
+transaction, so a burst of votes costs one commit instead of one per request.
+
+Mutations are called as fn(db, *args). They must only stage changes and flush
+(never commit), and raise HTTPException for validation failures before
+touching any rows. If the batch commit fails (for example a concurrent
+writer hit a unique constraint) the batch is retried one mutation per
+transaction so only the conflicting request fails.
+
+Enable with WRITE_PIPELINE=true; tune with WRITE_PIPELINE_BATCH_SIZE and
+WRITE_PIPELINE_FLUSH_MS.
+"""
+
+from fastapi import HTTPException, status
+from sqlalchemy.exc import IntegrityError
+from typing import Any, Callable, List, Optional, Tuple
+import asyncio
+import logging
+import os
+import time
+
+from app.db.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+class _Mutation:
+    __slots__ = ("fn", "args", "conflict_detail", "future", "enqueued_at")
+
+    def __init__(self, fn: Callable, args: tuple, conflict_detail: str, future: Optional[asyncio.Future]):
+        self.fn = fn
+        self.args = args
+        self.conflict_detail = conflict_detail
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+class WritePipeline:
+    def __init__(self, enabled: bool = False, batch_size: int = 100, flush_interval_ms: float = 5):
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.batches = 0
+        self.mutations = 0
+        self.fallback_batches = 0
+        self.last_batch_size = 0
+        self.last_batch_ms = 0.0
+        self.max_batch_ms = 0.0
+        self.total_batch_ms = 0.0
+        self.total_wait_ms = 0.0
+
+    async def start(self):
+        if not self.enabled:
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        # Fail anything still queued rather than leaving requests hanging
+        while not self._queue.empty():
+            mutation = self._queue.get_nowait()
+            if not mutation.future.done():
+                mutation.future.set_exception(
+                    HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Server shutting down")
+                )
+
+    async def submit(self, fn: Callable, *args: Any, conflict_detail: str = "Conflicting write") -> Any:
+        """
+        Queue fn(db, *args) and wait until its batch has been committed.
+
+        Outside the app lifespan (no writer task) the mutation is applied
+        right away in a transaction of its own.
+        """
+        if self._task is None:
+            ok, value = await asyncio.to_thread(self._apply_one, _Mutation(fn, args, conflict_detail, None))
+            if ok:
+                return value
+            raise value
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(_Mutation(fn, args, conflict_detail, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            started = time.perf_counter()
+            try:
+                outcomes = await asyncio.to_thread(self._apply_batch, batch)
+            except Exception as exc:
+                logger.exception("Write pipeline batch failed")
+                outcomes = [(False, exc)] * len(batch)
+            finished = time.perf_counter()
+
+            self._record(batch, started, finished)
+            for mutation, (ok, value) in zip(batch, outcomes):
+                if mutation.future.done():
+                    continue
+                if ok:
+                    mutation.future.set_result(value)
+                else:
+                    mutation.future.set_exception(value)
+
+    def _apply_batch(self, batch: List[_Mutation]) -> List[Tuple[bool, Any]]:
+        db = SessionLocal()
+        try:
+            outcomes = []
+            for mutation in batch:
+                try:
+                    outcomes.append((True, mutation.fn(db, *mutation.args)))
+                except HTTPException as exc:
+                    # Validation failures happen before any rows are staged
+                    outcomes.append((False, exc))
+            db.commit()
+            return outcomes
+        except Exception:
+            db.rollback()
+            self.fallback_batches += 1
+        finally:
+            db.close()
+
+        return [self._apply_one(mutation) for mutation in batch]
+
+    def _apply_one(self, mutation: _Mutation) -> Tuple[bool, Any]:
+        db = SessionLocal()
+        try:
+            result = mutation.fn(db, *mutation.args)
+            db.commit()
+            return True, result
+        except HTTPException as exc:
+            db.rollback()
+            return False, exc
+        except IntegrityError:
+            db.rollback()
+            return False, HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=mutation.conflict_detail)
+        except Exception as exc:
+            db.rollback()
+            return False, exc
+        finally:
+            db.close()
+
+    def _record(self, batch: List[_Mutation], started: float, finished: float):
+        batch_ms = (finished - started) * 1000
+        self.batches += 1
+        self.mutations += len(batch)
+        self.last_batch_size = len(batch)
+        self.last_batch_ms = batch_ms
+        self.max_batch_ms = max(self.max_batch_ms, batch_ms)
+        self.total_batch_ms += batch_ms
+        self.total_wait_ms += sum((finished - mutation.enqueued_at) * 1000 for mutation in batch)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "batch_size": self.batch_size,
+            "flush_interval_ms": self.flush_interval * 1000,
+            "batches": self.batches,
+            "mutations": self.mutations,
+            "fallback_batches": self.fallback_batches,
+            "avg_batch_size": round(self.mutations / self.batches, 2) if self.batches else 0,
+            "last_batch_size": self.last_batch_size,
+            "last_batch_ms": round(self.last_batch_ms, 2),
+            "avg_batch_ms": round(self.total_batch_ms / self.batches, 2) if self.batches else 0,
+            "max_batch_ms": round(self.max_batch_ms, 2),
+            "avg_request_wait_ms": round(self.total_wait_ms / self.mutations, 2) if self.mutations else 0,
+        }
+
+write_pipeline = WritePipeline(
+    enabled=os.getenv("WRITE_PIPELINE", "false").lower() in ("1", "true", "yes", "on"),
+    batch_size=int(os.getenv("WRITE_PIPELINE_BATCH_SIZE", "100")),
+    flush_interval_ms=float(os.getenv("WRITE_PIPELINE_FLUSH_MS", "5")),
+)
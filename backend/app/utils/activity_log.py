@@ -0,0 +1,122 @@
+"""
+Utility functions for the activity_events log behind the activity feed.
+
+Vote, like and poll write paths append one event per new row in the same
+transaction as the row itself. Each append is a single INSERT ... SELECT
+that copies the username and poll title in, so writing costs no extra
+round trip and reading the feed needs no joins.
+
+Run this module to rebuild the log from the votes, likes and polls tables:
+    python -m app.utils.activity_log
+"""
+
+from datetime import datetime, timezone
+from typing import Iterable, Tuple
+from sqlalchemy import Integer, String, bindparam, delete, insert, literal, select, union_all
+from sqlalchemy.orm import Session
+from app.models.activity_event import ActivityEvent
+from app.models.analytics_rollup import AnalyticsTotals
+from app.models.like import Like
+from app.models.poll import Poll
+from app.models.user import User
+from app.models.vote import Vote
+from app.utils.rollups import adjust_totals
+
+# (type, user_id, poll_id, timestamp)
+Activity = Tuple[str, int, int, datetime]
+
+def _naive_utc(at: datetime) -> datetime:
+    # Stored timestamps are naive UTC
+    if at.tzinfo is not None:
+        return at.astimezone(timezone.utc).replace(tzinfo=None)
+    return at
+
+def _append_statement():
+    events = ActivityEvent.__table__
+    user_id = bindparam("event_user_id", type_=Integer)
+    poll_id = bindparam("event_poll_id", type_=Integer)
+    source = select(
+        bindparam("event_type", type_=String),
+        user_id,
+        select(User.username).where(User.id == user_id).scalar_subquery(),
+        poll_id,
+        select(Poll.title).where(Poll.id == poll_id).scalar_subquery(),
+        bindparam("event_created_at", type_=events.c.created_at.type),
+    )
+    return insert(events).from_select(
+        ["type", "user_id", "username", "poll_id", "poll_title", "created_at"], source
+    )
+
+_APPEND = _append_statement()
+
+def record_event(db: Session, event_type: str, user_id: int, poll_id: int, at: datetime):
+    """
+    Append one event to the activity log and count it in the totals.
+
+    Args:
+        db: Database session
+        event_type: vote, like or created
+        user_id: ID of the acting user
+        poll_id: ID of the poll acted on
+        at: When it happened
+    """
+    record_events(db, [(event_type, user_id, poll_id, at)])
+
+def record_events(db: Session, activities: Iterable[Activity]):
+    """
+    Append many events with one executemany INSERT ... SELECT.
+    """
+    params = [
+        {
+            "event_type": event_type,
+            "event_user_id": user_id,
+            "event_poll_id": poll_id,
+            "event_created_at": _naive_utc(at),
+        }
+        for event_type, user_id, poll_id, at in activities
+    ]
+    if not params:
+        return
+    db.execute(_APPEND, params)
+    adjust_totals(db, activities=len(params))
+
+def rebuild_activity_log(db: Session) -> int:
+    """
+    Replace the log with one event per existing vote, like and poll, and commit.
+
+    Returns:
+        Number of events written
+    """
+    sources = [
+        select(literal("vote"), Vote.user_id, User.username, Vote.poll_id, Poll.title, Vote.created_at)
+        .join(Poll, Poll.id == Vote.poll_id)
+        .outerjoin(User, User.id == Vote.user_id),
+        select(literal("like"), Like.user_id, User.username, Like.poll_id, Poll.title, Like.created_at)
+        .join(Poll, Poll.id == Like.poll_id)
+        .outerjoin(User, User.id == Like.user_id),
+        select(literal("created"), Poll.creator_id, User.username, Poll.id, Poll.title, Poll.created_at)
+        .outerjoin(User, User.id == Poll.creator_id),
+    ]
+    events = union_all(*sources).subquery()
+    ordered = select(*events.c).order_by(events.c[5])
+
+    db.execute(delete(ActivityEvent))
+    db.execute(
+        insert(ActivityEvent.__table__).from_select(
+            ["type", "user_id", "username", "poll_id", "poll_title", "created_at"], ordered
+        )
+    )
+    count = db.query(ActivityEvent).count()
+    # Without a totals row, the next rollup rebuild counts the log itself
+    db.query(AnalyticsTotals).update({AnalyticsTotals.activities: count}, synchronize_session=False)
+    db.commit()
+    return count
+
+if __name__ == "__main__":
+    from app.db.database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        print(f"Rebuilt activity log with {rebuild_activity_log(session)} events")
+    finally:
+        session.close()
@@ -0,0 +1,192 @@
+"""
+Utility functions for the denormalized vote/like counters.
+
+Option.vote_count, Poll.total_votes and Poll.total_likes are updated in the
+same transaction as the vote/like row they describe. The helpers below only
+stage the UPDATE statements; callers commit (or roll back) them together with
+the row change.
+
+Run this module to rebuild every counter from the base tables:
+    python -m app.utils.counters
+"""
+
+from sqlalchemy import and_, bindparam, func, select, update
+from typing import Dict, Iterable, Optional
+from sqlalchemy.orm import Session
+from app.models.poll import Poll
+from app.models.option import Option
+from app.models.vote import Vote
+from app.models.like import Like
+
+def _update_poll(db: Session, poll_id: int, values: dict):
+    # Keep updated_at untouched - counter changes are not poll edits
+    values[Poll.updated_at] = Poll.updated_at
+    db.query(Poll).filter(Poll.id == poll_id).update(values, synchronize_session=False)
+
+def apply_vote_counters(db: Session, poll_id: int, option_id: int, delta: int):
+    """
+    Add delta to an option's vote_count and its poll's total_votes.
+
+    Args:
+        db: Database session
+        poll_id: ID of the poll the vote belongs to
+        option_id: ID of the option the vote was cast for
+        delta: +1 for a new vote, -1 for a removed vote
+    """
+    db.query(Option).filter(Option.id == option_id).update(
+        {Option.vote_count: Option.vote_count + delta}, synchronize_session=False
+    )
+    _update_poll(db, poll_id, {Poll.total_votes: Poll.total_votes + delta})
+
+def move_vote_counter(db: Session, old_option_id: int, new_option_id: int):
+    """
+    Move one vote from old_option_id to new_option_id. The poll total is unchanged.
+    """
+    if old_option_id == new_option_id:
+        return
+    db.query(Option).filter(Option.id == old_option_id).update(
+        {Option.vote_count: Option.vote_count - 1}, synchronize_session=False
+    )
+    db.query(Option).filter(Option.id == new_option_id).update(
+        {Option.vote_count: Option.vote_count + 1}, synchronize_session=False
+    )
+
+def remove_option_votes(db: Session, poll_id: int, vote_count: int):
+    """
+    Subtract the votes of a deleted option from its poll's total_votes.
+    """
+    if vote_count:
+        _update_poll(db, poll_id, {Poll.total_votes: Poll.total_votes - vote_count})
+
+def apply_like_counter(db: Session, poll_id: int, delta: int):
+    """
+    Add delta to a poll's total_likes.
+    """
+    _update_poll(db, poll_id, {Poll.total_likes: Poll.total_likes + delta})
+
+def apply_vote_counter_deltas(db: Session, option_deltas: Dict[int, int], poll_deltas: Dict[int, int]):
+    """
+    Apply many counter changes at once, one executemany per table.
+
+    Args:
+        db: Database session
+        option_deltas: Mapping of option ID to vote_count change
+        poll_deltas: Mapping of poll ID to total_votes change
+    """
+    options = Option.__table__
+    polls = Poll.__table__
+
+    option_params = [
+        {"b_id": option_id, "b_delta": delta}
+        for option_id, delta in option_deltas.items() if delta
+    ]
+    if option_params:
+        db.execute(
+            update(options)
+            .where(options.c.id == bindparam("b_id"))
+            .values(vote_count=options.c.vote_count + bindparam("b_delta")),
+            option_params,
+        )
+
+    poll_params = [
+        {"b_id": poll_id, "b_delta": delta}
+        for poll_id, delta in poll_deltas.items() if delta
+    ]
+    if poll_params:
+        db.execute(
+            update(polls)
+            .where(polls.c.id == bindparam("b_id"))
+            .values(
+                total_votes=polls.c.total_votes + bindparam("b_delta"),
+                updated_at=polls.c.updated_at,
+            ),
+            poll_params,
+        )
+
+def read_poll_deltas(db: Session, poll_ids: Iterable[int], option_ids: Iterable[int]) -> Dict[int, dict]:
+    """
+    Read the current counters of some polls and options in one query.
+
+    Called inside the write transaction, after the counter updates are staged,
+    to build the delta attached to poll_updated events.
+
+    Args:
+        db: Database session
+        poll_ids: IDs of the polls that changed
+        option_ids: IDs of the options whose vote_count changed
+
+    Returns:
+        Mapping of poll ID to a delta with the changed options, total_votes,
+        total_likes and is_active
+    """
+    rows = db.execute(
+        select(
+            Poll.id,
+            Poll.total_votes,
+            Poll.total_likes,
+            Poll.is_active,
+            Option.id.label("option_id"),
+            Option.vote_count,
+        )
+        .outerjoin(Option, and_(Option.poll_id == Poll.id, Option.id.in_(list(option_ids))))
+        .where(Poll.id.in_(list(poll_ids)))
+    )
+
+    deltas: Dict[int, dict] = {}
+    for row in rows:
+        delta = deltas.setdefault(row.id, {
+            "options": [],
+            "total_votes": row.total_votes,
+            "total_likes": row.total_likes,
+            "is_active": row.is_active,
+        })
+        if row.option_id is not None:
+            delta["options"].append({"id": row.option_id, "vote_count": row.vote_count})
+    return deltas
+
+def read_poll_delta(db: Session, poll_id: int, option_ids: Iterable[int] = ()) -> Optional[dict]:
+    """
+    Single-poll form of read_poll_deltas.
+    """
+    return read_poll_deltas(db, [poll_id], option_ids).get(poll_id)
+
+def reconcile_counters(db: Session):
+    """
+    Rebuild every counter column from the votes and likes tables.
+
+    Args:
+        db: Database session
+
+    Returns:
+        Dictionary with the number of options and polls rewritten
+    """
+    option_votes = (
+        select(func.count(Vote.id)).where(Vote.option_id == Option.id).scalar_subquery()
+    )
+    poll_votes = select(func.count(Vote.id)).where(Vote.poll_id == Poll.id).scalar_subquery()
+    poll_likes = select(func.count(Like.id)).where(Like.poll_id == Poll.id).scalar_subquery()
+
+    options_updated = db.query(Option).update(
+        {Option.vote_count: option_votes}, synchronize_session=False
+    )
+    polls_updated = db.query(Poll).update(
+        {
+            Poll.total_votes: poll_votes,
+            Poll.total_likes: poll_likes,
+            Poll.updated_at: Poll.updated_at,
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+
+    return {"options": options_updated, "polls": polls_updated}
+
+if __name__ == "__main__":
+    from app.db.database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        result = reconcile_counters(session)
+        print(f"Reconciled counters for {result['options']} options and {result['polls']} polls.")
+    finally:
+        session.close()
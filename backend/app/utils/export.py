@@ -0,0 +1,211 @@
+"""
+Streaming bulk export of polls, options, votes and likes.
+
+Rows are read with a server-side cursor (yield_per) in batches of
+EXPORT_BATCH_SIZE and written out batch by batch as NDJSON or CSV,
+optionally gzipped on the fly, so memory use does not grow with the size
+of the export. Only plain column tuples are read; no ORM objects are built.
+
+Serves GET /analytics/export, and can be run directly:
+    python -m app.utils.export --entity votes --format csv --poll-id 1 --gzip -o votes.csv.gz
+"""
+
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional, Sequence, Tuple
+import csv
+import io
+import json
+import logging
+import os
+import time
+import zlib
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.models.like import Like
+from app.models.option import Option
+from app.models.poll import Poll
+from app.models.vote import Vote
+
+logger = logging.getLogger(__name__)
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# Entity -> (model, exported columns, poll id column)
+EXPORT_ENTITIES = {
+    "polls": (Poll, ("id", "title", "description", "creator_id", "created_at", "updated_at",
+                     "is_active", "closes_at", "total_votes", "total_likes"), "id"),
+    "options": (Option, ("id", "poll_id", "text", "created_at", "vote_count"), "poll_id"),
+    "votes": (Vote, ("id", "user_id", "poll_id", "option_id", "created_at"), "poll_id"),
+    "likes": (Like, ("id", "user_id", "poll_id", "created_at"), "poll_id"),
+}
+
+EXPORT_FORMATS = ("ndjson", "csv")
+
+def as_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Stored timestamps are naive UTC
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def iter_entity_batches(
+    db: Session,
+    entity: str,
+    poll_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> Iterator[Sequence[Tuple]]:
+    """
+    Yield the matching rows of one entity as batches of column tuples, in id order.
+
+    Args:
+        db: Database session
+        entity: polls, options, votes or likes
+        poll_id: Only rows of this poll
+        since, until: Only rows created in [since, until)
+        batch_size: Rows fetched from the cursor at a time
+    """
+    model, columns, poll_column = EXPORT_ENTITIES[entity]
+    query = select(*(getattr(model, name) for name in columns)).order_by(model.id)
+    if poll_id is not None:
+        query = query.where(getattr(model, poll_column) == poll_id)
+    if since is not None:
+        query = query.where(model.created_at >= as_naive_utc(since))
+    if until is not None:
+        query = query.where(model.created_at < as_naive_utc(until))
+
+    result = db.execute(query.execution_options(yield_per=batch_size))
+    try:
+        for batch in result.partitions():
+            yield batch
+    finally:
+        result.close()
+
+def _encode_ndjson(entity: str, columns: Sequence[str], batch: Sequence[Tuple]) -> str:
+    return "".join(
+        json.dumps({"entity": entity, **{name: _plain(value) for name, value in zip(columns, row)}}) + "\n"
+        for row in batch
+    )
+
+def _encode_csv(batch: Sequence[Tuple]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([_plain(value) for value in row] for row in batch)
+    return buffer.getvalue()
+
+class ExportStats:
+    """
+    Row count and throughput of one export, filled in while it streams.
+    """
+    def __init__(self):
+        self.rows = 0
+        self.bytes = 0
+        self.started_at = time.perf_counter()
+        self.finished_at: Optional[float] = None
+
+    @property
+    def seconds(self) -> float:
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+def stream_export(
+    db: Session,
+    entities: List[str],
+    export_format: str = "ndjson",
+    poll_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    compress: bool = False,
+    stats: Optional[ExportStats] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> Iterator[bytes]:
+    """
+    Yield the export as byte chunks, one per batch of rows.
+
+    NDJSON lines carry an "entity" field, so several entities can share one
+    stream. CSV has a single header row and therefore takes one entity.
+
+    Raises:
+        ValueError: For an unknown entity or format, or CSV with several entities
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {export_format}")
+    unknown = [entity for entity in entities if entity not in EXPORT_ENTITIES]
+    if unknown:
+        raise ValueError(f"Unknown export entities: {', '.join(unknown)}")
+    if export_format == "csv" and len(entities) != 1:
+        raise ValueError("CSV exports take exactly one entity")
+
+    stats = stats or ExportStats()
+    # wbits=31 writes a gzip header and trailer
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def emit(text: str) -> bytes:
+        data = text.encode()
+        stats.bytes += len(data)
+        return compressor.compress(data) if compressor else data
+
+    for entity in entities:
+        columns = EXPORT_ENTITIES[entity][1]
+        if export_format == "csv":
+            chunk = emit(",".join(columns) + "\r\n")
+            if chunk:
+                yield chunk
+        for batch in iter_entity_batches(db, entity, poll_id, since, until, batch_size):
+            stats.rows += len(batch)
+            if export_format == "csv":
+                chunk = emit(_encode_csv(batch))
+            else:
+                chunk = emit(_encode_ndjson(entity, columns, batch))
+            if chunk:
+                yield chunk
+
+    if compressor:
+        yield compressor.flush()
+    stats.finished_at = time.perf_counter()
+    logger.info(
+        "Exported %d rows (%s) in %.2fs, %.0f rows/s",
+        stats.rows, ", ".join(entities), stats.seconds, stats.rows_per_second,
+    )
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    from app.db.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Export polls, options, votes and likes.")
+    parser.add_argument("--entity", action="append", choices=list(EXPORT_ENTITIES),
+                        help="Entity to export, repeatable (default: all for NDJSON)")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson")
+    parser.add_argument("--poll-id", type=int)
+    parser.add_argument("--since", type=datetime.fromisoformat, help="ISO timestamp, inclusive")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="ISO timestamp, exclusive")
+    parser.add_argument("--gzip", action="store_true", help="Compress the output with gzip")
+    parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+    args = parser.parse_args()
+
+    entities = args.entity or list(EXPORT_ENTITIES)
+    stats = ExportStats()
+    session = SessionLocal()
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in stream_export(session, entities, args.format, args.poll_id, args.since,
+                                   args.until, args.gzip, stats):
+            output.write(chunk)
+    except ValueError as error:
+        parser.error(str(error))
+    finally:
+        if args.output:
+            output.close()
+        session.close()
+    print(
+        f"Exported {stats.rows} rows in {stats.seconds:.2f}s ({stats.rows_per_second:.0f} rows/s)",
+        file=sys.stderr,
+    )
@@ -0,0 +1,251 @@
+"""
+Utility functions for the analytics rollup tables.
+
+poll_activity_rollups holds votes, likes and poll creations per poll and
+hour (or day, once compacted), and analytics_totals holds the platform-wide
+counts. Write paths stage their changes with record_activity() and
+adjust_totals() in the same transaction as the rows they describe, so the
+analytics endpoints never have to scan the raw tables.
+
+Run this module to rebuild both tables from the raw tables:
+    python -m app.utils.rollups
+"""
+
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from app.models.activity_event import ActivityEvent
+from app.models.analytics_rollup import AnalyticsTotals, PollActivityRollup
+from app.models.like import Like
+from app.models.option import Option
+from app.models.poll import Poll
+from app.models.vote import Vote
+
+# Bucket labels; the strftime formats are shared by SQLite and Python
+BUCKET_LABEL_FORMATS = {
+    "minute": "%Y-%m-%dT%H:%M",
+    "hour": "%Y-%m-%dT%H:00",
+    "day": "%Y-%m-%d",
+}
+
+POSTGRES_BUCKET_LABEL_FORMATS = {
+    "minute": 'YYYY-MM-DD"T"HH24:MI',
+    "hour": 'YYYY-MM-DD"T"HH24:00',
+    "day": "YYYY-MM-DD",
+}
+
+TOTALS_ID = 1
+
+# (poll_id, timestamp, votes, likes, polls)
+Activity = Tuple[int, datetime, int, int, int]
+
+def bucket_label(db: Session, column, granularity: str):
+    """
+    SQL expression for the minute, hour or day label of a timestamp column.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        return func.to_char(column, POSTGRES_BUCKET_LABEL_FORMATS[granularity])
+    return func.strftime(BUCKET_LABEL_FORMATS[granularity], column)
+
+def _insert(db: Session):
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        return sqlite_insert
+    if dialect == "postgresql":
+        return postgresql_insert
+    raise RuntimeError(f"Rollup upsert is not supported on {dialect}")
+
+def _hour(at: datetime) -> datetime:
+    # Buckets are naive UTC, like the stored timestamps
+    if at.tzinfo is not None:
+        at = at.astimezone(timezone.utc).replace(tzinfo=None)
+    return at.replace(minute=0, second=0, microsecond=0)
+
+def record_activity(db: Session, poll_id: int, at: datetime, votes: int = 0, likes: int = 0, polls: int = 0):
+    """
+    Add to the hourly rollup row of a poll that contains at.
+
+    Args:
+        db: Database session
+        poll_id: ID of the poll
+        at: When the vote, like or poll was created
+        votes, likes, polls: Changes to add, negative for removals
+    """
+    record_activities(db, [(poll_id, at, votes, likes, polls)])
+
+def record_activities(db: Session, activities: Iterable[Activity]):
+    """
+    Add many changes to their hourly rollup rows with one executemany upsert.
+    """
+    merged: Dict[Tuple[int, datetime], List[int]] = defaultdict(lambda: [0, 0, 0])
+    for poll_id, at, votes, likes, polls in activities:
+        counts = merged[(poll_id, _hour(at))]
+        counts[0] += votes
+        counts[1] += likes
+        counts[2] += polls
+    _add_to_buckets(db, "hour", merged)
+
+def _add_to_buckets(db: Session, granularity: str, counts: Dict[Tuple[int, datetime], List[int]]):
+    params = [
+        {
+            "poll_id": poll_id,
+            "granularity": granularity,
+            "bucket": bucket,
+            "votes": votes,
+            "likes": likes,
+            "polls": polls,
+        }
+        for (poll_id, bucket), (votes, likes, polls) in counts.items()
+        if votes or likes or polls
+    ]
+    if not params:
+        return
+
+    rollups = PollActivityRollup.__table__
+    statement = _insert(db)(rollups)
+    statement = statement.on_conflict_do_update(
+        index_elements=["poll_id", "granularity", "bucket"],
+        set_={
+            "votes": rollups.c.votes + statement.excluded.votes,
+            "likes": rollups.c.likes + statement.excluded.likes,
+            "polls": rollups.c.polls + statement.excluded.polls,
+        },
+    )
+    db.execute(statement, params)
+
+def adjust_totals(
+    db: Session,
+    polls: int = 0,
+    active_polls: int = 0,
+    options: int = 0,
+    votes: int = 0,
+    likes: int = 0,
+    activities: int = 0,
+):
+    """
+    Add to the platform-wide totals, creating the row on first use.
+    """
+    values = {
+        "polls": polls,
+        "active_polls": active_polls,
+        "options": options,
+        "votes": votes,
+        "likes": likes,
+        "activities": activities,
+    }
+    if not any(values.values()):
+        return
+
+    totals = AnalyticsTotals.__table__
+    statement = _insert(db)(totals).values(id=TOTALS_ID, **values)
+    statement = statement.on_conflict_do_update(
+        index_elements=["id"],
+        set_={name: totals.c[name] + statement.excluded[name] for name in values},
+    )
+    db.execute(statement)
+
+def remove_poll_rollups(db: Session, poll_id: int):
+    """
+    Drop a deleted poll's rollup rows; its votes and likes go with it.
+    """
+    db.execute(delete(PollActivityRollup).where(PollActivityRollup.poll_id == poll_id))
+
+def read_totals(db: Session) -> AnalyticsTotals:
+    """
+    Current totals, all zero before the first write.
+    """
+    totals = db.get(AnalyticsTotals, TOTALS_ID)
+    if totals is None:
+        return AnalyticsTotals(id=TOTALS_ID, polls=0, active_polls=0, options=0, votes=0, likes=0, activities=0)
+    return totals
+
+def compact_rollups(db: Session, before: datetime) -> int:
+    """
+    Fold hourly rows older than before into daily rows and commit.
+
+    The hourly rows are deleted first with RETURNING, so a concurrent write
+    to one of them either lands before the delete and is folded in, or
+    after it and creates a fresh hourly row for the next run.
+
+    Returns:
+        Number of hourly rows folded
+    """
+    rollups = PollActivityRollup.__table__
+    rows = db.execute(
+        delete(rollups)
+        .where(rollups.c.granularity == "hour", rollups.c.bucket < before)
+        .returning(rollups.c.poll_id, rollups.c.bucket, rollups.c.votes, rollups.c.likes, rollups.c.polls)
+    ).all()
+
+    daily: Dict[Tuple[int, datetime], List[int]] = defaultdict(lambda: [0, 0, 0])
+    for row in rows:
+        counts = daily[(row.poll_id, row.bucket.replace(hour=0))]
+        counts[0] += row.votes
+        counts[1] += row.likes
+        counts[2] += row.polls
+    _add_to_buckets(db, "day", daily)
+    db.commit()
+    return len(rows)
+
+def _hourly_counts(db: Session, created_at, poll_column) -> Dict[Tuple[int, datetime], int]:
+    label = bucket_label(db, created_at, "hour")
+    rows = db.execute(select(poll_column, label, func.count()).group_by(poll_column, label))
+    return {
+        (poll_id, datetime.strptime(hour, "%Y-%m-%dT%H:%M")): count
+        for poll_id, hour, count in rows
+        if hour is not None
+    }
+
+def rebuild_rollups(db: Session, compact_before: Optional[datetime] = None):
+    """
+    Recompute both rollup tables from the raw tables and commit.
+
+    Args:
+        db: Database session
+        compact_before: If given, fold hourly rows older than this into days
+
+    Returns:
+        Dictionary with the number of rollup rows written and the new totals
+    """
+    db.execute(delete(PollActivityRollup))
+    db.execute(delete(AnalyticsTotals))
+
+    counts: Dict[Tuple[int, datetime], List[int]] = defaultdict(lambda: [0, 0, 0])
+    for position, (created_at, poll_column) in enumerate((
+        (Vote.created_at, Vote.poll_id),
+        (Like.created_at, Like.poll_id),
+        (Poll.created_at, Poll.id),
+    )):
+        for key, count in _hourly_counts(db, created_at, poll_column).items():
+            counts[key][position] += count
+    _add_to_buckets(db, "hour", counts)
+
+    totals = {
+        "polls": db.query(func.count(Poll.id)).scalar(),
+        "active_polls": db.query(func.count(Poll.id)).filter(Poll.is_active == True).scalar(),
+        "options": db.query(func.count(Option.id)).scalar(),
+        "votes": db.query(func.count(Vote.id)).scalar(),
+        "likes": db.query(func.count(Like.id)).scalar(),
+        "activities": db.query(func.count(ActivityEvent.id)).scalar(),
+    }
+    db.add(AnalyticsTotals(id=TOTALS_ID, **totals))
+    db.commit()
+
+    if compact_before is not None:
+        compact_rollups(db, compact_before)
+    return {"rows": len(counts), "totals": totals}
+
+if __name__ == "__main__":
+    from app.db.database import SessionLocal
+    from app.services.rollup_compactor import rollup_compactor
+
+    session = SessionLocal()
+    try:
+        result = rebuild_rollups(session, rollup_compactor.hourly_cutoff(datetime.utcnow()))
+        print(f"Rebuilt rollups from {result['rows']} hourly buckets. Totals: {result['totals']}")
+    finally:
+        session.close()
@@ -1,61 +1,714 @@
-from fastapi import WebSocket, WebSocketDisconnect
-from typing import List, Dict
+"""
+WebSocket connection manager.
+
+Every connection gets a bounded outbound queue drained by its own writer
+task, so broadcasts only enqueue and never wait on a socket. The writer
+task only exists while the queue has messages, so idle connections cost a
+small fixed amount of memory. When a client
+reads slower than events arrive and its queue fills up, the slow-consumer
+policy decides what happens:
+
+    drop_oldest  discard the oldest queued message
+    coalesce     replace a queued message for the same event and poll,
+                 otherwise discard the oldest
+    disconnect   close the connection
+
+Configure with WS_SEND_QUEUE_SIZE and WS_SLOW_CONSUMER_POLICY.
+
+Poll events are routed through a poll id -> connection set index. Sockets on
+/ws/{poll_id} are subscribed to that poll; sockets on /ws choose their polls
+with a small JSON control protocol:
+
+    {"type": "subscribe", "poll_ids": [1, 2]}    -> {"type": "subscribed", "poll_ids": [...]}
+    {"type": "unsubscribe", "poll_ids": [1]}     -> {"type": "unsubscribed", "poll_ids": [...]}
+    {"type": "ping"}                             -> {"type": "pong"}
+
+Client messages are rate limited per connection with a token bucket
+(WS_CLIENT_RATE messages per second, bursts of WS_CLIENT_BURST), and a
+connection may follow at most WS_MAX_SUBSCRIPTIONS polls. WS_MAX_CONNECTIONS
+and WS_MAX_CONNECTIONS_PER_POLL cap the sockets per process and per poll.
+
+Every WS_HEARTBEAT_SECONDS the server sends {"type": "heartbeat"}; clients
+answer with {"type": "pong"} (or any other message). Connections that have
+been silent for WS_IDLE_TIMEOUT_SECONDS are closed.
+
+The last WS_REPLAY_BUFFER events of each poll are kept in a ring buffer.
+A reconnecting client passes the last seq it saw (/ws/{poll_id}?last_seq=N,
+or "last_seq": {"<poll_id>": N} in a subscribe message) and only gets the
+events it missed. If the buffer cannot prove continuity (it no longer
+reaches back that far, or after a restart it is empty or behind last_seq),
+it gets a poll_snapshot with the full poll instead, followed by any newer
+events.
+
+Read-only Server-Sent Event streams (GET /polls/{poll_id}/stream) share the
+registry, routing, replay and slow-consumer policy with WebSockets. They are
+keyed by their Request and have no writer task; the response generator
+drains the queue itself. Events with a seq carry an SSE id of the form
+"<poll_id>:<seq>[,<poll_id>:<seq>...]" that the browser sends back as
+Last-Event-ID when it reconnects.
+"""
+
+from collections import OrderedDict, deque
+from fastapi import Request, WebSocket, WebSocketDisconnect
+from typing import (
+    AsyncIterator, Awaitable, Callable, Deque, Dict, Hashable, Iterable, List, Optional, Set, Tuple, Union,
+)
+import asyncio
 import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+SLOW_CONSUMER_POLICIES = ("drop_oldest", "coalesce", "disconnect")
+
+# Close code sent to clients evicted by the disconnect policy
+SLOW_CONSUMER_CLOSE_CODE = 1008
+# Close code for idle connections
+IDLE_CLOSE_CODE = 1001
+# Close code when a connection cap is reached
+CAPACITY_CLOSE_CODE = 1013
+
+# An open socket, or the request of an SSE stream
+Transport = Union[WebSocket, Request]
+
+# Loads the current state of a poll as a JSON-ready dict, or None if it is gone
+SnapshotLoader = Callable[[int], Awaitable[Optional[dict]]]
+
+def _sse_frame(text: str, poll_id: Optional[int] = None, seq: Optional[int] = None) -> str:
+    if seq is None:
+        return f"data: {text}\n\n"
+    return f"id: {poll_id}:{seq}\ndata: {text}\n\n"
+
+def parse_event_id(raw: Optional[str], poll_ids: List[int]) -> Optional[Dict[int, int]]:
+    """
+    Parse an SSE Last-Event-ID into last seen seq per poll. A bare number is
+    accepted for single-poll streams. Returns None if it is malformed.
+    """
+    if not raw:
+        return {}
+    if raw.strip().isdigit() and len(poll_ids) == 1:
+        return {poll_ids[0]: int(raw)}
+    last_seqs = {}
+    for part in raw.split(","):
+        poll_id, _, seq = part.partition(":")
+        try:
+            last_seqs[int(poll_id)] = int(seq)
+        except ValueError:
+            return None
+    return last_seqs
+
+def _coalesce_key(message: dict) -> Optional[Hashable]:
+    # Only poll events can be merged, a newer one carries the latest state
+    poll_id = message.get("poll_id")
+    if poll_id is None:
+        return None
+    return message.get("type"), poll_id
+
+class ClientConnection:
+    """
+    A socket with its own outbound queue, writer task and metadata.
+    """
+
+    event_stream = False
+
+    __slots__ = (
+        "websocket", "max_queue", "user_id", "connected_at", "last_seen", "messages_sent",
+        "bytes_sent", "subscriptions", "tokens", "tokens_updated", "_queue", "_on_error", "_task",
+    )
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_queue: int,
+        on_error: Callable[["ClientConnection"], None],
+        user_id: Optional[int] = None,
+    ):
+        now = time.monotonic()
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self.user_id = user_id
+        self.connected_at = now
+        # Last time the client sent anything
+        self.last_seen = now
+        self.messages_sent = 0
+        self.bytes_sent = 0
+        self.subscriptions: Set[int] = set()
+        # Token bucket for messages sent by the client
+        self.tokens = 0.0
+        self.tokens_updated = now
+        # Allocated while there is something to send, idle connections hold none
+        self._queue: Optional[Deque[Tuple[Optional[Hashable], str]]] = None
+        self._on_error = on_error
+        # Writer task, only running while there is something to send
+        self._task: Optional[asyncio.Task] = None
+
+    def queued(self) -> int:
+        return len(self._queue) if self._queue else 0
+
+    def is_full(self) -> bool:
+        return self.queued() >= self.max_queue
+
+    def enqueue(self, text: str, key: Optional[Hashable] = None):
+        if self._queue is None:
+            self._queue = deque()
+        self._queue.append((key, text))
+        if self._task is None:
+            self._task = asyncio.create_task(self._write())
+
+    def drop_oldest(self):
+        self._queue.popleft()
+
+    def replace(self, text: str, key: Hashable) -> bool:
+        """
+        Swap the payload of a queued message with the same key in place.
+        """
+        for position, (queued_key, _) in enumerate(self._queue or ()):
+            if queued_key == key:
+                self._queue[position] = (key, text)
+                return True
+        return False
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._queue = None
+
+    async def _write(self):
+        try:
+            while self._queue:
+                _, text = self._queue.popleft()
+                await self.websocket.send_text(text)
+                self.messages_sent += 1
+                self.bytes_sent += len(text)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._on_error(self)
+        finally:
+            if self._task is asyncio.current_task():
+                self._task = None
+                self._queue = None
+
+class EventStreamConnection(ClientConnection):
+    """
+    An SSE stream. The response body iterates frames() and is the only
+    writer, so no task is created per message. on_error is called once the
+    response stops, whether the client went away or the stream was closed.
+    """
+
+    __slots__ = ("closed", "seqs", "_waiter")
+
+    event_stream = True
+
+    def __init__(
+        self,
+        request: Request,
+        max_queue: int,
+        on_error: Callable[[ClientConnection], None],
+        last_seqs: Dict[int, int],
+    ):
+        super().__init__(request, max_queue, on_error)
+        self.closed = False
+        # Last seq sent per poll, rendered into each event id
+        self.seqs: Optional[Dict[str, str]] = (
+            {str(poll_id): str(seq) for poll_id, seq in last_seqs.items()} if last_seqs else None
+        )
+        self._waiter: Optional[asyncio.Future] = None
+
+    def enqueue(self, text: str, key: Optional[Hashable] = None):
+        if self._queue is None:
+            self._queue = deque()
+        self._queue.append((key, text))
+        self._wake()
+
+    def close(self):
+        self.closed = True
+        self._queue = None
+        self._wake()
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def frames(self, retry_ms: int) -> AsyncIterator[str]:
+        try:
+            # Sends the headers right away and sets the browser's reconnect delay
+            yield f"retry: {retry_ms}\n\n"
+            while not self.closed:
+                if not self._queue:
+                    self._queue = None
+                    self._waiter = asyncio.get_running_loop().create_future()
+                    await self._waiter
+                    self._waiter = None
+                    continue
+                _, frame = self._queue.popleft()
+                if frame.startswith("id: "):
+                    # Widen the event's own id to every poll of the stream
+                    event_id, _, rest = frame[4:].partition("\n")
+                    poll_id, _, seq = event_id.partition(":")
+                    if self.seqs is None:
+                        self.seqs = {}
+                    self.seqs[poll_id] = seq
+                    frame = f"id: {','.join(f'{poll}:{seq}' for poll, seq in self.seqs.items())}\n{rest}"
+                self.messages_sent += 1
+                self.bytes_sent += len(frame)
+                # Writes are the only sign of life from a stream
+                self.last_seen = time.monotonic()
+                yield frame
+        finally:
+            self._on_error(self)
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-        self.poll_connections: Dict[int, List[WebSocket]] = {}
+    def __init__(
+        self,
+        send_queue_size: int = 64,
+        slow_consumer_policy: str = "drop_oldest",
+        client_rate: float = 5,
+        client_burst: int = 20,
+        max_subscriptions: int = 1000,
+        replay_size: int = 100,
+        replay_max_polls: int = 10000,
+        max_connections: int = 100000,
+        max_connections_per_poll: int = 10000,
+        heartbeat_interval: float = 30,
+        idle_timeout: float = 90,
+        max_stream_polls: int = 100,
+    ):
+        if slow_consumer_policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(
+                f"Unknown slow consumer policy '{slow_consumer_policy}'. "
+                f"Expected one of: {', '.join(SLOW_CONSUMER_POLICIES)}"
+            )
+        self.send_queue_size = send_queue_size
+        self.slow_consumer_policy = slow_consumer_policy
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.max_subscriptions = max_subscriptions
+        self.max_connections = max_connections
+        self.max_connections_per_poll = max_connections_per_poll
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self.max_stream_polls = max_stream_polls
+        # Registry of every open connection and the poll id -> connections index
+        self.clients: Dict[Transport, ClientConnection] = {}
+        self.poll_connections: Dict[int, Set[Transport]] = {}
+        # Polls whose local viewer count changed since presence last looked
+        self.presence_changed: Set[int] = set()
+        self._reaper: Optional[asyncio.Task] = None
+        self.replay_size = replay_size
+        self.replay_max_polls = replay_max_polls
+        # Recent (seq, serialized event) per poll, least recently updated poll first
+        self.replay: "OrderedDict[int, Deque[Tuple[int, str]]]" = OrderedDict()
+        self.snapshot_loader: Optional[SnapshotLoader] = None
+
+        # Metrics
+        self.messages_queued = 0
+        self.messages_dropped = 0
+        self.messages_coalesced = 0
+        self.slow_consumers_disconnected = 0
+        self.send_failures = 0
+        self.client_messages_rate_limited = 0
+        self.events_replayed = 0
+        self.snapshots_sent = 0
+        self.connections_rejected = 0
+        self.idle_connections_closed = 0
+        self.event_streams = 0
+        # Bytes sent by connections that have since closed
+        self.closed_bytes_sent = 0
+
+    async def start(self):
+        self._reaper = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self):
+        if self._reaper is None:
+            return
+        self._reaper.cancel()
+        try:
+            await self._reaper
+        except asyncio.CancelledError:
+            pass
+        self._reaper = None
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        poll_id: int = None,
+        last_seq: Optional[int] = None,
+        user_id: Optional[int] = None,
+    ) -> bool:
+        """
+        Accept and register a socket. Returns False, after refusing the
+        handshake, when a connection cap has been reached.
+        """
+        poll_full = poll_id and len(self.poll_connections.get(poll_id, ())) >= self.max_connections_per_poll
+        if len(self.clients) >= self.max_connections or poll_full:
+            self.connections_rejected += 1
+            await websocket.close(code=CAPACITY_CLOSE_CODE)
+            return False
 
-    async def connect(self, websocket: WebSocket, poll_id: int = None):
         await websocket.accept()
-        self.active_connections.append(websocket)
-        
+        client = ClientConnection(websocket, self.send_queue_size, self._on_send_error, user_id)
+        client.tokens = self.client_burst
+        self.clients[websocket] = client
+
         if poll_id:
-            if poll_id not in self.poll_connections:
-                self.poll_connections[poll_id] = []
-            self.poll_connections[poll_id].append(websocket)
+            last_seqs = {poll_id: last_seq} if last_seq is not None else {}
+            await self.resume(websocket, [poll_id], last_seqs)
+        return True
+
+    async def open_stream(
+        self, request: Request, poll_ids: List[int], last_seqs: Dict[int, int]
+    ) -> Optional[EventStreamConnection]:
+        """
+        Register an SSE stream for the given polls, queueing whatever it
+        missed since last_seqs. Returns None when a connection cap has been
+        reached.
+        """
+        poll_full = any(
+            len(self.poll_connections.get(poll_id, ())) >= self.max_connections_per_poll for poll_id in poll_ids
+        )
+        if len(self.clients) >= self.max_connections or poll_full:
+            self.connections_rejected += 1
+            return None
+
+        stream = EventStreamConnection(request, self.send_queue_size, self._on_stream_end, last_seqs)
+        self.clients[request] = stream
+        self.event_streams += 1
+        await self.resume(request, poll_ids, last_seqs)
+        return stream
 
     def disconnect(self, websocket: WebSocket, poll_id: int = None):
-        self.active_connections.remove(websocket)
-        
-        if poll_id and poll_id in self.poll_connections:
-            if websocket in self.poll_connections[poll_id]:
-                self.poll_connections[poll_id].remove(websocket)
+        # Safe to call more than once, the writer task may have removed it already
+        client = self.clients.pop(websocket, None)
+        if client is None:
+            return
+        client.close()
+        if client.event_stream:
+            self.event_streams -= 1
+        self.closed_bytes_sent += client.bytes_sent
+        self._drop_subscriptions(websocket, client.subscriptions)
+        client.subscriptions.clear()
+
+    def subscribe(self, websocket: WebSocket, poll_ids: Iterable[int]) -> List[int]:
+        """
+        Route events for the given polls to this connection. Returns the ids
+        added, which leaves out polls at their connection cap and stops
+        short at the subscription cap.
+        """
+        client = self.clients.get(websocket)
+        if client is None:
+            return []
+        added = []
+        for poll_id in poll_ids:
+            if poll_id in client.subscriptions:
+                continue
+            if len(client.subscriptions) >= self.max_subscriptions:
+                break
+            connections = self.poll_connections.setdefault(poll_id, set())
+            if len(connections) >= self.max_connections_per_poll:
+                continue
+            client.subscriptions.add(poll_id)
+            connections.add(websocket)
+            self.presence_changed.add(poll_id)
+            added.append(poll_id)
+        return added
+
+    async def resume(self, websocket: WebSocket, poll_ids: List[int], last_seqs: Dict[int, int]) -> List[int]:
+        """
+        Subscribe to polls, first sending what the client missed since the
+        seq it last saw for each of them.
+        """
+        added = []
+        for poll_id in poll_ids:
+            last_seq = last_seqs.get(poll_id)
+            events = self.replay.get(poll_id)
+            if last_seq is not None and (
+                not events or events[0][0] > last_seq + 1 or events[-1][0] < last_seq
+            ):
+                # The buffer cannot prove nothing was missed: it is gone, starts
+                # after the gap or is behind the client because seqs restarted.
+                # Start over from a snapshot.
+                snapshot_seq = events[-1][0] if events else None
+                snapshot = await self.snapshot_loader(poll_id) if self.snapshot_loader else None
+                if websocket not in self.clients:
+                    return added
+                if snapshot is not None:
+                    text = json.dumps({
+                        "type": "poll_snapshot",
+                        "poll_id": poll_id,
+                        "seq": snapshot_seq,
+                        "poll": snapshot,
+                    })
+                    self._deliver(websocket, text, None, _sse_frame(text, poll_id, snapshot_seq))
+                    self.snapshots_sent += 1
+                # Without a known seq, replay whatever arrived while loading
+                last_seq = snapshot_seq if snapshot_seq is not None else 0
+
+            if last_seq is not None:
+                # Re-read the buffer, events may have arrived while loading
+                stream = self.clients[websocket].event_stream
+                for seq, text in self.replay.get(poll_id, ()):
+                    if seq > last_seq:
+                        self._deliver(websocket, text, None, _sse_frame(text, poll_id, seq) if stream else None)
+                        self.events_replayed += 1
+            # No await between the replay and subscribing, so nothing is lost
+            added.extend(self.subscribe(websocket, [poll_id]))
+        return added
+
+    def _record(self, poll_id: int, seq: int, text: str, deleted: bool):
+        if deleted:
+            self.replay.pop(poll_id, None)
+            return
+        events = self.replay.get(poll_id)
+        if events is None:
+            events = self.replay[poll_id] = deque(maxlen=self.replay_size)
+            while len(self.replay) > self.replay_max_polls:
+                self.replay.popitem(last=False)
+        else:
+            self.replay.move_to_end(poll_id)
+        events.append((seq, text))
+
+    def unsubscribe(self, websocket: WebSocket, poll_ids: Iterable[int]) -> List[int]:
+        client = self.clients.get(websocket)
+        if client is None:
+            return []
+        removed = [poll_id for poll_id in poll_ids if poll_id in client.subscriptions]
+        client.subscriptions.difference_update(removed)
+        self._drop_subscriptions(websocket, removed)
+        return removed
+
+    def _drop_subscriptions(self, websocket: WebSocket, poll_ids: Iterable[int]):
+        for poll_id in poll_ids:
+            connections = self.poll_connections.get(poll_id)
+            if connections is None:
+                continue
+            connections.discard(websocket)
+            self.presence_changed.add(poll_id)
+            if not connections:
+                del self.poll_connections[poll_id]
+
+    def take_presence_changes(self) -> Dict[int, int]:
+        """
+        Local viewer counts of the polls whose membership changed since the
+        last call.
+        """
+        changed, self.presence_changed = self.presence_changed, set()
+        return {poll_id: len(self.poll_connections.get(poll_id, ())) for poll_id in changed}
+
+    def _on_send_error(self, client: ClientConnection):
+        self.send_failures += 1
+        self.disconnect(client.websocket)
+
+    def _on_stream_end(self, client: ClientConnection):
+        self.disconnect(client.websocket)
+
+    def _allow_client_message(self, client: ClientConnection) -> bool:
+        now = time.monotonic()
+        client.tokens = min(
+            self.client_burst, client.tokens + (now - client.tokens_updated) * self.client_rate
+        )
+        client.tokens_updated = now
+        if client.tokens < 1:
+            return False
+        client.tokens -= 1
+        return True
+
+    async def handle_client_message(self, websocket: WebSocket, data: str):
+        """
+        Apply one control message from a client. Anything else gets an error
+        reply; client messages are never forwarded to other sockets.
+        """
+        client = self.clients.get(websocket)
+        if client is None:
+            return
+        client.last_seen = time.monotonic()
+        if not self._allow_client_message(client):
+            self.client_messages_rate_limited += 1
+            self._send_json(websocket, {"type": "error", "detail": "Rate limit exceeded"})
+            return
+
+        try:
+            message = json.loads(data)
+        except ValueError:
+            message = None
+        if not isinstance(message, dict):
+            self._send_json(websocket, {"type": "error", "detail": "Expected a JSON object"})
+            return
+
+        message_type = message.get("type")
+        if message_type == "ping":
+            self._send_json(websocket, {"type": "pong"})
+            return
+        if message_type == "pong":
+            # Heartbeat reply, last_seen is already updated
+            return
+        if message_type in ("subscribe", "unsubscribe"):
+            poll_ids = message.get("poll_ids")
+            if (
+                not isinstance(poll_ids, list)
+                or not all(isinstance(poll_id, int) and not isinstance(poll_id, bool) for poll_id in poll_ids)
+            ):
+                self._send_json(websocket, {"type": "error", "detail": "poll_ids must be a list of integers"})
+                return
+            if message_type == "subscribe":
+                last_seqs = self._parse_last_seqs(message.get("last_seq"))
+                if last_seqs is None:
+                    self._send_json(websocket, {"type": "error", "detail": "last_seq must map poll ids to integers"})
+                    return
+                changed = await self.resume(websocket, poll_ids, last_seqs)
+            else:
+                changed = self.unsubscribe(websocket, poll_ids)
+            self._send_json(websocket, {"type": f"{message_type}d", "poll_ids": changed})
+            return
+        self._send_json(websocket, {"type": "error", "detail": f"Unknown message type: {message_type}"})
+
+    @staticmethod
+    def _parse_last_seqs(raw) -> Optional[Dict[int, int]]:
+        if raw is None:
+            return {}
+        if not isinstance(raw, dict):
+            return None
+        try:
+            return {int(poll_id): int(seq) for poll_id, seq in raw.items()}
+        except (TypeError, ValueError):
+            return None
+
+    async def _close(self, websocket: WebSocket, code: int, reason: str):
+        if not isinstance(websocket, WebSocket):
+            # Streams end once disconnect() has closed their connection
+            return
+        try:
+            await websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
+
+    def _deliver(
+        self, websocket: WebSocket, text: str, key: Optional[Hashable] = None, frame: Optional[str] = None
+    ):
+        client = self.clients.get(websocket)
+        if client is None:
+            return
+        if client.event_stream:
+            text = frame or _sse_frame(text)
+
+        if client.is_full():
+            if self.slow_consumer_policy == "disconnect":
+                self.slow_consumers_disconnected += 1
+                self.disconnect(websocket)
+                asyncio.create_task(self._close(websocket, SLOW_CONSUMER_CLOSE_CODE, "Slow consumer"))
+                return
+            if self.slow_consumer_policy == "coalesce" and key is not None and client.replace(text, key):
+                self.messages_coalesced += 1
+                return
+            client.drop_oldest()
+            self.messages_dropped += 1
+
+        client.enqueue(text, key)
+        self.messages_queued += 1
+
+    def _send_json(self, websocket: WebSocket, message: dict):
+        self._deliver(websocket, json.dumps(message))
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
-        await websocket.send_text(message)
+        self._deliver(websocket, message)
 
     async def broadcast_to_poll(self, message: dict, poll_id: int, payload: dict = None):
-        if poll_id in self.poll_connections:
-            for connection in self.poll_connections[poll_id]:
-                try:
-                    if payload:
-                        await connection.send_text(json.dumps({"message": message, "payload": payload}))
-                    else:
-                        await connection.send_text(json.dumps(message))
-                except:
-                    # Remove broken connections
-                    self.poll_connections[poll_id].remove(connection)
+        if poll_id not in self.poll_connections:
+            return
+        if payload:
+            text = json.dumps({"message": message, "payload": payload})
+        else:
+            text = json.dumps(message)
+        key = _coalesce_key(message)
+        # Iterate over a copy, failed sockets are removed during delivery
+        for connection in list(self.poll_connections[poll_id]):
+            self._deliver(connection, text, key)
 
     async def broadcast_all(self, message: dict):
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(json.dumps(message))
-            except:
-                # Remove broken connections
-                self.active_connections.remove(connection)
+        text = json.dumps(message)
+        key = _coalesce_key(message)
+        for connection in list(self.clients):
+            self._deliver(connection, text, key)
+
+    async def broadcast_event(self, message: dict, poll_id: int, everyone: bool = False):
+        """
+        Send a poll event to the poll's subscribers and, when everyone is True
+        (new polls), to every connection. The message is serialized once,
+        kept for replay and sent at most once per socket.
+        """
+        text = json.dumps(message)
+        if "seq" in message:
+            self._record(poll_id, message["seq"], text, message.get("type") == "poll_deleted")
+
+        frame = _sse_frame(text, poll_id, message.get("seq"))
+
+        targets = set(self.poll_connections.get(poll_id, ()))
+        if everyone:
+            targets.update(self.clients)
+        key = _coalesce_key(message)
+        for connection in targets:
+            self._deliver(connection, text, key, frame)
 
     async def broadcast_heartbeat(self):
         await self.broadcast_all({"type": "heartbeat"})
 
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                self._reap_idle()
+                await self.broadcast_heartbeat()
+            except Exception:
+                logger.exception("WebSocket heartbeat failed")
+
+    def _reap_idle(self):
+        cutoff = time.monotonic() - self.idle_timeout
+        idle = [websocket for websocket, client in self.clients.items() if client.last_seen < cutoff]
+        for websocket in idle:
+            self.idle_connections_closed += 1
+            self.disconnect(websocket)
+            asyncio.create_task(self._close(websocket, IDLE_CLOSE_CODE, "Idle timeout"))
+
     async def broadcast_heartbeat_to_poll(self, poll_id: int):
-        if poll_id in self.poll_connections:
-            for connection in self.poll_connections[poll_id]:
-                try:
-                    await connection.send_text(json.dumps({"type": "heartbeat"}))
-                except:
-                    # Remove broken connections
-                    self.poll_connections[poll_id].remove(connection)
-
-manager = ConnectionManager()
\ No newline at end of file
+        await self.broadcast_to_poll({"type": "heartbeat"}, poll_id)
+
+    def stats(self) -> dict:
+        return {
+            "connections": len(self.clients),
+            "event_streams": self.event_streams,
+            "connections_rejected": self.connections_rejected,
+            "idle_connections_closed": self.idle_connections_closed,
+            "bytes_sent": self.closed_bytes_sent + sum(client.bytes_sent for client in self.clients.values()),
+            "poll_channels": len(self.poll_connections),
+            "subscriptions": sum(len(connections) for connections in self.poll_connections.values()),
+            "client_messages_rate_limited": self.client_messages_rate_limited,
+            "replay_polls": len(self.replay),
+            "events_replayed": self.events_replayed,
+            "snapshots_sent": self.snapshots_sent,
+            "send_queue_size": self.send_queue_size,
+            "slow_consumer_policy": self.slow_consumer_policy,
+            "queued_now": sum(client.queued() for client in self.clients.values()),
+            "messages_queued": self.messages_queued,
+            "messages_dropped": self.messages_dropped,
+            "messages_coalesced": self.messages_coalesced,
+            "slow_consumers_disconnected": self.slow_consumers_disconnected,
+            "send_failures": self.send_failures,
+        }
+
+manager = ConnectionManager(
+    send_queue_size=int(os.getenv("WS_SEND_QUEUE_SIZE", "64")),
+    slow_consumer_policy=os.getenv("WS_SLOW_CONSUMER_POLICY", "drop_oldest").lower(),
+    client_rate=float(os.getenv("WS_CLIENT_RATE", "5")),
+    client_burst=int(os.getenv("WS_CLIENT_BURST", "20")),
+    max_subscriptions=int(os.getenv("WS_MAX_SUBSCRIPTIONS", "1000")),
+    replay_size=int(os.getenv("WS_REPLAY_BUFFER", "100")),
+    replay_max_polls=int(os.getenv("WS_REPLAY_MAX_POLLS", "10000")),
+    max_connections=int(os.getenv("WS_MAX_CONNECTIONS", "100000")),
+    max_connections_per_poll=int(os.getenv("WS_MAX_CONNECTIONS_PER_POLL", "10000")),
+    heartbeat_interval=float(os.getenv("WS_HEARTBEAT_SECONDS", "30")),
+    idle_timeout=float(os.getenv("WS_IDLE_TIMEOUT_SECONDS", "90")),
+    max_stream_polls=int(os.getenv("SSE_MAX_POLLS", "100")),
+)
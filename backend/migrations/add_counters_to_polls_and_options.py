@@ -0,0 +1,71 @@
+"""
+Migration script to add denormalized vote/like counters.
+This script adds 'vote_count' to options and 'total_votes'/'total_likes' to polls,
+then fills them from the votes and likes tables.
+
+Run this script once to migrate existing database:
+    python migrations/add_counters_to_polls_and_options.py
+"""
+
+import sqlite3
+from pathlib import Path
+
+def migrate():
+    # Get database path
+    db_path = Path(__file__).parent.parent / "polls.db"
+    
+    if not db_path.exists():
+        print(f"Database not found at {db_path}")
+        print("No migration needed - database will be created with counter columns.")
+        return
+    
+    # Connect to database
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    
+    # Check which counter columns already exist
+    cursor.execute("PRAGMA table_info(options)")
+    option_columns = [column[1] for column in cursor.fetchall()]
+    cursor.execute("PRAGMA table_info(polls)")
+    poll_columns = [column[1] for column in cursor.fetchall()]
+    
+    if 'vote_count' in option_columns and 'total_votes' in poll_columns and 'total_likes' in poll_columns:
+        print("Counter columns already exist. Migration not needed.")
+        conn.close()
+        return
+    
+    try:
+        print("Adding counter columns...")
+        if 'vote_count' not in option_columns:
+            cursor.execute("ALTER TABLE options ADD COLUMN vote_count INTEGER DEFAULT 0 NOT NULL")
+        if 'total_votes' not in poll_columns:
+            cursor.execute("ALTER TABLE polls ADD COLUMN total_votes INTEGER DEFAULT 0 NOT NULL")
+        if 'total_likes' not in poll_columns:
+            cursor.execute("ALTER TABLE polls ADD COLUMN total_likes INTEGER DEFAULT 0 NOT NULL")
+        
+        # Backfill counters from existing rows
+        print("Backfilling counters...")
+        cursor.execute("""
+            UPDATE options SET vote_count = (
+                SELECT COUNT(*) FROM votes WHERE votes.option_id = options.id
+            )
+        """)
+        cursor.execute("""
+            UPDATE polls SET
+                total_votes = (SELECT COUNT(*) FROM votes WHERE votes.poll_id = polls.id),
+                total_likes = (SELECT COUNT(*) FROM likes WHERE likes.poll_id = polls.id)
+        """)
+        
+        conn.commit()
+        print("Migration completed successfully!")
+        print("Counters can be rebuilt at any time with: python -m app.utils.counters")
+        
+    except sqlite3.Error as e:
+        print(f"Migration failed: {e}")
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,47 @@
+"""
+Migration script to add composite indexes used by the keyset-paginated poll feed.
+
+Run this script once to migrate existing database:
+    python migrations/add_poll_feed_indexes.py
+"""
+
+import sqlite3
+from pathlib import Path
+
+INDEXES = {
+    "idx_polls_created_at_id": "polls(created_at, id)",
+    "idx_polls_active_created_at_id": "polls(is_active, created_at, id)",
+    "idx_polls_creator_created_at_id": "polls(creator_id, created_at, id)",
+    "idx_polls_active_closes_at": "polls(is_active, closes_at)",
+}
+
+def migrate():
+    # Get database path
+    db_path = Path(__file__).parent.parent / "polls.db"
+    
+    if not db_path.exists():
+        print(f"Database not found at {db_path}")
+        print("No migration needed - database will be created with feed indexes.")
+        return
+    
+    # Connect to database
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    
+    try:
+        for name, definition in INDEXES.items():
+            print(f"Creating index {name}...")
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+        
+        conn.commit()
+        print("Migration completed successfully!")
+        
+    except sqlite3.Error as e:
+        print(f"Migration failed: {e}")
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,50 @@
+"""
+Migration script to add previous_option_id field to votes table.
+The vote upsert records the option a vote pointed to before it was changed
+so it can move the option counters without reading the vote first.
+
+Run this script once to migrate existing database:
+    python migrations/add_previous_option_to_votes.py
+"""
+
+import sqlite3
+from pathlib import Path
+
+def migrate():
+    # Get database path
+    db_path = Path(__file__).parent.parent / "polls.db"
+    
+    if not db_path.exists():
+        print(f"Database not found at {db_path}")
+        print("No migration needed - database will be created with previous_option_id field.")
+        return
+    
+    # Connect to database
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    
+    # Check if previous_option_id column already exists
+    cursor.execute("PRAGMA table_info(votes)")
+    columns = [column[1] for column in cursor.fetchall()]
+    
+    if 'previous_option_id' in columns:
+        print("previous_option_id column already exists. Migration not needed.")
+        conn.close()
+        return
+    
+    try:
+        print("Adding previous_option_id column to votes table...")
+        cursor.execute("ALTER TABLE votes ADD COLUMN previous_option_id INTEGER")
+        
+        conn.commit()
+        print("Migration completed successfully!")
+        
+    except sqlite3.Error as e:
+        print(f"Migration failed: {e}")
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate()
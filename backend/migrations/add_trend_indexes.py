@@ -0,0 +1,47 @@
+"""
+Migration script to add the created_at indexes used by the vote trend queries.
+
+Run this script once to migrate existing database:
+    python migrations/add_trend_indexes.py
+"""
+
+import sqlite3
+from pathlib import Path
+
+INDEXES = {
+    "idx_votes_created_at": "votes(created_at)",
+    "idx_votes_poll_created_at": "votes(poll_id, created_at)",
+    "idx_likes_created_at": "likes(created_at)",
+    "idx_likes_poll_created_at": "likes(poll_id, created_at)",
+}
+
+def migrate():
+    # Get database path
+    db_path = Path(__file__).parent.parent / "polls.db"
+    
+    if not db_path.exists():
+        print(f"Database not found at {db_path}")
+        print("No migration needed - database will be created with trend indexes.")
+        return
+    
+    # Connect to database
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    
+    try:
+        for name, definition in INDEXES.items():
+            print(f"Creating index {name}...")
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+        
+        conn.commit()
+        print("Migration completed successfully!")
+        
+    except sqlite3.Error as e:
+        print(f"Migration failed: {e}")
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate()
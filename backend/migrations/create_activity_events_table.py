@@ -0,0 +1,93 @@
+"""
+Migration script to create the activity_events log behind the activity feed.
+This script creates the table, fills it from the votes, likes and polls
+tables, and adds the 'activities' counter to analytics_totals.
+
+Run this script once to migrate existing database:
+    python migrations/create_activity_events_table.py
+"""
+
+import sqlite3
+from pathlib import Path
+
+def migrate():
+    # Get database path
+    db_path = Path(__file__).parent.parent / "polls.db"
+    
+    if not db_path.exists():
+        print(f"Database not found at {db_path}")
+        print("No migration needed - database will be created with the activity log.")
+        return
+    
+    # Connect to database
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='activity_events'")
+    table_exists = cursor.fetchone() is not None
+    cursor.execute("PRAGMA table_info(analytics_totals)")
+    totals_columns = [column[1] for column in cursor.fetchall()]
+    
+    if table_exists and (not totals_columns or 'activities' in totals_columns):
+        print("activity_events table already exists. Migration not needed.")
+        conn.close()
+        return
+    
+    try:
+        if not table_exists:
+            print("Creating activity_events table...")
+            cursor.execute("""
+                CREATE TABLE activity_events (
+                    id INTEGER NOT NULL PRIMARY KEY,
+                    type VARCHAR(20) NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    username VARCHAR(50),
+                    poll_id INTEGER,
+                    poll_title VARCHAR(200),
+                    created_at DATETIME NOT NULL
+                )
+            """)
+            cursor.execute("CREATE INDEX ix_activity_events_id ON activity_events (id)")
+            cursor.execute(
+                "CREATE INDEX idx_activity_events_created_at_id ON activity_events (created_at, id)"
+            )
+        
+            # Backfill one event per existing vote, like and poll, oldest first
+            print("Backfilling activity events...")
+            cursor.execute("""
+                INSERT INTO activity_events (type, user_id, username, poll_id, poll_title, created_at)
+                SELECT * FROM (
+                    SELECT 'vote', votes.user_id, users.username, votes.poll_id, polls.title, votes.created_at
+                    FROM votes JOIN polls ON polls.id = votes.poll_id
+                    LEFT JOIN users ON users.id = votes.user_id
+                    UNION ALL
+                    SELECT 'like', likes.user_id, users.username, likes.poll_id, polls.title, likes.created_at
+                    FROM likes JOIN polls ON polls.id = likes.poll_id
+                    LEFT JOIN users ON users.id = likes.user_id
+                    UNION ALL
+                    SELECT 'created', polls.creator_id, users.username, polls.id, polls.title, polls.created_at
+                    FROM polls LEFT JOIN users ON users.id = polls.creator_id
+                ) ORDER BY 6
+            """)
+        
+        # Keep the maintained counter in step when the totals row already exists
+        if totals_columns:
+            if 'activities' not in totals_columns:
+                cursor.execute(
+                    "ALTER TABLE analytics_totals ADD COLUMN activities INTEGER DEFAULT 0 NOT NULL"
+                )
+            cursor.execute("UPDATE analytics_totals SET activities = (SELECT COUNT(*) FROM activity_events)")
+        
+        conn.commit()
+        print("Migration completed successfully!")
+        print("The log can be rebuilt at any time with: python -m app.utils.activity_log")
+        
+    except sqlite3.Error as e:
+        print(f"Migration failed: {e}")
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate()
@@ -47,6 +47,304 @@ def test_schemas():
         print(f"❌ Schema validation error: {e}")
         return False
 
+def test_backplane_cache_invalidation():
+    """Test that a write announced on one worker evicts the other worker's cached snapshot"""
+    import asyncio
+    import os
+    import tempfile
+    from app.services.backplane import SQLiteBackplane
+    from app.services.poll_cache import LRUCacheBackend, PollSnapshotCache, poll_cache
+    from app.services.poll_events import PollEventBroadcaster, poll_events
+
+    async def run(path):
+        # Two workers sharing one SQLite event log, each with its own cache
+        workers = [PollEventBroadcaster(SQLiteBackplane(path, poll_interval_ms=10), window_ms=0) for _ in range(2)]
+        caches = [PollSnapshotCache(LRUCacheBackend()) for _ in workers]
+        for worker, cache in zip(workers, caches):
+            worker.add_listener(cache.observe)
+            await worker.start()
+            cache.set(1, cache.version(1), "snapshot of poll 1")
+            cache.set(2, cache.version(2), "snapshot of poll 2")
+        try:
+            await workers[0].publish({"type": "poll_updated", "poll_id": 1, "delta": {"total_votes": 1}})
+            await workers[0].publish({"type": "poll_deleted", "poll_id": 2})
+            for _ in range(100):
+                if all(cache.get(1) is None and cache.get(2) is None for cache in caches):
+                    break
+                await asyncio.sleep(0.01)
+            return [(cache.get(1), cache.get(2)) for cache in caches]
+        finally:
+            for worker in workers:
+                await worker.stop()
+
+    try:
+        assert poll_cache.observe in poll_events._listeners
+        with tempfile.TemporaryDirectory() as directory:
+            results = asyncio.run(run(os.path.join(directory, "events.db")))
+        assert results == [(None, None), (None, None)], results
+        print("✅ Backplane events invalidate cached snapshots on every worker")
+        return True
+    except Exception as e:
+        print(f"❌ Backplane cache invalidation error: {e!r}")
+        return False
+
+def test_expiry_retry():
+    """Test that polls whose close failed are retried"""
+    import asyncio
+    from datetime import datetime, timedelta, timezone
+    from app.services.expiry_scheduler import PollExpiryScheduler
+
+    async def run():
+        scheduler = PollExpiryScheduler(retry_seconds=0.05)
+        attempts = []
+
+        def close_polls(poll_ids, now):
+            attempts.append(list(poll_ids))
+            if len(attempts) == 1:
+                raise RuntimeError("database is locked")
+            return []
+
+        scheduler._close_polls = close_polls
+        await scheduler.start()
+        try:
+            scheduler.schedule(1, datetime.now(timezone.utc) - timedelta(seconds=1))
+            for _ in range(100):
+                if len(attempts) >= 2:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await scheduler.stop()
+        return attempts, scheduler.pending()
+
+    try:
+        attempts, pending = asyncio.run(run())
+        assert attempts[:2] == [[1], [1]], attempts
+        assert pending == 0, pending
+        print("✅ Failed poll closes are retried")
+        return True
+    except Exception as e:
+        print(f"❌ Expiry retry error: {e!r}")
+        return False
+
+def _register_users(client, count):
+    import uuid
+    suffix = uuid.uuid4().hex[:8]
+    return [
+        client.post("/auth/register", json={
+            "username": f"user{i}_{suffix}",
+            "email": f"user{i}_{suffix}@example.com",
+            "password": "password123",
+        }).json()["id"]
+        for i in range(count)
+    ]
+
+def _create_poll(client, creator_id, options=("Option 1", "Option 2")):
+    return client.post(
+        "/polls/",
+        params={"creator_id": creator_id},
+        json={"title": "Test Poll", "description": "A test poll", "options": list(options)},
+    ).json()
+
+def test_vote_batch():
+    """Test the status tallies of batch vote ingestion"""
+    try:
+        from fastapi.testclient import TestClient
+        from app.main import app
+
+        with TestClient(app) as client:
+            first, second, third = _register_users(client, 3)
+            poll = _create_poll(client, first)
+            option_a, option_b = [option["id"] for option in poll["options"]]
+            client.post("/votes/", params={"user_id": first}, json={"poll_id": poll["id"], "option_id": option_a})
+
+            response = client.post("/votes/batch", json={"votes": [
+                # Older than the vote already stored
+                {"user_id": first, "poll_id": poll["id"], "option_id": option_b, "client_ts": "2020-01-01T10:00:00Z"},
+                # The later record of the same user wins
+                {"user_id": second, "poll_id": poll["id"], "option_id": option_a, "client_ts": "2020-01-01T10:00:00Z"},
+                {"user_id": second, "poll_id": poll["id"], "option_id": option_b, "client_ts": "2020-01-01T11:00:00Z"},
+                {"user_id": third, "poll_id": poll["id"], "option_id": option_a},
+                {"user_id": third, "poll_id": 999999, "option_id": option_a},
+                {"user_id": third, "poll_id": poll["id"], "option_id": 999999},
+            ]}).json()
+            statuses = [result["status"] for result in response["results"]]
+            assert statuses == ["superseded", "superseded", "created", "created", "rejected", "rejected"], statuses
+            assert (response["created"], response["updated"], response["unchanged"],
+                    response["superseded"], response["rejected"]) == (2, 0, 0, 2, 2), response
+
+            response = client.post("/votes/batch", json={"votes": [
+                {"user_id": second, "poll_id": poll["id"], "option_id": option_a},
+                {"user_id": third, "poll_id": poll["id"], "option_id": option_a},
+            ]}).json()
+            assert (response["updated"], response["unchanged"]) == (1, 1), response
+
+            counts = {option["id"]: option["vote_count"] for option in client.get(f"/polls/{poll['id']}").json()["options"]}
+            assert counts == {option_a: 3, option_b: 0}, counts
+        print("✅ Batch votes: created, updated, unchanged, superseded and rejected")
+        return True
+    except Exception as e:
+        print(f"❌ Batch vote error: {e!r}")
+        return False
+
+def test_resume_after_seq_reset():
+    """Test that a resume the replay buffer cannot cover starts from a snapshot"""
+    try:
+        import json
+        from fastapi.testclient import TestClient
+        from app.main import app
+        from app.websocket import manager
+
+        def resume(client, poll_id, last_seq):
+            with client.websocket_connect("/ws") as websocket:
+                websocket.send_text(json.dumps({
+                    "type": "subscribe", "poll_ids": [poll_id], "last_seq": {str(poll_id): last_seq},
+                }))
+                messages = []
+                while not messages or messages[-1]["type"] != "subscribed":
+                    messages.append(json.loads(websocket.receive_text()))
+                return [message for message in messages if message["type"] in ("poll_snapshot", "poll_updated")]
+
+        with TestClient(app) as client:
+            (creator,) = _register_users(client, 1)
+            poll = _create_poll(client, creator)
+            event = json.dumps({"type": "poll_updated", "poll_id": poll["id"], "seq": 1})
+
+            # After a restart the buffer is behind the seq the client saw
+            manager.replay.pop(poll["id"], None)
+            manager._record(poll["id"], 1, event, False)
+            received = resume(client, poll["id"], 50)
+            assert [(message["type"], message["seq"]) for message in received] == [("poll_snapshot", 1)], received
+            assert received[0]["poll"]["id"] == poll["id"], received
+
+            # Nothing buffered at all
+            manager.replay.pop(poll["id"], None)
+            received = resume(client, poll["id"], 50)
+            assert [(message["type"], message["seq"]) for message in received] == [("poll_snapshot", None)], received
+
+            # A buffer that covers the gap is replayed as is
+            manager._record(poll["id"], 1, event, False)
+            assert resume(client, poll["id"], 0) == [json.loads(event)]
+            manager.replay.pop(poll["id"], None)
+        print("✅ Resume after a seq reset starts from a snapshot")
+        return True
+    except Exception as e:
+        print(f"❌ Resume snapshot error: {e!r}")
+        return False
+
+def test_leaderboard_removals():
+    """Test that removed votes take out what they added to leaderboard scores"""
+    try:
+        import asyncio
+        from datetime import datetime, timedelta
+        from fastapi.testclient import TestClient
+        from app.db.database import SessionLocal
+        from app.main import app
+        from app.models.vote import Vote
+        from app.services.leaderboard import Leaderboard, WINDOWS
+        from app.utils.rollups import record_activity
+
+        def scores(board):
+            asyncio.run(board.ready())
+            return {window: {item["poll_id"]: item["score"] for item in board.top(window)} for window in WINDOWS}
+
+        def assert_matches_rebuild(board, poll_id):
+            expected, actual = scores(Leaderboard(size=1000, refresh_ms=0)), scores(board)
+            for window in WINDOWS:
+                assert abs(actual[window][poll_id] - expected[window][poll_id]) < 1e-6, (window, actual, expected)
+
+        with TestClient(app) as client:
+            users = _register_users(client, 3)
+            poll = _create_poll(client, users[0])
+            option_id = poll["options"][0]["id"]
+            votes = [
+                client.post("/votes/", params={"user_id": user}, json={"poll_id": poll["id"], "option_id": option_id}).json()
+                for user in users
+            ]
+
+            # Two of the votes were cast hours ago
+            db = SessionLocal()
+            try:
+                cast_at = datetime.utcnow() - timedelta(hours=5)
+                for vote in votes[:2]:
+                    db.query(Vote).filter(Vote.id == vote["id"]).update({Vote.created_at: cast_at})
+                    record_activity(db, poll["id"], datetime.fromisoformat(vote["created_at"]), votes=-1)
+                    record_activity(db, poll["id"], cast_at, votes=1)
+                db.commit()
+            finally:
+                db.close()
+
+            board = Leaderboard(size=1000, refresh_ms=0)
+            scores(board)
+
+            # A removal seen as an event
+            client.delete(f"/votes/{votes[0]['id']}", params={"user_id": users[0]})
+            board.observe({"type": "poll_updated", "poll_id": poll["id"], "delta": {"total_votes": 2, "total_likes": 0}})
+            assert_matches_rebuild(board, poll["id"])
+
+            # A removal found by the refresh
+            client.delete(f"/votes/{votes[1]['id']}", params={"user_id": users[1]})
+            board.observe({"type": "poll_updated", "poll_id": poll["id"]})
+            assert_matches_rebuild(board, poll["id"])
+        print("✅ Leaderboard removals take out what they added")
+        return True
+    except Exception as e:
+        print(f"❌ Leaderboard removal error: {e!r}")
+        return False
+
+def test_write_events_reach_other_workers():
+    """Test that vote deletions and option changes are announced to every worker"""
+    import asyncio
+    import os
+    import tempfile
+    from fastapi.testclient import TestClient
+    from app.main import app
+    import app.routes.options as options_routes
+    import app.routes.votes as votes_routes
+    from app.services.backplane import SQLiteBackplane
+    from app.services.poll_events import PollEventBroadcaster
+
+    async def run(path):
+        # The routes publish on one worker; the test listens on another
+        workers = [PollEventBroadcaster(SQLiteBackplane(path, poll_interval_ms=10), window_ms=0) for _ in range(2)]
+        received = []
+        workers[1].add_listener(received.append)
+        for worker in workers:
+            await worker.start()
+        votes_routes.poll_events = options_routes.poll_events = workers[0]
+        try:
+            await asyncio.to_thread(client.delete, f"/votes/{vote['id']}", params={"user_id": voter})
+            await asyncio.to_thread(
+                client.post, "/options/", params={"poll_id": poll["id"], "user_id": creator}, json={"text": "Option 3"}
+            )
+            for _ in range(100):
+                if len(received) >= 2:
+                    break
+                await asyncio.sleep(0.01)
+            return received
+        finally:
+            for worker in workers:
+                await worker.stop()
+
+    original = votes_routes.poll_events, options_routes.poll_events
+    try:
+        client = TestClient(app)
+        creator, voter = _register_users(client, 2)
+        poll = _create_poll(client, creator)
+        option_id = poll["options"][0]["id"]
+        vote = client.post("/votes/", params={"user_id": voter}, json={"poll_id": poll["id"], "option_id": option_id}).json()
+        with tempfile.TemporaryDirectory() as directory:
+            received = asyncio.run(run(os.path.join(directory, "events.db")))
+        assert [message["type"] for message in received] == ["poll_updated", "poll_updated"], received
+        assert received[0]["delta"]["total_votes"] == 0, received[0]
+        assert received[0]["delta"]["options"] == [{"id": option_id, "vote_count": 0}], received[0]
+        print("✅ Vote deletions and option changes reach other workers")
+        return True
+    except Exception as e:
+        print(f"❌ Write event error: {e!r}")
+        return False
+    finally:
+        votes_routes.poll_events, options_routes.poll_events = original
+
 if __name__ == "__main__":
     print("🚀 Testing QuickPoll Application...")
     print("-" * 40)
@@ -54,6 +352,12 @@ if __name__ == "__main__":
     success = True
     success &= test_imports()
     success &= test_schemas()
+    success &= test_backplane_cache_invalidation()
+    success &= test_expiry_retry()
+    success &= test_vote_batch()
+    success &= test_write_events_reach_other_workers()
+    success &= test_resume_after_seq_reset()
+    success &= test_leaderboard_removals()
     
     print("-" * 40)
     if success:
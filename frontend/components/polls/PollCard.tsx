@@ -281,6 +281,12 @@ export function PollCard({
           <span>{totalVotes.toLocaleString()} votes</span>
           <span className="text-zinc-300 dark:text-zinc-700">|</span>
           <span>{createdAt ? formatRelativeTime(createdAt) : "-"}</span>
+          {poll.viewers ? (
+            <>
+              <span className="text-zinc-300 dark:text-zinc-700">|</span>
+              <span className="tabular-nums">{poll.viewers.toLocaleString()} viewing</span>
+            </>
+          ) : null}
           {poll.creator_username && (
             <>
               <span className="text-zinc-300 dark:text-zinc-700">|</span>
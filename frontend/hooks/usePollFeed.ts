@@ -1,6 +1,6 @@
 "use client";
 
-import { useCallback, useEffect, useMemo, useState } from "react";
+import { useCallback, useEffect, useMemo, useRef, useState } from "react";
 import {
   createPoll,
   fetchPoll,
@@ -16,9 +16,20 @@ interface UsePollFeedOptions {
   user: AuthUser | null;
 }
 
+type PollDelta = {
+  options?: { id: number; vote_count: number }[];
+  total_votes?: number;
+  total_likes?: number;
+  is_active?: boolean;
+};
+
 type PollSocketMessage = {
   type?: string;
   poll_id?: number;
+  seq?: number;
+  delta?: PollDelta | null;
+  poll?: Poll;
+  viewers?: number;
   payload?: Record<string, unknown> | null;
   [key: string]: unknown;
 };
@@ -78,15 +89,36 @@ function extractPollId(message: PollSocketMessage | null): number | null {
   return null;
 }
 
+function applyDelta(poll: Poll, delta: PollDelta): Poll {
+  const counts = new Map((delta.options ?? []).map((option) => [option.id, option.vote_count]));
+  return {
+    ...poll,
+    options: poll.options.map((option) => {
+      const voteCount = counts.get(option.id);
+      return voteCount === undefined ? option : { ...option, vote_count: voteCount };
+    }),
+    total_votes: delta.total_votes ?? poll.total_votes,
+    total_likes: delta.total_likes ?? poll.total_likes,
+    is_active: delta.is_active ?? poll.is_active,
+  };
+}
+
 export function usePollFeed({ user }: UsePollFeedOptions): UsePollFeedResult {
   const [polls, setPolls] = useState<Poll[]>([]);
   const [loading, setLoading] = useState<boolean>(true);
   const [error, setError] = useState<string | null>(null);
   const [creating, setCreating] = useState<boolean>(false);
   const [busyPollIds, setBusyPollIds] = useState<Set<number>>(new Set());
+  const pollsRef = useRef<Poll[]>([]);
+  // Last event sequence number seen per poll
+  const lastSeqRef = useRef<Map<number, number>>(new Map());
 
   const userId = user?.userId;
 
+  useEffect(() => {
+    pollsRef.current = polls;
+  }, [polls]);
+
   const pollById = useMemo(() => {
     const map = new Map<number, Poll>();
     polls.forEach((poll) => {
@@ -154,17 +186,51 @@ export function usePollFeed({ user }: UsePollFeedOptions): UsePollFeedResult {
         return;
       }
 
-      if (message?.type === "poll_closed" && pollId !== null) {
-        try {
-          const updated = await fetchPoll(pollId, userId);
-          updatePollInState(updated);
-        } catch (err) {
-          console.error("Failed to load closed poll", err);
+      if (pollId === null) return;
+
+      // Throttled viewer count, not part of the seq numbered event stream
+      if (message?.type === "presence") {
+        const viewers = message.viewers;
+        if (typeof viewers === "number") {
+          setPolls((current) =>
+            current.map((poll) => (poll.id === pollId ? { ...poll, viewers } : poll)),
+          );
         }
         return;
       }
 
-      if (pollId === null) return;
+      // Sent on resubscribe when we missed more events than the server keeps
+      if (message?.type === "poll_snapshot" && message.poll) {
+        if (typeof message.seq === "number") {
+          lastSeqRef.current.set(pollId, message.seq);
+        } else {
+          // The server has no seq for this poll yet; the next event starts one
+          lastSeqRef.current.delete(pollId);
+        }
+        const snapshot = message.poll;
+        const existing = pollsRef.current.find((poll) => poll.id === pollId);
+        updatePollInState(
+          existing
+            ? { ...snapshot, user_voted: existing.user_voted, user_liked: existing.user_liked }
+            : snapshot,
+        );
+        return;
+      }
+
+      // Apply the delta locally unless an event was missed or the poll is not loaded
+      const seq = typeof message?.seq === "number" ? message.seq : null;
+      const lastSeq = lastSeqRef.current.get(pollId);
+      if (seq !== null) {
+        lastSeqRef.current.set(pollId, seq);
+      }
+      const inSequence = seq !== null && (lastSeq === undefined || seq === lastSeq + 1);
+      const delta = message?.delta;
+      if (inSequence && delta && pollsRef.current.some((poll) => poll.id === pollId)) {
+        setPolls((current) =>
+          current.map((poll) => (poll.id === pollId ? applyDelta(poll, delta) : poll)),
+        );
+        return;
+      }
 
       try {
         const updated = await fetchPoll(pollId, userId);
@@ -176,12 +242,37 @@ export function usePollFeed({ user }: UsePollFeedOptions): UsePollFeedResult {
     [updatePollInState, userId],
   );
 
-  const { sendMessage } = useWebSocket({
-    path: "/ws",
+  const { readyState, sendMessage } = useWebSocket({
+    path: userId ? `/ws?user_id=${userId}` : "/ws",
     onMessage: handleSocketMessage,
     shouldReconnect: true,
   });
 
+  // Only receive events for the polls on screen; subscriptions reset on reconnect
+  const subscribedRef = useRef<Set<number>>(new Set());
+  useEffect(() => {
+    if (readyState !== WebSocket.OPEN) {
+      subscribedRef.current = new Set();
+      return;
+    }
+    const wanted = new Set(polls.map((poll) => poll.id));
+    const added = [...wanted].filter((id) => !subscribedRef.current.has(id));
+    const removed = [...subscribedRef.current].filter((id) => !wanted.has(id));
+    if (added.length > 0) {
+      // After a reconnect the server replays only the events we missed
+      const lastSeq: Record<number, number> = {};
+      added.forEach((id) => {
+        const seq = lastSeqRef.current.get(id);
+        if (seq !== undefined) lastSeq[id] = seq;
+      });
+      sendMessage({ type: "subscribe", poll_ids: added, last_seq: lastSeq });
+    }
+    if (removed.length > 0) {
+      sendMessage({ type: "unsubscribe", poll_ids: removed });
+    }
+    subscribedRef.current = wanted;
+  }, [polls, readyState, sendMessage]);
+
   const handleCreatePoll = useCallback(
     async (payload: PollCreatePayload) => {
       if (!userId) throw new Error("You must be logged in to create a poll");
@@ -189,7 +280,6 @@ export function usePollFeed({ user }: UsePollFeedOptions): UsePollFeedResult {
       try {
         const newPoll = await createPoll(payload, userId);
         updatePollInState(newPoll);
-        sendMessage({ type: "poll_updated", poll_id: newPoll.id });
       } catch (err) {
         console.error(err);
         setError("Unable to create poll. Please try again.");
@@ -198,7 +288,7 @@ export function usePollFeed({ user }: UsePollFeedOptions): UsePollFeedResult {
         setCreating(false);
       }
     },
-    [sendMessage, updatePollInState, userId],
+    [updatePollInState, userId],
   );
 
   const handleVote = useCallback(
@@ -214,7 +304,6 @@ export function usePollFeed({ user }: UsePollFeedOptions): UsePollFeedResult {
         await castVote(pollId, optionId, userId);
         const updatedPoll = await fetchPoll(pollId, userId);
         updatePollInState(updatedPoll);
-        sendMessage({ type: "poll_updated", poll_id: pollId });
       } catch (err) {
         console.error(err);
         setError("Unable to submit vote. Please try again.");
@@ -223,7 +312,7 @@ export function usePollFeed({ user }: UsePollFeedOptions): UsePollFeedResult {
         unmarkBusy(pollId);
       }
     },
-    [markBusy, pollById, sendMessage, unmarkBusy, updatePollInState, userId],
+    [markBusy, pollById, unmarkBusy, updatePollInState, userId],
   );
 
   const handleToggleLike = useCallback(
@@ -247,7 +336,6 @@ export function usePollFeed({ user }: UsePollFeedOptions): UsePollFeedResult {
         await toggleLike(pollId, userId);
         const updatedPoll = await fetchPoll(pollId, userId);
         updatePollInState(updatedPoll);
-        sendMessage({ type: "poll_updated", poll_id: pollId });
       } catch (err) {
         console.error(err);
         if (previousSnapshot) {
@@ -259,7 +347,7 @@ export function usePollFeed({ user }: UsePollFeedOptions): UsePollFeedResult {
         unmarkBusy(pollId);
       }
     },
-    [markBusy, polls, sendMessage, unmarkBusy, updatePollInState, userId],
+    [markBusy, polls, unmarkBusy, updatePollInState, userId],
   );
 
   const handleClosePoll = useCallback(
@@ -10,6 +10,16 @@ interface UseWebSocketOptions {
   reconnectIntervalMs?: number;
 }
 
+function isHeartbeat(data: unknown): boolean {
+  if (typeof data !== "string") return false;
+  try {
+    const parsed = JSON.parse(data);
+    return parsed?.type === "heartbeat";
+  } catch {
+    return false;
+  }
+}
+
 export function useWebSocket({
   path = "/ws",
   onMessage,
@@ -33,6 +43,11 @@ export function useWebSocket({
       };
 
       socket.onmessage = (event) => {
+        // Answer server heartbeats so the connection is not reaped as idle
+        if (isHeartbeat(event.data)) {
+          socket.send(JSON.stringify({ type: "pong" }));
+          return;
+        }
         onMessage?.(event);
       };
 
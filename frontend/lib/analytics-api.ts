@@ -4,8 +4,11 @@ export interface VoteTrendItem {
   date: string;
   votes: number;
   polls: number;
+  likes: number;
 }
 
+export type TrendGranularity = "minute" | "hour" | "day";
+
 export interface ActivityItem {
   id: string;
   type: "vote" | "like" | "share" | "created" | "follow";
@@ -35,19 +38,25 @@ export interface PollEngagementItem {
   likes: number;
   engagement_rate: number;
   created_at: string;
+  score: number;
 }
 
+export type LeaderboardWindow = "hour" | "day" | "week";
+
 export interface TopPollsResponse {
   polls: PollEngagementItem[];
+  window: LeaderboardWindow;
 }
 
 export interface VoteTrendResponse {
   trends: VoteTrendItem[];
+  granularity: TrendGranularity;
 }
 
 export interface ActivityFeedResponse {
   activities: ActivityItem[];
   total: number;
+  next_cursor: string | null;
 }
 
 export interface AnalyticsDashboardResponse {
@@ -60,18 +69,33 @@ export async function fetchAnalyticsDashboard(): Promise<AnalyticsDashboardRespo
   return apiGet<AnalyticsDashboardResponse>("/analytics/dashboard");
 }
 
-export async function fetchVoteTrends(days: number = 7): Promise<VoteTrendResponse> {
-  return apiGet<VoteTrendResponse>(`/analytics/vote-trends?days=${days}`);
+export async function fetchVoteTrends(
+  days: number = 7,
+  options: { granularity?: TrendGranularity; hours?: number; pollId?: number } = {},
+): Promise<VoteTrendResponse> {
+  const params = new URLSearchParams({ days: String(days) });
+  if (options.granularity) params.set("granularity", options.granularity);
+  if (options.hours) params.set("hours", String(options.hours));
+  if (options.pollId) params.set("poll_id", String(options.pollId));
+  return apiGet<VoteTrendResponse>(`/analytics/vote-trends?${params.toString()}`);
 }
 
-export async function fetchActivities(limit: number = 50, offset: number = 0): Promise<ActivityFeedResponse> {
-  return apiGet<ActivityFeedResponse>(`/analytics/activities?limit=${limit}&offset=${offset}`);
+export async function fetchActivities(limit: number = 50, before?: string | null): Promise<ActivityFeedResponse> {
+  const params = new URLSearchParams({ limit: String(limit) });
+  if (before) params.set("before", before);
+  return apiGet<ActivityFeedResponse>(`/analytics/activities?${params.toString()}`);
 }
 
 export async function fetchEngagementMetrics(): Promise<EngagementMetrics> {
   return apiGet<EngagementMetrics>("/analytics/metrics");
 }
 
-export async function fetchTopPolls(): Promise<TopPollsResponse> {
-  return apiGet<TopPollsResponse>("/analytics/top-polls");
+export async function fetchTopPolls(
+  options: { window?: LeaderboardWindow; limit?: number } = {},
+): Promise<TopPollsResponse> {
+  const params = new URLSearchParams();
+  if (options.window) params.set("window", options.window);
+  if (options.limit) params.set("limit", String(options.limit));
+  const query = params.toString();
+  return apiGet<TopPollsResponse>(query ? `/analytics/top-polls?${query}` : "/analytics/top-polls");
 }
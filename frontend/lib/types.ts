@@ -21,6 +21,7 @@ export interface Poll {
   total_likes: number;
   user_voted?: boolean;
   user_liked?: boolean;
+  viewers?: number;
 }
 
 export interface PollCreatePayload {